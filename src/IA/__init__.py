@@ -2,8 +2,20 @@
 Módulo de Inteligencia Artificial
 Contiene servicios para embeddings y modelos de lenguaje
 """
+import importlib
 
-from src.IA.embeddings import EmbeddingsService
-from src.IA.llm_service import LLMService
+# Las clases se importan al usarlas: importar el paquete (por ejemplo, IA.executor) no
+# debe cargar torch, sentence-transformers ni el cliente de Gemini
+_EXPORTS = {
+    'EmbeddingsService': 'src.IA.embeddings',
+    'LLMService': 'src.IA.llm_service',
+    'ComputeExecutor': 'src.IA.executor',
+}
 
-__all__ = ['EmbeddingsService', 'LLMService']
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
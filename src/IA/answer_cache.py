@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+import threading
+import time
+
+import numpy as np
+
+
+@dataclass
+class _CachedAnswer:
+    """Respuesta guardada junto con el embedding de su pregunta"""
+    embedding: np.ndarray
+    generation: int
+    response: Any
+    llm_seconds: float
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Caché en memoria de respuestas indexada por el embedding de la pregunta
+
+    Una pregunta nueva reutiliza la respuesta de otra cuya distancia coseno sea como
+    máximo `max_distance`, siempre que ambas se hayan hecho contra la misma generación
+    del índice. Las entradas vencen a los `ttl_seconds` y, al superar `maxsize`, se
+    desaloja la usada hace más tiempo.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float, max_distance: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self.saved_llm_seconds = 0.0
+        self._entries: "OrderedDict[int, _CachedAnswer]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def get(self, embedding: Sequence[float], generation: int) -> Optional[Any]:
+        """
+        Busca la respuesta de la pregunta cacheada más cercana
+
+        Args:
+            embedding: Embedding de la pregunta
+            generation: Generación actual del índice
+
+        Returns:
+            Respuesta guardada o None si no hay ninguna suficientemente cercana
+        """
+        if self.maxsize <= 0:
+            return None
+
+        query = self._normalize(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_distance = None, self.max_distance
+            for key, entry in list(self._entries.items()):
+                if entry.expires_at <= now or entry.generation != generation:
+                    del self._entries[key]
+                    continue
+                distance = 1.0 - float(np.dot(query, entry.embedding))
+                if distance <= best_distance:
+                    best_key, best_distance = key, distance
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            self.saved_llm_seconds += entry.llm_seconds
+            return entry.response
+
+    def put(self, embedding: Sequence[float], generation: int, response: Any, llm_seconds: float):
+        """
+        Guarda una respuesta desalojando la menos usada si se supera el tamaño
+
+        Args:
+            embedding: Embedding de la pregunta
+            generation: Generación del índice usada para responder
+            response: Respuesta a reutilizar
+            llm_seconds: Tiempo que tardó el LLM en generarla
+        """
+        if self.maxsize <= 0:
+            return
+
+        entry = _CachedAnswer(
+            embedding=self._normalize(embedding),
+            generation=generation,
+            response=response,
+            llm_seconds=llm_seconds,
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+
+        with self._lock:
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Elimina todas las entradas (los contadores se conservan)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _normalize(self, embedding: Sequence[float]) -> np.ndarray:
+        """Convierte el embedding a un vector unitario float32"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene estadísticas de uso de la caché
+
+        Returns:
+            Diccionario con tamaño, aciertos, fallos, tasa de aciertos y latencia de LLM ahorrada
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_llm_seconds": round(self.saved_llm_seconds, 3)
+        }
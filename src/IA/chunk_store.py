@@ -0,0 +1,224 @@
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
+import json
+import sqlite3
+import threading
+import sys
+import os
+
+import numpy as np
+
+# Agregar el directorio padre al path para importar models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import DocumentChunk
+
+
+class ChunkStore:
+    """
+    Almacén de chunks en SQLite indexado por ID de vector FAISS
+
+    Las escrituras son incrementales (solo los chunks agregados o eliminados) y el
+    texto se lee bajo demanda, únicamente para los resultados de una búsqueda.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " vector_id INTEGER PRIMARY KEY,"
+            " doc_id TEXT NOT NULL,"
+            " document_name TEXT NOT NULL,"
+            " chunk_index INTEGER NOT NULL,"
+            " file_type TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " page INTEGER)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        if "page" not in columns:
+            # Almacenes creados antes de guardar la página de cada chunk
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN page INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_document_name ON chunks(document_name)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add(self, rows: Iterable[Tuple[int, str, DocumentChunk, str]]):
+        """
+        Inserta chunks nuevos
+
+        Args:
+            rows: Tuplas (vector_id, doc_id, chunk, file_type)
+        """
+        values = [
+            (vector_id, doc_id, chunk.document_name, chunk.chunk_index, file_type,
+             chunk.created_at.isoformat(), chunk.text, chunk.page)
+            for vector_id, doc_id, chunk, file_type in rows
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO chunks "
+                "(vector_id, doc_id, document_name, chunk_index, file_type, created_at, text, page) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                values
+            )
+            self._conn.commit()
+            self._count += len(values)
+
+    def delete(self, vector_ids: Iterable[int]):
+        """
+        Elimina chunks por ID de vector
+
+        Args:
+            vector_ids: IDs de los vectores a eliminar
+        """
+        ids = [(int(vector_id),) for vector_id in vector_ids]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM chunks WHERE vector_id = ?", ids)
+            self._count -= self._conn.total_changes - before
+            self._conn.commit()
+
+    def get_many(self, vector_ids: List[int]) -> Dict[int, DocumentChunk]:
+        """
+        Lee los chunks (con texto) de un conjunto pequeño de vectores
+
+        Args:
+            vector_ids: IDs de los vectores
+
+        Returns:
+            Diccionario vector_id -> DocumentChunk
+        """
+        if not vector_ids:
+            return {}
+        placeholders = ",".join("?" * len(vector_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vector_id, document_name, chunk_index, created_at, text, page "
+                f"FROM chunks WHERE vector_id IN ({placeholders})",
+                [int(vector_id) for vector_id in vector_ids]
+            ).fetchall()
+        return {
+            vector_id: DocumentChunk(
+                text=text,
+                document_name=document_name,
+                chunk_index=chunk_index,
+                page=page,
+                created_at=datetime.fromisoformat(created_at)
+            )
+            for vector_id, document_name, chunk_index, created_at, text, page in rows
+        }
+
+    def iter_source_ids(self) -> Iterator[Tuple[str, np.ndarray]]:
+        """
+        Recorre los IDs de vector de cada documento sin leer el texto de los chunks
+
+        Returns:
+            Iterador de (document_name, IDs int64 ordenados)
+        """
+        # Se agrupa mientras se lee el cursor para no materializar una tupla por chunk
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT document_name, vector_id FROM chunks ORDER BY document_name, vector_id"
+            )
+            sources = [
+                (document_name, np.fromiter((vector_id for _, vector_id in group), dtype=np.int64))
+                for document_name, group in groupby(cursor, key=itemgetter(0))
+            ]
+        return iter(sources)
+
+    def source_sizes(self) -> Dict[str, int]:
+        """
+        Bytes (UTF-8) del texto de los chunks de cada documento
+
+        Returns:
+            Diccionario document_name -> bytes
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT document_name, SUM(LENGTH(CAST(text AS BLOB))) FROM chunks GROUP BY document_name"
+            ).fetchall()
+        return dict(rows)
+
+    def iter_texts(self, batch_size: int = 10_000) -> Iterator[Tuple[int, str]]:
+        """
+        Recorre (vector_id, text) de todos los chunks leyendo por páginas
+
+        Args:
+            batch_size: Chunks leídos por consulta
+
+        Returns:
+            Iterador ordenado por vector_id
+        """
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT vector_id, text FROM chunks WHERE vector_id > ? ORDER BY vector_id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def vector_ids(self) -> Set[int]:
+        """
+        Obtiene todos los IDs de vector almacenados
+
+        Returns:
+            Conjunto de IDs
+        """
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT vector_id FROM chunks")}
+
+    def count(self) -> int:
+        """Número de chunks almacenados"""
+        return self._count
+
+    def clear(self):
+        """Elimina todos los chunks"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+            self._count = 0
+
+    def migrate_from_json(self, metadata_path: Path, vector_ids_by_doc_id: Dict[str, List[int]],
+                          file_type_for: Callable[[str], str]) -> int:
+        """
+        Importa una sola vez el metadata.json heredado
+
+        Args:
+            metadata_path: Ruta del metadata.json
+            vector_ids_by_doc_id: IDs de vector FAISS asociados a cada doc_id
+            file_type_for: Función que obtiene el tipo de archivo desde el nombre
+
+        Returns:
+            Número de chunks importados
+        """
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        rows = []
+        for doc_id, data in metadata.items():
+            chunk = DocumentChunk(
+                text=data["text"],
+                document_name=data["document_name"],
+                chunk_index=data["chunk_index"],
+                created_at=datetime.fromisoformat(data["created_at"])
+            )
+            for vector_id in vector_ids_by_doc_id.get(doc_id, []):
+                rows.append((vector_id, doc_id, chunk, file_type_for(chunk.document_name)))
+
+        self.add(rows)
+        return len(rows)
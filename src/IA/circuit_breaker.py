@@ -0,0 +1,109 @@
+from typing import Any, Dict
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas a un servicio externo tras varios fallos seguidos
+
+    Estados:
+    - closed: las llamadas pasan normalmente
+    - open: se rechazan sin llamar al servicio hasta que pasen `reset_seconds`
+    - half_open: pasado ese tiempo se deja pasar una llamada de prueba; si funciona
+      el circuito se cierra, si falla vuelve a abrirse y si termina sin veredicto
+      (cancelada o con un error que no es del servicio) queda en half_open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+        # Hay una llamada de prueba en curso (el circuito está abierto mientras tanto)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Estado actual del circuito"""
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self) -> bool:
+        """
+        Indica si se puede llamar al servicio
+
+        Returns:
+            False si el circuito está abierto (la llamada se cuenta como rechazada)
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN:
+                self.rejected += 1
+                return False
+            if state == self.HALF_OPEN:
+                # Solo pasa una llamada de prueba; el resto espera su resultado con el circuito abierto
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """Registra una llamada exitosa y cierra el circuito"""
+        with self._lock:
+            self.consecutive_failures = 0
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Registra un fallo y abre el circuito al alcanzar el umbral"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state != self.OPEN and self.consecutive_failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def record_abandoned(self):
+        """
+        Registra una llamada que terminó sin veredicto sobre el servicio (cancelada o con
+        un error no pasajero)
+
+        Si era la llamada de prueba, el circuito vuelve a half_open para que la próxima
+        llamada pruebe el servicio en lugar de seguir rechazándose.
+        """
+        with self._lock:
+            if self._probe_in_flight and self._state == self.OPEN:
+                self._probe_in_flight = False
+                self._state = self.HALF_OPEN
+
+    def _current_state(self) -> str:
+        """Estado considerando si ya venció el tiempo de espera (requiere el lock)"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado del circuito
+
+        Returns:
+            Diccionario con estado, fallos seguidos, aperturas y llamadas rechazadas
+        """
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,157 @@
+from pathlib import Path
+from typing import List, Optional
+import json
+import sys
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Agregar el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+
+# Backends disponibles: cualquier implementación de Embeddings de LangChain sirve como backend
+BACKENDS = ("torch", "onnx")
+
+
+def create_embeddings(backend: Optional[str] = None) -> Embeddings:
+    """
+    Crea el modelo de embeddings del backend configurado
+
+    Args:
+        backend: "torch" (sentence-transformers sobre PyTorch) u "onnx" (ONNX Runtime,
+            por defecto con el modelo cuantizado a int8); None = `settings.embedding_backend`
+
+    Returns:
+        Modelo de embeddings con salida normalizada
+
+    Raises:
+        ValueError: Si el backend no existe
+    """
+    backend = backend or settings.embedding_backend
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=settings.embedding_model,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={
+                'normalize_embeddings': True,  # Normalizar embeddings para mejor rendimiento
+                'batch_size': settings.embedding_batch_size
+            }
+        )
+    if backend == "onnx":
+        return OnnxEmbeddings(
+            settings.embedding_model,
+            onnx_file=settings.embedding_onnx_file,
+            batch_size=settings.embedding_batch_size,
+            threads=settings.embedding_onnx_threads
+        )
+    raise ValueError(f"Backend de embeddings desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+
+
+def embeddings_cache_key(backend: Optional[str] = None) -> str:
+    """
+    Identifica modelo y backend en la caché persistente de embeddings
+
+    Los vectores del modelo cuantizado difieren levemente de los de PyTorch, así que
+    cada combinación tiene sus propias entradas.
+
+    Args:
+        backend: Backend (None = `settings.embedding_backend`)
+
+    Returns:
+        Clave del modelo para la caché
+    """
+    backend = backend or settings.embedding_backend
+    if backend == "torch":
+        return settings.embedding_model
+    return f"{settings.embedding_model}@{backend}:{settings.embedding_onnx_file}"
+
+
+def _model_file(model_name: str, filename: str) -> Path:
+    """Ruta local de un archivo del modelo (directorio local o repositorio de Hugging Face)"""
+    if Path(model_name).is_dir():
+        return Path(model_name) / filename
+
+    from huggingface_hub import hf_hub_download
+
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return Path(hf_hub_download(repo_id, filename))
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings de un modelo sentence-transformers exportado a ONNX, sin PyTorch
+
+    Tokeniza con `tokenizers`, ejecuta el encoder con ONNX Runtime en CPU y aplica el
+    mismo mean pooling y normalización L2 que el modelo original.
+    """
+
+    def __init__(self, model_name: str, onnx_file: str = "onnx/model_quint8_avx2.onnx",
+                 batch_size: int = 64, threads: int = 0, max_length: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+
+        if max_length is None:
+            max_length = self._max_length(model_name)
+
+        self.tokenizer = Tokenizer.from_file(str(_model_file(model_name, "tokenizer.json")))
+        self.tokenizer.enable_truncation(max_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token=self.tokenizer.id_to_token(pad_id))
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(_model_file(model_name, onnx_file)), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+        output_names = [output.name for output in self.session.get_outputs()]
+        self._output_name = "last_hidden_state" if "last_hidden_state" in output_names else output_names[0]
+
+    @staticmethod
+    def _max_length(model_name: str) -> int:
+        """Longitud máxima de secuencia: la de sentence-transformers o, si no está, la del encoder"""
+        sources = (("sentence_bert_config.json", "max_seq_length"), ("config.json", "max_position_embeddings"))
+        for filename, key in sources:
+            try:
+                return int(json.loads(_model_file(model_name, filename).read_text(encoding="utf-8"))[key])
+            except Exception:
+                continue
+        return 512
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Calcula embeddings de documentos por lotes"""
+        vectors = [
+            self._encode(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        """Calcula el embedding de una consulta"""
+        return self._encode([text])[0].tolist()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings normalizados (float32) de un lote"""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.asarray([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        hidden = self.session.run([self._output_name], feeds)[0]
+
+        # Mean pooling sobre los tokens reales (sin padding)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Caché persistente de embeddings de chunks en SQLite
+
+    La clave es el hash de (modelo, texto normalizado), así que un mismo chunk subido
+    de nuevo no vuelve a pasar por el modelo. Al superar `max_entries` se descartan
+    las entradas usadas hace más tiempo.
+    """
+
+    # La fecha de último uso se refresca como máximo una vez por intervalo: basta para
+    # el desalojo y evita una escritura por acierto
+    TOUCH_INTERVAL_SECONDS = 3600
+
+    def __init__(self, path: str, model_name: str, max_entries: int):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key_for(self, text: str) -> str:
+        """
+        Calcula la clave de caché de un texto
+
+        Args:
+            text: Texto del chunk
+
+        Returns:
+            Hash SHA-256 de modelo + texto normalizado
+        """
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Busca los embeddings de varios textos
+
+        Args:
+            texts: Textos a buscar
+
+        Returns:
+            Lista alineada con `texts` con el vector (float32) o None si no está en caché
+        """
+        keys = [self.key_for(text) for text in texts]
+        unique_keys = list(set(keys))
+
+        with self._lock:
+            found = {}
+            stale = []
+            now = time.time()
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob, last_used in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                    if now - last_used > self.TOUCH_INTERVAL_SECONDS:
+                        stale.append((now, key))
+
+            if stale:
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", stale)
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for vector in results if vector is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """
+        Guarda embeddings en caché y aplica el límite de tamaño
+
+        Args:
+            texts: Textos de los chunks
+            vectors: Matriz (n, d) alineada con `texts`
+        """
+        now = time.time()
+        rows = [
+            (self.key_for(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._entries += self._conn.total_changes - before
+
+            excess = self._entries - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self._entries -= excess
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene estadísticas de uso de la caché
+
+        Returns:
+            Diccionario con entradas, aciertos, fallos y tasa de aciertos
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -1,92 +1,283 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
-from typing import Dict, Optional, List, Any
+from langchain_core.embeddings import Embeddings
+from typing import Callable, Dict, Iterable, Optional, List, Any, Set, Tuple
 import sys
 import os
 import pickle
-import json
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+import faiss
+import numpy as np
+
 # Agregar el directorio padre al path para importar config y models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models import DocumentChunk, SearchResult
 from config import settings
+from .embedding_cache import EmbeddingCache
+from .chunk_store import ChunkStore
+from .cache import LRUCache
+from .answer_cache import SemanticAnswerCache
+from .lexical_index import LexicalIndex
+from .index_sync import IndexVersion, WriterLock
+from .source_index import SourceIndex
+from .index_stats import IndexStats
+from . import index_factory
+from .embedding_backends import create_embeddings, embeddings_cache_key
+from .reranker import CrossEncoderReranker
 
 
 class EmbeddingsService:
     """Servicio avanzado para el manejo de embeddings y base de datos vectorial FAISS"""
     
-    def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=settings.embedding_model,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}  # Normalizar embeddings para mejor rendimiento
+    def __init__(self, embeddings: Optional[Embeddings] = None):
+        # El modelo y el índice se cargan al primer uso (o en el warm-up) para que la
+        # aplicación arranque sin esperar a torch ni a la lectura del índice
+        self._embeddings = embeddings
+        self._model_lock = threading.Lock()
+        self._loaded = False
+        # Índice FAISS con IDs estables; al cargarlo desde disco se abre mapeado en memoria
+        self.vector_db: Optional[faiss.Index] = None
+        self._index_is_mapped = False
+        # Vectores borrados de índices que no admiten eliminación (HNSW); se excluyen al buscar
+        self._tombstones: set = set()
+        self._tombstone_selector = None
+        # IDs estables de vectores FAISS (int64) agrupados por documento fuente
+        self.source_index = SourceIndex()
+        # Documentos fuente agrupados por tipo de archivo, para pre-filtrar búsquedas
+        self.file_type_index: Dict[str, Set[str]] = {}
+        # Chunks y bytes por documento y por tipo de archivo, para /status y /stats
+        self.index_stats = IndexStats()
+        self.next_vector_id = 0
+        # Serializa búsquedas y mutaciones del índice entre hilos del executor
+        self._index_lock = threading.RLock()
+        # Se incrementa con cada cambio del índice; forma parte de la clave de la caché de resultados
+        self.index_generation = 0
+        self.query_embedding_cache = LRUCache(settings.query_embedding_cache_size)
+        self.search_result_cache = LRUCache(settings.search_result_cache_size)
+        # Respuestas del QA por cercanía de la pregunta; se invalida junto con los resultados
+        self.answer_cache = SemanticAnswerCache(
+            settings.answer_cache_size,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+            max_distance=settings.answer_cache_max_distance
         )
-        self.vector_db: Optional[FAISS] = None
-        self.document_mapping: Dict[str, DocumentChunk] = {}
+        # Reordena el contexto de /ask cuando settings.rerank_enabled (el modelo se carga al primer uso)
+        self.reranker = CrossEncoderReranker()
         self.index_path = Path(settings.vector_db_path)
+        self.index_file = self.index_path / "index.faiss"
+        # Índice léxico BM25 sobre los mismos IDs de vector, persistido junto al índice FAISS
+        self.lexical_index = LexicalIndex(settings.bm25_k1, settings.bm25_b)
+        self.lexical_file = self.index_path / "lexical.npz"
+        self.stats_file = self.index_path / "stats.json"
         self.metadata_path = Path(settings.metadata_path)
         self.index_path.parent.mkdir(parents=True, exist_ok=True)
-        self.metadata_path.parent.mkdir(parents=True, exist_ok=True)
-    
-        self._load_existing_index()
+        # Texto y metadatos de cada chunk, indexados por el mismo ID que su vector
+        self.chunk_store = ChunkStore(settings.chunk_store_path)
+        # Con varios workers solo escribe quien tiene el lock; los demás recargan al ver una versión nueva
+        self.writer_lock = WriterLock(self.index_path.parent / "index.lock")
+        self.index_version = IndexVersion(
+            self.index_path.parent / "index.version", settings.index_reload_interval_seconds
+        )
+        self._loaded_version = ""
+        # Hilo que recarga el índice publicado por otros workers (ver start_index_watcher)
+        self._index_watcher: Optional[threading.Thread] = None
+        self._stop_index_watcher = threading.Event()
+        
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if settings.embedding_cache_enabled:
+            self.embedding_cache = EmbeddingCache(
+                settings.embedding_cache_path,
+                model_name=(getattr(embeddings, "model_name", None) or type(embeddings).__name__
+                            if embeddings else embeddings_cache_key()),
+                max_entries=settings.embedding_cache_max_entries
+            )
+
 
+    @property
+    def embeddings(self) -> Embeddings:
+        """Modelo de embeddings, cargado la primera vez que se usa"""
+        if self._embeddings is None:
+            with self._model_lock:
+                if self._embeddings is None:
+                    self._embeddings = create_embeddings()
+        return self._embeddings
 
+    @property
+    def is_model_loaded(self) -> bool:
+        """Indica si el modelo de embeddings ya está en memoria"""
+        return self._embeddings is not None
 
-    def create_vector_database(self, documents: List[DocumentChunk]) -> bool:
+    @property
+    def is_index_loaded(self) -> bool:
+        """Indica si ya se cargó el índice persistido"""
+        return self._loaded
+
+    def ensure_loaded(self):
+        """
+        Carga el índice persistido si todavía no se cargó (idempotente)
+        
+        Solo quien tiene el lock de escritura repara índice y almacén al cargar; si
+        otro worker está escribiendo, se carga lo último publicado sin tocar disco.
+        """
+        if self._loaded:
+            return
+        with self._index_lock:
+            if self._loaded:
+                return
+            owns_writes = self.writer_lock.acquire(blocking=False)
+            try:
+                self._loaded_version = self.index_version.read()
+                self._load_existing_index(repair=owns_writes)
+            finally:
+                if owns_writes:
+                    self.writer_lock.release()
+            self._loaded = True
+
+    def warm_up(self):
+        """Carga el índice y los modelos (embeddings y, si está activo, el cross-encoder) y ejecuta una inferencia de prueba"""
+        self.ensure_loaded()
+        self.embeddings.embed_query("warm-up")
+        if settings.rerank_enabled:
+            self.reranker.warm_up()
+
+
+
+    def create_vector_database(
+        self,
+        documents: List[DocumentChunk],
+        progress_callback: Optional[Callable[[str], None]] = None
+    ) -> bool:
         """
         Crea la base de datos vectorial optimizada con FAISS
         
         Args:
             documents: Lista de chunks de documentos
+            progress_callback: Función opcional que recibe la etapa completada
+                ("embedded" o "persisted")
             
         Returns:
             True si se creó exitosamente, False en caso contrario
         """
-        try:
-            if not documents:
-                print("No hay documentos para procesar")
-                return False
+        return self.create_vector_database_from_stream([documents], progress_callback)
+
+    def create_vector_database_from_stream(
+        self,
+        document_groups: Iterable[List[DocumentChunk]],
+        progress_callback: Optional[Callable[[str], None]] = None
+    ) -> bool:
+        """
+        Indexa grupos de chunks (por ejemplo, uno por archivo) a medida que llegan
+        
+        Cada grupo se embebe e indexa en cuanto el iterador lo entrega, mientras los
+        siguientes todavía se están produciendo. El índice se persiste una sola vez al
+        final y, si algo falla, se retiran todos los documentos de esta ingesta. Los
+        documentos re-ingestados conservan su versión anterior hasta que la nueva
+        termina de indexarse, y la recuperan si la ingesta falla.
+        
+        Args:
+            document_groups: Iterable de listas de chunks
+            progress_callback: Función opcional que recibe la etapa completada
+                ("embedded" o "persisted")
             
-            langchain_docs = []
-            for doc in documents:
-                doc_id = f"{doc.document_name}_{doc.chunk_index}"
-                
-                # Metadatos enriquecidos para filtrado
-                metadata = {
-                    "source": doc.document_name,
-                    "chunk_index": doc.chunk_index,
-                    "doc_id": doc_id,
-                    "created_at": doc.created_at.isoformat(),
-                    "text_length": len(doc.text),
-                    "file_type": self._get_file_type(doc.document_name)
-                }
+        Returns:
+            True si se indexó al menos un chunk, False en caso contrario
+        """
+        try:
+            with self._exclusive_write():
+                return self._index_stream(document_groups, progress_callback)
+        except Exception as e:
+            print(f"Error creando base de datos vectorial: {e}")
+            return False
+
+    def _index_stream(
+        self,
+        document_groups: Iterable[List[DocumentChunk]],
+        progress_callback: Optional[Callable[[str], None]]
+    ) -> bool:
+        """Indexa y persiste los grupos de chunks (requiere el lock de escritura)"""
+        document_names: Set[str] = set()
+        # Versiones anteriores de los documentos re-ingestados: (IDs de vector, contadores)
+        replaced: Dict[str, Tuple[np.ndarray, Optional[Tuple[str, int, int]]]] = {}
+        total = 0
+        is_new = None
+        
+        try:
+            for documents in document_groups:
+                if not documents:
+                    continue
                 
-                langchain_doc = Document(
-                    page_content=doc.text,
-                    metadata=metadata
-                )
-                langchain_docs.append(langchain_doc)
+                group_names = {doc.document_name for doc in documents}
+                with self._index_lock:
+                    if is_new is None:
+                        is_new = self.vector_db is None
+                    # Re-ingestar un documento reemplaza sus chunks anteriores, que siguen en el
+                    # índice hasta que la versión nueva esté completa
+                    for document_name in group_names - document_names:
+                        if document_name in self.source_index:
+                            replaced[document_name] = self._detach_source(document_name)
+                document_names |= group_names
                 
-                self.document_mapping[doc_id] = doc
-            
-            if self.vector_db is None:
-                self.vector_db = FAISS.from_documents(langchain_docs, self.embeddings)
-                print(f"Nueva base de datos vectorial creada con {len(documents)} documentos")
-            else:
-                new_vector_db = FAISS.from_documents(langchain_docs, self.embeddings)
-                self.vector_db.merge_from(new_vector_db)
-                print(f"Base de datos vectorial actualizada. {len(documents)} documentos agregados")
-            
+                self._embed_and_add(documents)
+                total += len(documents)
+        except Exception:
+            # Una ingesta fallida no deja documentos indexados a medias y conserva las versiones anteriores
+            with self._index_lock:
+                for document_name in document_names:
+                    self._remove_source(document_name)
+                for document_name, (vector_ids, counters) in replaced.items():
+                    self._index_source(document_name, vector_ids)
+                    if counters:
+                        self.index_stats.add(document_name, *counters)
+            raise
+        
+        with self._index_lock:
+            for vector_ids, _ in replaced.values():
+                self._delete_vectors(vector_ids)
+        
+        if not total:
+            print("No hay documentos para procesar")
+            return False
+        
+        self._maybe_rebuild_index()
+        
+        if progress_callback:
+            progress_callback("embedded")
+        
+        if is_new:
+            print(f"Nueva base de datos vectorial creada con {total} documentos")
+        else:
+            print(f"Base de datos vectorial actualizada. {total} documentos agregados")
+        
+        with self._index_lock:
             self._save_index()
+        if progress_callback:
+            progress_callback("persisted")
+        
+        return True
+
+    def _embed_and_add(self, documents: List[DocumentChunk]):
+        """
+        Calcula embeddings por lotes y los agrega al índice
+        
+        Args:
+            documents: Chunks a indexar
+        """
+        # Ordenar por longitud agrupa textos similares en cada lote y reduce el padding del modelo
+        ordered = sorted(documents, key=lambda doc: len(doc.text))
+        batch_size = max(1, settings.embedding_batch_size)
+        
+        for start in range(0, len(ordered), batch_size):
+            batch = ordered[start:start + batch_size]
             
-            return True
+            # El cálculo de embeddings es la parte costosa y no requiere el lock del índice
+            vectors = self._embed_texts([doc.text for doc in batch])
             
-        except Exception as e:
-            print(f"Error creando base de datos vectorial: {e}")
-            return False
+            with self._index_lock:
+                if self.vector_db is None:
+                    self.vector_db = self._create_empty_index(vectors.shape[1])
+                
+                self._add_vectors(vectors, batch)
 
     def similarity_search(self, query: str, k: int = None, filter: Dict[str, Any] = None) -> List[SearchResult]:
         """
@@ -100,40 +291,337 @@ class EmbeddingsService:
         Returns:
             Lista de resultados de búsqueda
         """
+        self.sync_with_disk()
         if not self.vector_db:
             print("La base de datos vectorial no está inicializada")
             return []
             
         if k is None:
             k = settings.similarity_search_k
+        
+        filter_key = tuple(sorted(filter.items())) if filter else None
+        cached = self.search_result_cache.get((query, k, filter_key, self.index_generation))
+        if cached is not None:
+            return list(cached)
             
         try:
-            docs_with_scores = self.vector_db.similarity_search_with_score(
-                query, 
-                k=k,
-                filter=filter
-            )
+            embedding = self._embed_query(query)
             
-            results = []
-            for doc, score in docs_with_scores:
-                doc_id = doc.metadata.get("doc_id", "")
-                chunk = self.document_mapping.get(doc_id)
+            with self._index_lock:
+                if not self.vector_db:
+                    return []
                 
-                if chunk:
-                    result = SearchResult(
-                        text=chunk.text,
-                        document_name=chunk.document_name,
-                        score=float(score),
-                        chunk_index=chunk.chunk_index
-                    )
-                    results.append(result)
-                        
+                generation = self.index_generation
+                results = self._results_for(self._vector_hits(embedding, k, filter))
+            
+            self.search_result_cache.put((query, k, filter_key, generation), tuple(results))
             return results
             
         except Exception as e:
             print(f"Error en búsqueda de similitud: {e}")
             return []
 
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        ks: Optional[List[Optional[int]]] = None,
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[SearchResult]]:
+        """
+        Búsqueda de similitud de varias consultas a la vez
+        
+        Las consultas que no están en la caché se convierten en un solo lote del modelo,
+        las que no tienen filtro se resuelven con una única búsqueda FAISS multi-fila y
+        los textos de todos los resultados se leen con una sola consulta al almacén.
+        
+        Args:
+            queries: Consultas de búsqueda
+            ks: Número de resultados por consulta (None = settings.similarity_search_k)
+            filters: Filtro de metadatos por consulta
+            
+        Returns:
+            Resultados de cada consulta, en el mismo orden
+        """
+        self.sync_with_disk()
+        if not self.vector_db:
+            print("La base de datos vectorial no está inicializada")
+            return [[] for _ in queries]
+        
+        ks = [k if k is not None else settings.similarity_search_k for k in (ks or [None] * len(queries))]
+        filters = filters or [None] * len(queries)
+        keys = [
+            (query, k, tuple(sorted(filter.items())) if filter else None)
+            for query, k, filter in zip(queries, ks, filters)
+        ]
+        
+        results: List[Optional[List[SearchResult]]] = [None] * len(queries)
+        pending = []
+        for position, key in enumerate(keys):
+            cached = self.search_result_cache.get(key + (self.index_generation,))
+            if cached is not None:
+                results[position] = list(cached)
+            else:
+                pending.append(position)
+        
+        try:
+            if pending:
+                vectors = self._embed_queries([queries[position] for position in pending])
+                
+                with self._index_lock:
+                    if not self.vector_db:
+                        return [[] for _ in queries]
+                    
+                    generation = self.index_generation
+                    hits = self._vector_hits_batch(
+                        vectors, [ks[position] for position in pending], [filters[position] for position in pending]
+                    )
+                    chunks = self.chunk_store.get_many(sorted({
+                        vector_id for query_hits in hits for vector_id, _ in query_hits
+                    }))
+                    for position, query_hits in zip(pending, hits):
+                        results[position] = self._results_for(query_hits, chunks)
+                
+                for position in pending:
+                    self.search_result_cache.put(keys[position] + (generation,), tuple(results[position]))
+            return results
+            
+        except Exception as e:
+            print(f"Error en búsqueda de similitud por lotes: {e}")
+            return [result or [] for result in results]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        ks: Optional[List[Optional[int]]] = None,
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        mode: str = None
+    ) -> List[List[SearchResult]]:
+        """
+        Busca varias consultas con el modo indicado
+        
+        En modo vectorial todo el lote comparte embeddings y búsqueda FAISS; en modo
+        híbrido los embeddings se calculan en un solo lote y cada consulta se fusiona
+        con su ranking BM25.
+        
+        Args:
+            queries: Consultas de búsqueda
+            ks: Número de resultados por consulta
+            filters: Filtro de metadatos por consulta
+            mode: "vector", "lexical" o "hybrid" (None = settings.search_mode)
+            
+        Returns:
+            Resultados de cada consulta, en el mismo orden
+            
+        Raises:
+            ValueError: Si el modo no existe
+        """
+        mode = mode or settings.search_mode
+        if mode == "vector":
+            return self.similarity_search_batch(queries, ks, filters)
+        if mode not in ("lexical", "hybrid"):
+            raise ValueError(f"Modo de búsqueda no soportado: {mode}. Use vector, lexical o hybrid")
+        
+        ks = ks or [None] * len(queries)
+        filters = filters or [None] * len(queries)
+        if mode == "hybrid" and queries:
+            # Deja los embeddings en la caché de consultas para cada búsqueda individual
+            self._embed_queries(queries)
+        return [
+            self._ranked_search(mode, query, k, filter)
+            for query, k, filter in zip(queries, ks, filters)
+        ]
+
+    def lexical_search(self, query: str, k: int = None, filter: Dict[str, Any] = None) -> List[SearchResult]:
+        """
+        Realiza búsqueda por términos exactos con BM25
+        
+        Args:
+            query: Consulta de búsqueda
+            k: Número de resultados a retornar
+            filter: Filtros de metadatos para la búsqueda
+            
+        Returns:
+            Lista de resultados; `score` es el puntaje BM25 (mayor es mejor)
+        """
+        return self._ranked_search("lexical", query, k, filter)
+
+    def hybrid_search(self, query: str, k: int = None, filter: Dict[str, Any] = None) -> List[SearchResult]:
+        """
+        Combina búsqueda vectorial y BM25 con reciprocal rank fusion
+        
+        Args:
+            query: Consulta de búsqueda
+            k: Número de resultados a retornar
+            filter: Filtros de metadatos para la búsqueda
+            
+        Returns:
+            Lista de resultados; `score` es el puntaje RRF (mayor es mejor)
+        """
+        return self._ranked_search("hybrid", query, k, filter)
+
+    def search(self, query: str, k: int = None, filter: Dict[str, Any] = None, mode: str = None) -> List[SearchResult]:
+        """
+        Busca con el modo indicado
+        
+        Args:
+            query: Consulta de búsqueda
+            k: Número de resultados a retornar
+            filter: Filtros de metadatos para la búsqueda
+            mode: "vector", "lexical" o "hybrid" (None = settings.search_mode)
+            
+        Returns:
+            Lista de resultados de búsqueda
+            
+        Raises:
+            ValueError: Si el modo no existe
+        """
+        mode = mode or settings.search_mode
+        if mode == "vector":
+            return self.similarity_search(query, k, filter)
+        if mode in ("lexical", "hybrid"):
+            return self._ranked_search(mode, query, k, filter)
+        raise ValueError(f"Modo de búsqueda no soportado: {mode}. Use vector, lexical o hybrid")
+
+    def _ranked_search(self, mode: str, query: str, k: Optional[int], filter: Optional[Dict[str, Any]]) -> List[SearchResult]:
+        """Búsqueda léxica o híbrida con caché por generación del índice"""
+        self.sync_with_disk()
+        if not self.vector_db:
+            print("La base de datos vectorial no está inicializada")
+            return []
+        
+        if k is None:
+            k = settings.similarity_search_k
+        
+        filter_key = tuple(sorted(filter.items())) if filter else None
+        cached = self.search_result_cache.get((mode, query, k, filter_key, self.index_generation))
+        if cached is not None:
+            return list(cached)
+        
+        try:
+            candidates = max(k, settings.hybrid_candidates_k)
+            embedding = self._embed_query(query) if mode == "hybrid" else None
+            
+            with self._index_lock:
+                if not self.vector_db:
+                    return []
+                
+                generation = self.index_generation
+                lexical_hits = self._lexical_hits(query, k if mode == "lexical" else candidates, filter)
+                if mode == "lexical":
+                    hits = lexical_hits
+                else:
+                    vector_hits = self._vector_hits(embedding, candidates, filter)
+                    hits = self._fuse_rankings([vector_hits, lexical_hits], settings.rrf_k)[:k]
+                results = self._results_for(hits)
+            
+            self.search_result_cache.put((mode, query, k, filter_key, generation), tuple(results))
+            return results
+            
+        except Exception as e:
+            print(f"Error en búsqueda {mode}: {e}")
+            return []
+
+    def _vector_hits(self, embedding: List[float], k: int, filter: Optional[Dict[str, Any]]) -> List[Tuple[int, float]]:
+        """Top-k de FAISS como pares (vector_id, distancia L2); requiere el lock del índice"""
+        return self._vector_hits_batch(np.asarray([embedding], dtype=np.float32), [k], [filter])[0]
+
+    def _vector_hits_batch(
+        self,
+        vectors: np.ndarray,
+        ks: List[int],
+        filters: List[Optional[Dict[str, Any]]]
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k de FAISS de varias consultas; requiere el lock del índice
+        
+        Las consultas sin filtro comparten una sola búsqueda con el mayor k del lote y
+        cada una conserva sus primeros k; las filtradas se buscan por separado porque
+        cada filtro restringe un subconjunto distinto.
+        
+        Args:
+            vectors: Consultas (n, d) float32
+            ks: Número de resultados por consulta
+            filters: Filtro de metadatos por consulta
+            
+        Returns:
+            Pares (vector_id, distancia L2) de cada consulta
+        """
+        hits: List[List[Tuple[int, float]]] = [[] for _ in ks]
+        
+        unfiltered = [position for position, filter in enumerate(filters) if not filter]
+        if unfiltered:
+            params = index_factory.search_parameters(self.vector_db, self._tombstone_filter())
+            distances, ids = self.vector_db.search(
+                vectors[unfiltered], max(ks[position] for position in unfiltered), params=params
+            )
+            for row, position in enumerate(unfiltered):
+                hits[position] = self._row_hits(ids[row, :ks[position]], distances[row, :ks[position]])
+        
+        for position, filter in enumerate(filters):
+            if filter:
+                distances, ids = self._filtered_search(
+                    vectors[position:position + 1], ks[position], self._ids_matching_filter(filter)
+                )
+                hits[position] = self._row_hits(ids[0], distances[0])
+        
+        return hits
+
+    @staticmethod
+    def _row_hits(ids: np.ndarray, distances: np.ndarray) -> List[Tuple[int, float]]:
+        """Pares (vector_id, distancia) de una fila de resultados FAISS, sin los huecos (-1)"""
+        return [
+            (vector_id, score) for vector_id, score in zip(ids.tolist(), distances.tolist())
+            if vector_id != -1
+        ]
+
+    def _lexical_hits(self, query: str, k: int, filter: Optional[Dict[str, Any]]) -> List[Tuple[int, float]]:
+        """Top-k de BM25 como pares (vector_id, puntaje); requiere el lock del índice"""
+        allowed_ids = self._ids_matching_filter(filter) if filter else None
+        ids, scores = self.lexical_index.search(query, k, allowed_ids)
+        return list(zip(ids.tolist(), scores.tolist()))
+
+    @staticmethod
+    def _fuse_rankings(rankings: List[List[Tuple[int, float]]], rrf_k: int) -> List[Tuple[int, float]]:
+        """
+        Reciprocal rank fusion: cada lista aporta 1 / (rrf_k + posición) a sus IDs
+        
+        Args:
+            rankings: Listas de (vector_id, puntaje) ya ordenadas de mejor a peor
+            rrf_k: Constante que suaviza el peso de las primeras posiciones
+            
+        Returns:
+            Pares (vector_id, puntaje RRF) de mayor a menor puntaje
+        """
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, (vector_id, _) in enumerate(ranking, 1):
+                fused[vector_id] = fused.get(vector_id, 0.0) + 1.0 / (rrf_k + rank)
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+    def _results_for(
+        self,
+        hits: List[Tuple[int, float]],
+        chunks: Optional[Dict[int, DocumentChunk]] = None
+    ) -> List[SearchResult]:
+        """Convierte pares (vector_id, puntaje) en resultados leyendo el texto del almacén (o de `chunks`)"""
+        # El texto se lee del almacén solo para los resultados encontrados
+        if chunks is None:
+            chunks = self.chunk_store.get_many([vector_id for vector_id, _ in hits])
+        
+        results = []
+        for vector_id, score in hits:
+            chunk = chunks.get(vector_id)
+            
+            if chunk:
+                results.append(SearchResult(
+                    text=chunk.text,
+                    document_name=chunk.document_name,
+                    score=float(score),
+                    chunk_index=chunk.chunk_index,
+                    page=chunk.page
+                ))
+        return results
+
     def similarity_search_by_document(self, query: str, document_name: str, k: int = None) -> List[SearchResult]:
         """
         Busca similitud solo dentro de un documento específico
@@ -202,34 +690,51 @@ class EmbeddingsService:
         relevant_texts = [f"[{result.document_name}]: {result.text}" for result in search_results]
         return '\n\n'.join(relevant_texts)
 
-    def get_database_stats(self) -> Dict[str, Any]:
+    def get_database_stats(self, load: bool = True) -> Dict[str, Any]:
         """
         Obtiene estadísticas de la base de datos vectorial
         
+        No consulta la versión publicada ni espera al lock del índice: describe el
+        índice que este worker tiene cargado (las recargas las hacen las búsquedas en el
+        executor del índice o el hilo de `start_index_watcher`).
+        
+        Args:
+            load: Cargar el índice si todavía no se cargó; con False la llamada es O(1)
+                y puede hacerse desde el event loop
+        
         Returns:
             Diccionario con estadísticas
         """
-        if not self.vector_db:
+        if load:
+            self.ensure_loaded()
+        vector_db = self.vector_db
+        if not vector_db:
             return {
                 "total_vectors": 0,
                 "total_documents": 0,
                 "unique_sources": 0,
-                "index_exists": False
+                "index_exists": False,
+                "index_loaded": self._loaded
             }
         
-        unique_sources = set()
-        total_documents = len(self.document_mapping)
-        
-        for doc in self.document_mapping.values():
-            unique_sources.add(doc.document_name)
+        # Contadores mantenidos al ingestar y eliminar: no recorren los chunks ni
+        # bloquean mientras una ingesta mantiene el lock del índice
+        stats = self.index_stats
+        sources = stats.sources()
         
         return {
-            "total_vectors": self.vector_db.index.ntotal,
-            "total_documents": total_documents,
-            "unique_sources": len(unique_sources),
-            "source_list": list(unique_sources),
+            "total_vectors": vector_db.ntotal - len(self._tombstones),
+            "index_type": index_factory.index_type_of(vector_db),
+            "total_documents": stats.total_chunks,
+            "total_bytes": stats.total_bytes,
+            "unique_sources": len(sources),
+            "source_list": list(sources),
+            "sources": sources,
+            "file_types": stats.file_types(),
             "index_exists": True,
-            "embedding_dimension": self.vector_db.index.d if hasattr(self.vector_db.index, 'd') else None
+            "embedding_dimension": vector_db.d,
+            "lexical_documents": len(self.lexical_index),
+            "index_loaded": True
         }
 
     def delete_documents_by_source(self, document_name: str) -> bool:
@@ -243,42 +748,24 @@ class EmbeddingsService:
             True si se eliminó exitosamente
         """
         try:
-            ids_to_remove = [
-                doc_id for doc_id, chunk in self.document_mapping.items()
-                if chunk.document_name == document_name
-            ]
-            
-            if not ids_to_remove:
-                print(f"No se encontraron documentos con el nombre: {document_name}")
-                return False
-            
-            for doc_id in ids_to_remove:
-                del self.document_mapping[doc_id]
-            
-            if self.vector_db and self.document_mapping:
-                remaining_docs = []
-                for chunk in self.document_mapping.values():
-                    doc_id = f"{chunk.document_name}_{chunk.chunk_index}"
-                    metadata = {
-                        "source": chunk.document_name,
-                        "chunk_index": chunk.chunk_index,
-                        "doc_id": doc_id,
-                        "created_at": chunk.created_at.isoformat(),
-                        "text_length": len(chunk.text),
-                        "file_type": self._get_file_type(chunk.document_name)
-                    }
+            with self._exclusive_write():
+                with self._index_lock:
+                    if document_name not in self.source_index:
+                        print(f"No se encontraron documentos con el nombre: {document_name}")
+                        return False
                     
-                    remaining_docs.append(Document(
-                        page_content=chunk.text,
-                        metadata=metadata
-                    ))
+                    removed = self._remove_source(document_name)
+                    
+                    if not self.source_index:
+                        self.reset_database()
                 
-                self.vector_db = FAISS.from_documents(remaining_docs, self.embeddings)
-                self._save_index()
-            elif not self.document_mapping:
-                self.reset_database()
+                if self.source_index:
+                    # Un HNSW con demasiadas marcas de borrado se compacta antes de persistir
+                    self._maybe_rebuild_index()
+                    with self._index_lock:
+                        self._save_index()
             
-            print(f"Documentos eliminados: {len(ids_to_remove)} chunks de '{document_name}'")
+            print(f"Documentos eliminados: {removed} chunks de '{document_name}'")
             return True
             
         except Exception as e:
@@ -287,74 +774,609 @@ class EmbeddingsService:
 
     def reset_database(self):
         """Reinicia la base de datos vectorial y limpia la persistencia"""
+        with self.writer_lock, self._index_lock:
+            self._clear_state()
+            self.chunk_store.clear()
+            self._invalidate_search_cache()
+            
+            try:
+                if self.index_path.exists():
+                    import shutil
+                    shutil.rmtree(self.index_path, ignore_errors=True)
+                if self.metadata_path.exists():
+                    self.metadata_path.unlink()
+            except Exception as e:
+                print(f"Error limpiando archivos persistentes: {e}")
+            
+            self._loaded_version = self.index_version.publish()
+        
+        print("Base de datos vectorial reiniciada completamente")
+
+    def sync_with_disk(self, force: bool = False) -> bool:
+        """
+        Recarga el índice si otro worker publicó una versión nueva
+        
+        El índice nuevo se abre mapeado en memoria y reemplaza al actual bajo el lock
+        del índice, así ninguna búsqueda ve un estado a medias. Fuera de `force`, la
+        versión se consulta como máximo una vez por `index_reload_interval_seconds`.
+        
+        Args:
+            force: Consultar la versión sin esperar el intervalo
+            
+        Returns:
+            True si se recargó el índice
+        """
+        self.ensure_loaded()
+        version = self.index_version.read() if force else self.index_version.poll()
+        if version is None or version == self._loaded_version:
+            return False
+        
+        with self._index_lock:
+            if version == self._loaded_version:
+                return False
+            self._clear_state()
+            self._loaded_version = version
+            self._load_existing_index(repair=False)
+            self._invalidate_search_cache()
+        
+        print(f"Índice recargado desde disco (versión {version})")
+        return True
+
+    def start_index_watcher(self):
+        """
+        Inicia un hilo de fondo que recarga el índice cuando otro worker publica una versión
+        
+        Consulta la versión cada `index_reload_interval_seconds`, así la recarga no la
+        paga la primera búsqueda que llega después de la escritura. Es idempotente.
+        """
+        if self._index_watcher is not None:
+            return
+        self._stop_index_watcher.clear()
+        self._index_watcher = threading.Thread(target=self._watch_index_version, name="index-watcher", daemon=True)
+        self._index_watcher.start()
+
+    def stop_index_watcher(self):
+        """Detiene el hilo de `start_index_watcher` y espera a que termine"""
+        if self._index_watcher is None:
+            return
+        self._stop_index_watcher.set()
+        self._index_watcher.join()
+        self._index_watcher = None
+
+    def _watch_index_version(self):
+        """Bucle del hilo de recarga"""
+        interval = max(settings.index_reload_interval_seconds, 0.05)
+        while not self._stop_index_watcher.wait(interval):
+            try:
+                self.sync_with_disk(force=True)
+            except Exception as e:
+                print(f"Error recargando índice: {e}")
+
+    @contextmanager
+    def _exclusive_write(self):
+        """Toma el lock de escritura entre procesos y parte de la última versión publicada"""
+        with self.writer_lock:
+            self.sync_with_disk(force=True)
+            yield
+
+    def _clear_state(self):
+        """Descarta el índice cargado en memoria sin tocar los archivos"""
         self.vector_db = None
-        self.document_mapping.clear()
+        self._index_is_mapped = False
+        self._tombstones.clear()
+        self._tombstone_selector = None
+        self.lexical_index.clear()
+        self.source_index.clear()
+        self.file_type_index.clear()
+        self.index_stats.clear()
+        self.next_vector_id = 0
+
+    def _create_empty_index(self, dimension: int) -> faiss.Index:
+        """
+        Crea un índice FAISS vacío que acepta IDs estables por chunk
+        
+        Args:
+            dimension: Dimensión de los embeddings
+            
+        Returns:
+            Índice sin vectores
+        """
+        return index_factory.create_empty_index(dimension)
+
+    def _ids_matching_filter(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Obtiene los IDs de vector que cumplen un filtro de metadatos usando los índices invertidos
+        
+        Args:
+            filter: Filtro por "source" y/o "file_type"
+            
+        Returns:
+            Arreglo int64 con los IDs permitidos
+        """
+        unsupported = set(filter) - {"source", "file_type"}
+        if unsupported:
+            raise ValueError(f"Filtro no soportado: {', '.join(sorted(unsupported))}")
+        
+        if "source" in filter:
+            sources = {filter["source"]} if filter["source"] in self.source_index else set()
+            if "file_type" in filter:
+                sources &= self.file_type_index.get(filter["file_type"], set())
+        else:
+            sources = self.file_type_index.get(filter["file_type"], set())
+        
+        if not sources:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.source_index.ids(source) for source in sources])
+
+    def _filtered_search(self, vector: np.ndarray, k: int, allowed_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k exacto restringido a un subconjunto de vectores
+        
+        Los subconjuntos pequeños se comparan directamente contra sus vectores (costo
+        proporcional al subconjunto); los grandes se buscan en el índice con un selector
+        de IDs, de modo que nunca se pierden resultados por filtrar después.
+        
+        Args:
+            vector: Consulta (1, d) float32
+            k: Número de resultados
+            allowed_ids: IDs permitidos
+            
+        Returns:
+            Tupla (distancias, IDs) con forma (1, k); los huecos se rellenan con -1
+        """
+        if not len(allowed_ids):
+            return np.empty((1, 0), dtype=np.float32), np.empty((1, 0), dtype=np.int64)
+        
+        if len(allowed_ids) <= settings.faiss_prefilter_exact_max_vectors:
+            vectors = self.vector_db.reconstruct_batch(allowed_ids)
+            distances, positions = faiss.knn(vector, vectors, min(k, len(allowed_ids)))
+            return distances, allowed_ids[positions]
+        
+        selector = faiss.IDSelectorBatch(allowed_ids)
+        return self.vector_db.search(vector, k, params=index_factory.search_parameters(self.vector_db, selector))
+
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Calcula embeddings de chunks consultando primero la caché persistente
+        
+        Args:
+            texts: Textos a convertir
+            
+        Returns:
+            Matriz (n, d) de embeddings en float32
+        """
+        if not self.embedding_cache:
+            return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        
+        cached = self.embedding_cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = np.asarray(self.embeddings.embed_documents(missing_texts), dtype=np.float32)
+            self.embedding_cache.put_many(missing_texts, computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+        
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Calcula el embedding de una consulta (usa la caché de consultas recientes)
+        
+        Args:
+            query: Texto de la consulta
+            
+        Returns:
+            Embedding de la consulta
+        """
+        return self._embed_query(query)
+
+    def _embed_query(self, query: str) -> List[float]:
+        """
+        Calcula el embedding de una consulta reutilizando consultas recientes
+        
+        Args:
+            query: Texto de la consulta
+            
+        Returns:
+            Embedding de la consulta
+        """
+        embedding = self.query_embedding_cache.get(query)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+            self.query_embedding_cache.put(query, embedding)
+        return embedding
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Calcula los embeddings de varias consultas en un solo lote del modelo
+        
+        Args:
+            queries: Textos de las consultas
+            
+        Returns:
+            Matriz (n, d) float32, en el orden de las consultas
+        """
+        embeddings = [self.query_embedding_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        
+        if missing:
+            computed = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for query, embedding in computed.items():
+                self.query_embedding_cache.put(query, embedding)
+            embeddings = [
+                embedding if embedding is not None else computed[query]
+                for query, embedding in zip(queries, embeddings)
+            ]
+        
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def _invalidate_search_cache(self):
+        """Avanza la generación del índice y descarta resultados y respuestas cacheados"""
+        self.index_generation += 1
+        self.search_result_cache.clear()
+        self.answer_cache.clear()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene estadísticas de las cachés del servicio
+        
+        Returns:
+            Diccionario con las estadísticas de cada caché
+        """
+        return {
+            "index_generation": self.index_generation,
+            "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None,
+            "query_embeddings": self.query_embedding_cache.get_stats(),
+            "search_results": self.search_result_cache.get_stats(),
+            "answers": self.answer_cache.get_stats()
+        }
+
+    def _add_vectors(self, vectors: np.ndarray, chunks: List[DocumentChunk]):
+        """
+        Agrega vectores ya calculados al índice asignándoles IDs estables
+        
+        Args:
+            vectors: Matriz de embeddings (n, d) en float32
+            chunks: Chunks correspondientes a cada vector
+        """
+        vector_ids = np.arange(self.next_vector_id, self.next_vector_id + len(chunks), dtype=np.int64)
+        self.next_vector_id += len(chunks)
+        doc_ids = [f"{chunk.document_name}_{chunk.chunk_index}" for chunk in chunks]
+        file_types = [self._get_file_type(chunk.document_name) for chunk in chunks]
         
+        self._ensure_writable()
+        self.chunk_store.add(zip(vector_ids.tolist(), doc_ids, chunks, file_types))
+        self.vector_db.add_with_ids(vectors, vector_ids)
+        self.lexical_index.add(vector_ids.tolist(), [chunk.text for chunk in chunks])
+        
+        positions: Dict[str, List[int]] = {}
+        for position, chunk in enumerate(chunks):
+            positions.setdefault(chunk.document_name, []).append(position)
+        for document_name, document_positions in positions.items():
+            self._index_source(document_name, vector_ids[document_positions])
+            self.index_stats.add(
+                document_name,
+                self._get_file_type(document_name),
+                len(document_positions),
+                sum(len(chunks[position].text.encode("utf-8")) for position in document_positions)
+            )
+        
+        self._invalidate_search_cache()
+
+    def _remove_source(self, document_name: str) -> int:
+        """
+        Elimina del índice solo los vectores de un documento, sin recalcular embeddings
+        
+        Args:
+            document_name: Nombre del documento a eliminar
+            
+        Returns:
+            Número de chunks eliminados
+        """
+        vector_ids, _ = self._detach_source(document_name)
+        if not len(vector_ids) or not self.vector_db:
+            return 0
+        
+        self._delete_vectors(vector_ids)
+        return len(vector_ids)
+
+    def _detach_source(self, document_name: str) -> Tuple[np.ndarray, Optional[Tuple[str, int, int]]]:
+        """
+        Quita un documento de los índices por documento y de las estadísticas, dejando
+        sus vectores en FAISS, el almacén y el índice léxico
+        
+        Args:
+            document_name: Nombre del documento
+            
+        Returns:
+            Tupla (IDs de vector, contadores de IndexStats) del documento
+        """
+        vector_ids = self.source_index.pop(document_name)
+        counters = self.index_stats.remove(document_name)
+        sources_of_type = self.file_type_index.get(self._get_file_type(document_name))
+        if sources_of_type is not None:
+            sources_of_type.discard(document_name)
+        return vector_ids, counters
+
+    def _delete_vectors(self, vector_ids: np.ndarray):
+        """Borra vectores de FAISS, del almacén de chunks y del índice léxico"""
+        if not len(vector_ids):
+            return
+        
+        self._remove_vector_ids(vector_ids)
+        self.chunk_store.delete(vector_ids)
+        self.lexical_index.remove(vector_ids)
+        self._invalidate_search_cache()
+
+    def _index_source(self, document_name: str, vector_ids: np.ndarray):
+        """Registra vectores de un documento en los índices invertidos por documento y tipo de archivo"""
+        if not len(vector_ids):
+            return
+        if document_name not in self.source_index:
+            self.file_type_index.setdefault(self._get_file_type(document_name), set()).add(document_name)
+        self.source_index.add(document_name, vector_ids)
+
+    def _remove_vector_ids(self, vector_ids: np.ndarray):
+        """Quita vectores del índice FAISS o los marca como borrados si el índice no lo admite"""
+        if not index_factory.supports_removal(self.vector_db):
+            self._tombstones.update(int(vector_id) for vector_id in vector_ids)
+            self._tombstone_selector = None
+            return
+        self._ensure_writable()
+        self.vector_db.remove_ids(np.asarray(vector_ids, dtype=np.int64))
+
+    def _tombstone_filter(self) -> Optional[faiss.IDSelector]:
+        """Selector que excluye los vectores marcados como borrados (se reutiliza entre búsquedas)"""
+        if not self._tombstones:
+            return None
+        if self._tombstone_selector is None:
+            deleted = faiss.IDSelectorBatch(np.fromiter(self._tombstones, dtype=np.int64))
+            # Se conserva también el selector interno: IDSelectorNot no es su dueño
+            self._tombstone_selector = (deleted, faiss.IDSelectorNot(deleted))
+        return self._tombstone_selector[1]
+
+    def _maybe_rebuild_index(self):
+        """
+        Reconstruye el índice con el tipo configurado cuando corresponde (entrenamiento
+        IVF al alcanzar el tamaño mínimo, cambio de tipo o compactación de HNSW)
+        
+        El entrenamiento se hace fuera del lock para no bloquear las búsquedas; si el
+        índice cambia mientras tanto, se descarta y se reintenta en la próxima ingesta.
+        """
         try:
-            if self.index_path.exists():
-                import shutil
-                shutil.rmtree(self.index_path.parent, ignore_errors=True)
-            if self.metadata_path.exists():
-                self.metadata_path.unlink()
+            with self._index_lock:
+                if not self.vector_db or not index_factory.should_rebuild(
+                    self.vector_db, self.vector_db.ntotal - len(self._tombstones), len(self._tombstones)
+                ):
+                    return
+                generation = self.index_generation
+                vectors, ids = index_factory.reconstruct_all(self.vector_db)
+                if self._tombstones:
+                    live = ~np.isin(ids, np.fromiter(self._tombstones, dtype=np.int64))
+                    vectors, ids = vectors[live], ids[live]
+            
+            index = index_factory.build_index(vectors, ids)
+            
+            with self._index_lock:
+                if self.index_generation != generation:
+                    print("El índice cambió durante la reconstrucción; se reintentará en la próxima ingesta")
+                    return
+                self.vector_db = index
+                self._index_is_mapped = False
+                self._tombstones.clear()
+                self._tombstone_selector = None
+                self._invalidate_search_cache()
+            
+            print(f"Índice reconstruido como {index_factory.index_type_of(index)} con {len(ids)} vectores")
+            
         except Exception as e:
-            print(f"Error limpiando archivos persistentes: {e}")
-        
-        print("Base de datos vectorial reiniciada completamente")
+            print(f"Error reconstruyendo índice: {e}")
+
+    def _ensure_writable(self):
+        """
+        Carga en memoria propia un índice abierto con mmap antes de modificarlo;
+        el archivo mapeado nunca se escribe en su lugar
+        """
+        if self._index_is_mapped:
+            # Ni clone_index ni add/remove admiten datos mapeados (FAISS aborta): se relee el
+            # archivo, que es idéntico al índice mapeado mientras no haya cambios
+            self.vector_db = faiss.read_index(str(self.index_file))
+            self._index_is_mapped = False
+
+    def _indexed_ids(self) -> np.ndarray:
+        """IDs de vector presentes en el índice FAISS"""
+        return index_factory.stored_ids(self.vector_db)
 
     def _get_file_type(self, filename: str) -> str:
         """Extrae el tipo de archivo de un nombre de archivo"""
         return Path(filename).suffix.lower()
 
     def _save_index(self):
-        """Guarda el índice FAISS y metadatos en disco"""
+        """
+        Guarda el índice FAISS y el léxico en disco (los chunks ya se escribieron de forma incremental)
+        
+        Se escribe a un archivo temporal y se reemplaza de forma atómica, de modo que los
+        procesos que tienen el índice anterior mapeado en memoria no leen un archivo a medias.
+        """
         try:
             if self.vector_db:
-                self.vector_db.save_local(str(self.index_path))
-                
-                metadata = {
-                    doc_id: {
-                        "text": chunk.text,
-                        "document_name": chunk.document_name,
-                        "chunk_index": chunk.chunk_index,
-                        "created_at": chunk.created_at.isoformat()
-                    }
-                    for doc_id, chunk in self.document_mapping.items()
-                }
-                
-                with open(self.metadata_path, 'w', encoding='utf-8') as f:
-                    json.dump(metadata, f, ensure_ascii=False, indent=2)
-                
+                self.index_path.mkdir(parents=True, exist_ok=True)
+                temp_file = self.index_file.with_name(self.index_file.name + ".tmp")
+                faiss.write_index(self.vector_db, str(temp_file))
+                os.replace(temp_file, self.index_file)
+                self.lexical_index.save(self.lexical_file)
+                self.index_stats.save(self.stats_file)
+                self._loaded_version = self.index_version.publish()
                 print(f"Índice guardado en: {self.index_path}")
                 
         except Exception as e:
             print(f"Error guardando índice: {e}")
 
-    def _load_existing_index(self):
-        """Carga un índice FAISS existente si está disponible"""
+    def _load_existing_index(self, repair: bool = True):
+        """
+        Carga el índice FAISS existente mapeado en memoria y de solo lectura
+        
+        Args:
+            repair: Corregir en disco las diferencias con el almacén de chunks; solo lo
+                hace quien tiene el lock de escritura, porque los chunks de una ingesta
+                en curso en otro worker todavía no están en el índice
+        """
         try:
-            if self.index_path.exists() and self.metadata_path.exists():
-                self.vector_db = FAISS.load_local(
-                    str(self.index_path), 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
+            if (self.index_path / "index.pkl").exists():
+                self._migrate_langchain_index()
+            elif self.index_file.exists():
+                # IO_FLAG_MMAP solo mapea las listas de IVF; MMAP_IFC también mapea los
+                # vectores de los índices planos y HNSW en lugar de copiarlos al heap
+                self.vector_db = faiss.read_index(
+                    str(self.index_file),
+                    faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
                 )
-                
-                with open(self.metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                from datetime import datetime
-                for doc_id, data in metadata.items():
-                    chunk = DocumentChunk(
-                        text=data["text"],
-                        document_name=data["document_name"],
-                        chunk_index=data["chunk_index"],
-                        created_at=datetime.fromisoformat(data["created_at"])
-                    )
-                    self.document_mapping[doc_id] = chunk
-                
-                print(f"Índice cargado exitosamente: {len(self.document_mapping)} documentos")
+                self._index_is_mapped = True
+            else:
+                return
+            
+            self._reconcile_with_chunk_store(repair)
+            
+            indexed_ids = self._indexed_ids()
+            self.next_vector_id = int(indexed_ids.max()) + 1 if len(indexed_ids) else 0
+            # Máscara por ID de vector: True si está en el índice FAISS y no fue borrado
+            live = np.zeros(self.next_vector_id, dtype=bool)
+            live[indexed_ids] = True
+            if self._tombstones:
+                live[np.fromiter(self._tombstones, dtype=np.int64)] = False
+            
+            for document_name, vector_ids in self.chunk_store.iter_source_ids():
+                vector_ids = vector_ids[vector_ids < len(live)]
+                self._index_source(document_name, vector_ids[live[vector_ids]])
+            
+            self._load_lexical_index(repair, live)
+            self._load_index_stats(repair)
+            
+            print(f"Índice cargado exitosamente: {self.chunk_store.count()} documentos")
                 
         except Exception as e:
             print(f"No se pudo cargar índice existente: {e}")
-            self.vector_db = None
-            self.document_mapping.clear()
\ No newline at end of file
+            self._clear_state()
+
+    def _load_index_stats(self, repair: bool):
+        """
+        Carga los contadores persistidos; si faltan o no coinciden con el índice por
+        documento (índice anterior a los contadores o guardado interrumpido) se
+        recalculan con una sola consulta agregada al almacén de chunks
+        
+        Args:
+            repair: Guardar los contadores recalculados
+        """
+        chunk_counts = {name: len(self.source_index.ids(name)) for name in self.source_index}
+        if self.stats_file.exists():
+            try:
+                self.index_stats = IndexStats.load(self.stats_file)
+                if self.index_stats.chunk_counts() == chunk_counts:
+                    return
+            except Exception as e:
+                print(f"No se pudieron cargar las estadísticas del índice: {e}")
+        
+        sizes = self.chunk_store.source_sizes()
+        self.index_stats = IndexStats.from_sources(
+            (name, self._get_file_type(name), chunks, sizes.get(name, 0))
+            for name, chunks in chunk_counts.items()
+        )
+        if repair:
+            self.index_stats.save(self.stats_file)
+        print(f"Estadísticas del índice recalculadas: {len(chunk_counts)} documentos")
+
+    def _load_lexical_index(self, repair: bool, live: np.ndarray):
+        """
+        Carga el índice léxico persistido; si falta o no coincide con el índice FAISS
+        (índice anterior a BM25 o guardado interrumpido) se reconstruye desde los textos
+        
+        Args:
+            repair: Guardar el índice reconstruido
+            live: Máscara por ID de vector de los vigentes en el índice FAISS
+        """
+        if self.lexical_file.exists():
+            try:
+                self.lexical_index = LexicalIndex.load(self.lexical_file, settings.bm25_k1, settings.bm25_b)
+                if len(self.lexical_index) == int(live.sum()):
+                    return
+            except Exception as e:
+                print(f"No se pudo cargar el índice léxico: {e}")
+        
+        self.lexical_index = LexicalIndex(settings.bm25_k1, settings.bm25_b)
+        for vector_id, text in self.chunk_store.iter_texts():
+            if vector_id < len(live) and live[vector_id]:
+                self.lexical_index.add([vector_id], [text])
+        if repair:
+            self.index_path.mkdir(parents=True, exist_ok=True)
+            self.lexical_index.save(self.lexical_file)
+        print(f"Índice léxico reconstruido: {len(self.lexical_index)} chunks")
+
+    def _migrate_langchain_index(self):
+        """
+        Convierte una sola vez un índice guardado con FAISS.save_local de LangChain
+        (docstore en pickle) al formato actual: índice FAISS con IDs estables y chunks en
+        el almacén. Si existe el metadata.json heredado se importa y se conserva renombrado.
+        """
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+        
+        legacy = FAISS.load_local(
+            str(self.index_path),
+            self.embeddings,
+            allow_dangerous_deserialization=True
+        )
+        
+        index = legacy.index
+        if not isinstance(index, faiss.IndexIDMap2):
+            # Índice plano: los IDs eran posiciones
+            vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.empty((0, index.d), dtype=np.float32)
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(legacy.index.d))
+            index.add_with_ids(vectors, np.arange(legacy.index.ntotal, dtype=np.int64))
+        
+        if self.metadata_path.exists():
+            vector_ids_by_doc_id: Dict[str, List[int]] = {}
+            for vector_id, store_id in legacy.index_to_docstore_id.items():
+                doc = legacy.docstore.search(store_id)
+                if isinstance(doc, Document):
+                    vector_ids_by_doc_id.setdefault(doc.metadata["doc_id"], []).append(vector_id)
+            
+            migrated = self.chunk_store.migrate_from_json(self.metadata_path, vector_ids_by_doc_id, self._get_file_type)
+            self.metadata_path.rename(self.metadata_path.with_name(self.metadata_path.name + ".migrated"))
+            print(f"metadata.json migrado al almacén de chunks: {migrated} chunks")
+        
+        self.vector_db = index
+        self._index_is_mapped = False
+        self._save_index()
+        (self.index_path / "index.pkl").unlink()
+        print("Índice de LangChain convertido al formato mapeable en memoria")
+
+    def _reconcile_with_chunk_store(self, repair: bool = True):
+        """
+        Alinea índice y almacén tras una interrupción entre la escritura de chunks
+        (incremental) y el guardado del índice
+        
+        Args:
+            repair: Borrar los chunks huérfanos y guardar el índice; sin esto solo se
+                excluyen en memoria los vectores sin chunk
+        """
+        indexed_ids = self._indexed_ids()
+        stored_ids = np.fromiter(self.chunk_store.vector_ids(), dtype=np.int64)
+        
+        orphan_vectors = np.setdiff1d(indexed_ids, stored_ids)
+        if len(orphan_vectors):
+            self._remove_vector_ids(orphan_vectors.tolist())
+        
+        if not repair:
+            return
+        
+        orphan_chunks = np.setdiff1d(stored_ids, indexed_ids)
+        if len(orphan_chunks):
+            self.chunk_store.delete(orphan_chunks.tolist())
+        
+        if len(orphan_vectors) or len(orphan_chunks):
+            # Las marcas de borrado de HNSW se reconstruyen así en cada arranque, sin reescribir el índice
+            if len(orphan_chunks) or index_factory.supports_removal(self.vector_db):
+                self._save_index()
+            print(f"Índice reconciliado: {len(orphan_vectors)} vectores y {len(orphan_chunks)} chunks huérfanos eliminados")
@@ -0,0 +1,121 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import multiprocessing
+import threading
+import sys
+import os
+
+# Agregar el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from exceptions import ServiceBusyError
+
+
+class ComputeExecutor:
+    """
+    Ejecuta trabajo síncrono pesado (embeddings, FAISS, análisis de archivos) fuera del event loop
+
+    Usa un pool de tamaño fijo y una cola acotada: cuando hay más tareas pendientes
+    que `max_workers + max_queue_size` se rechazan con ServiceBusyError en lugar de
+    acumularse indefinidamente. Con `use_processes` el pool es de procesos, para
+    trabajo de CPU en Python puro que no libera el GIL (las funciones y sus
+    argumentos deben poder serializarse con pickle).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue_size: int, use_processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue_size
+        if use_processes:
+            # Los procesos se inician al primer envío; "spawn" evita heredar hilos y locks del servidor
+            self._pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context(settings.parse_process_start_method)
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Encola una función síncrona en el pool sin esperar su resultado
+
+        Args:
+            func: Función a ejecutar
+            *args: Argumentos posicionales
+            **kwargs: Argumentos nombrados
+
+        Returns:
+            Future de concurrent.futures con el resultado
+
+        Raises:
+            ServiceBusyError: Si la cola del executor está llena
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ServiceBusyError(
+                    f"El servicio está ocupado ({self.name}), intente nuevamente en unos segundos",
+                    {"executor": self.name, "pending": self._pending}
+                )
+            self._pending += 1
+
+        try:
+            future = self._pool.submit(func, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecuta una función síncrona en el pool y espera su resultado
+
+        Args:
+            func: Función a ejecutar
+            *args: Argumentos posicionales
+            **kwargs: Argumentos nombrados
+
+        Returns:
+            Resultado de la función
+
+        Raises:
+            ServiceBusyError: Si la cola del executor está llena
+        """
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def _release(self, future: Optional[Future] = None):
+        """Libera un lugar de la cola cuando una tarea termina o se cancela"""
+        with self._lock:
+            self._pending -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado del executor
+
+        Returns:
+            Diccionario con tareas pendientes, capacidad y rechazos
+        """
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self._rejected
+        }
+
+    def shutdown(self):
+        """Detiene el pool esperando a que terminen las tareas en curso"""
+        self._pool.shutdown(wait=True)
+
+
+# Pools separados: una ingesta larga no debe consumir los hilos que usan las búsquedas
+index_executor = ComputeExecutor("index", settings.index_executor_workers, settings.executor_queue_size)
+ingest_executor = ComputeExecutor("ingest", settings.ingest_job_workers, settings.ingest_job_queue_size)
+# Análisis de PDF/TXT en procesos: varios archivos se procesan en paralelo en distintos núcleos
+parse_executor = ComputeExecutor("parse", settings.parse_workers, settings.executor_queue_size, use_processes=True)
@@ -0,0 +1,249 @@
+from typing import Optional, Tuple
+import math
+import sys
+import os
+
+import faiss
+import numpy as np
+
+# Agregar el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+
+
+# Tipos de índice soportados en settings.faiss_index_type
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Puntos de entrenamiento por centroide que usa k-means de FAISS como máximo
+_TRAINING_POINTS_PER_CENTROID = 256
+
+
+def configured_index_type() -> str:
+    """
+    Obtiene el tipo de índice configurado
+
+    Returns:
+        Tipo de índice validado
+
+    Raises:
+        ValueError: Si el tipo configurado no existe
+    """
+    index_type = settings.faiss_index_type.lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice FAISS no soportado: {settings.faiss_index_type}")
+    return index_type
+
+
+def requires_training(index_type: str) -> bool:
+    """Indica si el tipo de índice necesita entrenarse antes de recibir vectores"""
+    return index_type in ("ivf_flat", "ivf_pq")
+
+
+def create_empty_index(dimension: int) -> faiss.Index:
+    """
+    Crea el índice vacío con el que arranca una base nueva
+
+    Los tipos IVF no pueden crearse sin datos de entrenamiento: hasta reunir
+    `faiss_train_min_vectors` se usa búsqueda exacta.
+
+    Args:
+        dimension: Dimensión de los embeddings
+
+    Returns:
+        Índice sin vectores
+    """
+    if configured_index_type() == "hnsw":
+        return _create_hnsw(dimension)
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """
+    Identifica el tipo de un índice creado por este módulo
+
+    Args:
+        index: Índice FAISS
+
+    Returns:
+        Uno de INDEX_TYPES
+    """
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Indica si el índice puede eliminar vectores (HNSW no; se usan marcas de borrado)"""
+    return index_type_of(index) != "hnsw"
+
+
+def should_rebuild(index: faiss.Index, live_vectors: int, tombstones: int) -> bool:
+    """
+    Decide si el índice debe reconstruirse con el tipo configurado
+
+    Ocurre al cambiar de tipo en la configuración, cuando un corpus con índice exacto
+    alcanza el tamaño mínimo para entrenar IVF, o cuando un HNSW acumula demasiadas
+    marcas de borrado.
+
+    Args:
+        index: Índice actual
+        live_vectors: Vectores vigentes
+        tombstones: Vectores marcados como borrados
+
+    Returns:
+        True si conviene reconstruir
+    """
+    target = configured_index_type()
+    current = index_type_of(index)
+
+    if current == target:
+        return target == "hnsw" and tombstones > settings.faiss_hnsw_compact_ratio * max(live_vectors, 1)
+    if requires_training(target):
+        return live_vectors >= settings.faiss_train_min_vectors
+    return True
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+    """
+    Construye el índice configurado (entrenándolo si hace falta) y agrega los vectores
+
+    Args:
+        vectors: Matriz (n, d) float32
+        ids: IDs de vector (n,) int64
+
+    Returns:
+        Índice poblado
+    """
+    index_type = configured_index_type()
+    dimension = vectors.shape[1]
+
+    if index_type == "hnsw":
+        index = _create_hnsw(dimension)
+    elif requires_training(index_type) and len(vectors) >= settings.faiss_train_min_vectors:
+        index = _create_ivf(index_type, dimension, len(vectors))
+        index.train(_training_sample(vectors, index.nlist))
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def stored_ids(index: faiss.Index) -> np.ndarray:
+    """
+    Obtiene los IDs de todos los vectores almacenados en el índice
+
+    Args:
+        index: Índice FAISS
+
+    Returns:
+        Arreglo int64 de IDs
+    """
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype(np.int64, copy=False)
+
+    ivf = faiss.extract_index_ivf(index)
+    invlists = ivf.invlists
+    ids = [
+        faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+        for list_no in range(ivf.nlist)
+        if invlists.list_size(list_no)
+    ]
+    return np.concatenate(ids).astype(np.int64, copy=False) if ids else np.empty(0, dtype=np.int64)
+
+
+def reconstruct_all(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recupera todos los vectores del índice con sus IDs
+
+    En IVF-PQ los vectores reconstruidos son aproximados (decodificados).
+
+    Args:
+        index: Índice FAISS
+
+    Returns:
+        Tupla (vectores float32 (n, d), IDs int64 (n,))
+    """
+    ids = stored_ids(index)
+    if not len(ids):
+        return np.empty((0, index.d), dtype=np.float32), ids
+    if isinstance(index, faiss.IndexIDMap):
+        return index.index.reconstruct_n(0, index.index.ntotal), ids
+    return index.reconstruct_batch(ids), ids
+
+
+def search_parameters(index: faiss.Index, selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """
+    Construye los parámetros de búsqueda del índice (nprobe, efSearch y filtro de IDs)
+
+    Args:
+        index: Índice FAISS
+        selector: Selector de IDs permitidos (opcional)
+
+    Returns:
+        Parámetros de búsqueda o None si no hacen falta
+    """
+    index_type = index_type_of(index)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = settings.faiss_nprobe
+    elif index_type == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = settings.faiss_hnsw_ef_search
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def _create_hnsw(dimension: int) -> faiss.Index:
+    """Crea un HNSW con IDs estables (los borrados se resuelven con marcas en la búsqueda)"""
+    index = faiss.index_factory(dimension, f"IDMap2,HNSW{settings.faiss_hnsw_m},Flat", faiss.METRIC_L2)
+    faiss.downcast_index(index.index).hnsw.efConstruction = settings.faiss_hnsw_ef_construction
+    return index
+
+
+def _create_ivf(index_type: str, dimension: int, num_vectors: int) -> faiss.Index:
+    """
+    Crea un índice IVF sin entrenar
+
+    Los IVF guardan los IDs por sí mismos (IndexIDMap no soporta borrar sobre IVF);
+    el mapa directo en tabla hash permite reconstruir y eliminar por ID.
+    """
+    nlist = settings.faiss_nlist or max(1, int(4 * math.sqrt(num_vectors)))
+    if index_type == "ivf_pq":
+        description = f"IVF{nlist},PQ{_pq_subquantizers(dimension)}x{settings.faiss_pq_nbits}"
+    else:
+        description = f"IVF{nlist},Flat"
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Mayor divisor de la dimensión que no supera `faiss_pq_m`"""
+    for m in range(min(settings.faiss_pq_m, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def _training_sample(vectors: np.ndarray, nlist: int) -> np.ndarray:
+    """Submuestra aleatoria con los puntos que k-means usaría como máximo"""
+    max_points = nlist * _TRAINING_POINTS_PER_CENTROID
+    if len(vectors) <= max_points:
+        return vectors
+    rows = np.random.default_rng(0).choice(len(vectors), size=max_points, replace=False)
+    return vectors[np.sort(rows)]
@@ -0,0 +1,140 @@
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+import json
+import os
+
+
+class IndexStats:
+    """
+    Contadores del índice por documento fuente y por tipo de archivo
+
+    Se actualizan de forma incremental al ingestar y eliminar documentos, así las
+    consultas de estado cuestan lo mismo sin importar el tamaño del corpus. Se
+    persisten junto al índice FAISS.
+    """
+
+    def __init__(self):
+        # document_name -> (file_type, chunks, bytes)
+        self._sources: Dict[str, Tuple[str, int, int]] = {}
+        self._file_types: Dict[str, Dict[str, int]] = {}
+        self.total_chunks = 0
+        self.total_bytes = 0
+
+    def add(self, document_name: str, file_type: str, chunks: int, size_bytes: int):
+        """
+        Suma chunks de un documento
+
+        Args:
+            document_name: Documento fuente
+            file_type: Extensión del documento
+            chunks: Chunks agregados
+            size_bytes: Bytes (UTF-8) del texto de esos chunks
+        """
+        _, previous_chunks, previous_bytes = self._sources.get(document_name, (file_type, 0, 0))
+        self._sources[document_name] = (file_type, previous_chunks + chunks, previous_bytes + size_bytes)
+
+        histogram = self._file_types.setdefault(file_type, {"documents": 0, "chunks": 0, "bytes": 0})
+        if not previous_chunks:
+            histogram["documents"] += 1
+        histogram["chunks"] += chunks
+        histogram["bytes"] += size_bytes
+        self.total_chunks += chunks
+        self.total_bytes += size_bytes
+
+    def remove(self, document_name: str):
+        """
+        Descuenta todos los chunks de un documento
+
+        Args:
+            document_name: Documento fuente
+        """
+        entry = self._sources.pop(document_name, None)
+        if entry is None:
+            return
+        file_type, chunks, size_bytes = entry
+
+        histogram = self._file_types[file_type]
+        histogram["documents"] -= 1
+        histogram["chunks"] -= chunks
+        histogram["bytes"] -= size_bytes
+        if not histogram["documents"]:
+            del self._file_types[file_type]
+        self.total_chunks -= chunks
+        self.total_bytes -= size_bytes
+        return entry
+
+    def clear(self):
+        """Reinicia los contadores"""
+        self._sources.clear()
+        self._file_types.clear()
+        self.total_chunks = 0
+        self.total_bytes = 0
+
+    def chunk_counts(self) -> Dict[str, int]:
+        """Chunks por documento fuente"""
+        return {document_name: chunks for document_name, (_, chunks, _) in list(self._sources.items())}
+
+    def sources(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Contadores por documento fuente
+
+        Returns:
+            Diccionario document_name -> {"file_type", "chunks", "bytes"}
+        """
+        return {
+            document_name: {"file_type": file_type, "chunks": chunks, "bytes": size_bytes}
+            for document_name, (file_type, chunks, size_bytes) in list(self._sources.items())
+        }
+
+    def file_types(self) -> Dict[str, Dict[str, int]]:
+        """
+        Histograma por tipo de archivo
+
+        Returns:
+            Diccionario file_type -> {"documents", "chunks", "bytes"}
+        """
+        return {file_type: dict(histogram) for file_type, histogram in list(self._file_types.items())}
+
+    def save(self, path: Path):
+        """
+        Guarda los contadores de forma atómica
+
+        Args:
+            path: Archivo JSON de destino
+        """
+        temp_path = path.with_name(path.name + ".tmp")
+        temp_path.write_text(json.dumps({"sources": self._sources}, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IndexStats":
+        """
+        Carga contadores guardados con `save`
+
+        Args:
+            path: Archivo JSON
+
+        Returns:
+            Contadores restaurados
+        """
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls.from_sources(
+            (document_name, file_type, chunks, size_bytes)
+            for document_name, (file_type, chunks, size_bytes) in data["sources"].items()
+        )
+
+    @classmethod
+    def from_sources(cls, sources: Iterable[Tuple[str, str, int, int]]) -> "IndexStats":
+        """
+        Construye los contadores a partir de los totales de cada documento
+
+        Args:
+            sources: Tuplas (document_name, file_type, chunks, bytes)
+
+        Returns:
+            Contadores
+        """
+        stats = cls()
+        for document_name, file_type, chunks, size_bytes in sources:
+            stats.add(document_name, file_type, chunks, size_bytes)
+        return stats
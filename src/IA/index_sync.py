@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import Optional
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializan los hilos del proceso
+    fcntl = None
+
+
+class WriterLock:
+    """
+    Lock de escritura del índice compartido entre procesos (flock sobre un archivo)
+
+    Con varios workers de uvicorn, el proceso que lo tiene es el único que escribe el
+    índice. Es reentrante dentro del hilo que lo tiene y además excluye a los otros
+    hilos del mismo proceso, que flock por sí solo no distingue.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Toma el lock
+
+        Args:
+            blocking: Si es False, no espera a que otro proceso lo libere
+
+        Returns:
+            True si se tomó el lock
+        """
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0 and not self._lock_file(blocking):
+            self._thread_lock.release()
+            return False
+        self._depth += 1
+        return True
+
+    def release(self):
+        """Libera el lock (el archivo se desbloquea al salir del último nivel)"""
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _lock_file(self, blocking: bool) -> bool:
+        """Bloquea el archivo de lock para el resto de los procesos"""
+        if fcntl is None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+
+class IndexVersion:
+    """
+    Archivo con la versión del índice persistido
+
+    El proceso que escribe publica una versión nueva después de cada guardado; los
+    demás la comparan con la que tienen cargada para saber cuándo recargar. La
+    consulta se limita a una cada `check_interval` segundos para no leer el archivo
+    en cada búsqueda.
+    """
+
+    def __init__(self, path: Path, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self._next_check = 0.0
+
+    def read(self) -> str:
+        """
+        Lee la versión publicada
+
+        Returns:
+            Versión actual ("" si nunca se publicó ninguna)
+        """
+        try:
+            return self.path.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return ""
+
+    def poll(self) -> Optional[str]:
+        """
+        Lee la versión publicada si ya pasó el intervalo desde la última consulta
+
+        Returns:
+            Versión actual o None si todavía no corresponde consultar
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return None
+        self._next_check = now + self.check_interval
+        return self.read()
+
+    def publish(self) -> str:
+        """
+        Publica una versión nueva de forma atómica (requiere el lock de escritura)
+
+        Returns:
+            Versión publicada
+        """
+        version = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        temp_path.write_text(version, encoding="utf-8")
+        os.replace(temp_path, self.path)
+        return version
@@ -0,0 +1,241 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+
+# Palabras y códigos con separadores internos ("AB-123", "3.5", "v2/beta") como un solo término
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Divide un texto en términos normalizados (minúsculas, sin tildes)
+
+    Args:
+        text: Texto a tokenizar
+
+    Returns:
+        Lista de términos en orden de aparición
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _TOKEN_PATTERN.findall(stripped)
+
+
+class LexicalIndex:
+    """
+    Índice invertido BM25 con postings en arreglos numpy
+
+    Las postings consolidadas se guardan en formato CSR (un arreglo de offsets por
+    término y arreglos planos de IDs y frecuencias), que se persiste y se carga en un
+    solo paso. Lo agregado desde la última consolidación va a listas pendientes por
+    término; los documentos eliminados se descartan al consultar (longitud 0) y
+    desaparecen de las postings en la siguiente consolidación.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._tfs = np.empty(0, dtype=np.int32)
+        self._pending: Dict[str, Tuple[List[int], List[int]]] = {}
+        # Longitud en términos de cada documento indexada por ID de vector (0 = ausente)
+        self._doc_lengths = np.zeros(0, dtype=np.int32)
+        self._live_docs = 0
+        self._total_length = 0
+        self._removed_since_compaction = 0
+
+    def add(self, vector_ids: Iterable[int], texts: Iterable[str]):
+        """
+        Indexa documentos nuevos
+
+        Args:
+            vector_ids: IDs de vector de cada documento (nunca reutilizados)
+            texts: Texto de cada documento
+        """
+        for vector_id, text in zip(vector_ids, texts):
+            vector_id = int(vector_id)
+            terms = tokenize(text)
+            self._ensure_capacity(vector_id)
+
+            frequencies: Dict[str, int] = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, frequency in frequencies.items():
+                ids, tfs = self._pending.setdefault(term, ([], []))
+                ids.append(vector_id)
+                tfs.append(frequency)
+
+            # Un documento sin términos ocupa longitud 1 para seguir contando como presente
+            self._doc_lengths[vector_id] = max(1, len(terms))
+            self._live_docs += 1
+            self._total_length += max(1, len(terms))
+
+    def remove(self, vector_ids: Iterable[int]):
+        """
+        Elimina documentos del índice
+
+        Args:
+            vector_ids: IDs de vector a eliminar
+        """
+        for vector_id in vector_ids:
+            vector_id = int(vector_id)
+            if vector_id >= len(self._doc_lengths) or not self._doc_lengths[vector_id]:
+                continue
+            self._total_length -= int(self._doc_lengths[vector_id])
+            self._doc_lengths[vector_id] = 0
+            self._live_docs -= 1
+            self._removed_since_compaction += 1
+
+    def search(self, query: str, k: int, allowed_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Obtiene los k documentos con mayor puntaje BM25
+
+        Args:
+            query: Consulta
+            k: Número de resultados
+            allowed_ids: IDs permitidos (None = todos)
+
+        Returns:
+            Tupla (IDs, puntajes) ordenada de mayor a menor puntaje
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if not self._live_docs or k <= 0:
+            return empty
+
+        average_length = self._total_length / self._live_docs
+        matched_ids, matched_scores = [], []
+
+        for term in set(tokenize(query)):
+            ids, tfs = self._postings(term)
+            live = self._doc_lengths[ids] > 0
+            if allowed_ids is not None:
+                live &= np.isin(ids, allowed_ids)
+            ids, tfs = ids[live], tfs[live].astype(np.float32)
+            if not len(ids):
+                continue
+
+            idf = np.log1p((self._live_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            lengths = self._doc_lengths[ids].astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * lengths / average_length)
+            matched_ids.append(ids)
+            matched_scores.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        if not matched_ids:
+            return empty
+
+        unique_ids, inverse = np.unique(np.concatenate(matched_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(matched_scores)).astype(np.float32)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return unique_ids[top], scores[top]
+
+    def compact(self):
+        """Consolida las postings pendientes y quita las de documentos eliminados"""
+        if not self._pending and not self._removed_since_compaction:
+            return
+
+        terms, offsets, id_parts, tf_parts = {}, [0], [], []
+        for term in set(self._terms) | set(self._pending):
+            ids, tfs = self._postings(term)
+            live = self._doc_lengths[ids] > 0
+            if not live.any():
+                continue
+            terms[term] = len(terms)
+            id_parts.append(ids[live])
+            tf_parts.append(tfs[live])
+            offsets.append(offsets[-1] + int(live.sum()))
+
+        self._terms = terms
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._ids = np.concatenate(id_parts) if id_parts else np.empty(0, dtype=np.int64)
+        self._tfs = np.concatenate(tf_parts) if tf_parts else np.empty(0, dtype=np.int32)
+        self._pending = {}
+        self._removed_since_compaction = 0
+
+    def clear(self):
+        """Elimina todos los documentos"""
+        self.__init__(self.k1, self.b)
+
+    def __len__(self) -> int:
+        return self._live_docs
+
+    def save(self, path: Path):
+        """
+        Consolida y guarda el índice de forma atómica
+
+        Args:
+            path: Archivo .npz de destino
+        """
+        self.compact()
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                terms=np.asarray(sorted(self._terms, key=self._terms.get), dtype=str),
+                offsets=self._offsets,
+                ids=self._ids,
+                tfs=self._tfs,
+                doc_lengths=self._doc_lengths
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        """
+        Carga un índice guardado con `save`
+
+        Args:
+            path: Archivo .npz
+
+        Returns:
+            Índice listo para consultar
+        """
+        index = cls(k1, b)
+        with np.load(path) as data:
+            index._terms = {term: slot for slot, term in enumerate(data["terms"].tolist())}
+            index._offsets = data["offsets"]
+            index._ids = data["ids"]
+            index._tfs = data["tfs"]
+            index._doc_lengths = data["doc_lengths"]
+        index._live_docs = int(np.count_nonzero(index._doc_lengths))
+        index._total_length = int(index._doc_lengths.sum())
+        return index
+
+    def live_ids(self) -> np.ndarray:
+        """IDs de vector de los documentos indexados"""
+        return np.flatnonzero(self._doc_lengths).astype(np.int64)
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Postings consolidadas más pendientes de un término"""
+        slot = self._terms.get(term)
+        if slot is None:
+            ids, tfs = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        else:
+            start, end = self._offsets[slot], self._offsets[slot + 1]
+            ids, tfs = self._ids[start:end], self._tfs[start:end]
+
+        pending = self._pending.get(term)
+        if pending:
+            ids = np.concatenate([ids, np.asarray(pending[0], dtype=np.int64)])
+            tfs = np.concatenate([tfs, np.asarray(pending[1], dtype=np.int32)])
+        return ids, tfs
+
+    def _ensure_capacity(self, vector_id: int):
+        """Agranda el arreglo de longitudes (al doble) para alojar un ID nuevo"""
+        if vector_id < len(self._doc_lengths):
+            return
+        capacity = max(vector_id + 1, 2 * len(self._doc_lengths), 1024)
+        grown = np.zeros(capacity, dtype=np.int32)
+        grown[:len(self._doc_lengths)] = self._doc_lengths
+        self._doc_lengths = grown
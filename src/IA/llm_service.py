@@ -1,32 +1,97 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from typing import Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import itertools
+import random
 import sys
 import os
+import threading
+
+import httpx
+
+try:
+    # El SDK de Google usa aiohttp para las llamadas asíncronas cuando está instalado
+    from aiohttp import ClientError as AiohttpClientError
+except ImportError:
+    AiohttpClientError = ()  # isinstance(x, ()) siempre es False
 
 # Agregar el directorio padre al path para importar config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import settings
+from exceptions import LLMServiceError, ServiceBusyError
+from .circuit_breaker import CircuitBreaker
+
+# Códigos HTTP que indican un fallo pasajero del proveedor (límite de cuota o caída temporal)
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
 
 
 class LLMService:
     """Servicio para el manejo del modelo de lenguaje (LLM)"""
     
     def __init__(self):
-        self.llm: Optional[ChatGoogleGenerativeAI] = None
-        self._initialize_llm()
+        # El cliente se crea al primer uso (o en el warm-up) para no demorar el arranque
+        self._llm: Optional[BaseChatModel] = None
+        self._llm_initialized = False
+        self._llm_lock = threading.Lock()
+        self.circuit_breaker = CircuitBreaker(
+            settings.llm_circuit_failure_threshold,
+            settings.llm_circuit_reset_seconds
+        )
+        # Semáforo del event loop en uso; se crea al primer llamado dentro de ese loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._retries = 0
+        self._timeouts = 0
+
+    @property
+    def llm(self) -> Optional[BaseChatModel]:
+        """Modelo de lenguaje, inicializado la primera vez que se usa"""
+        if not self._llm_initialized:
+            with self._llm_lock:
+                if not self._llm_initialized:
+                    self._initialize_llm()
+                    self._llm_initialized = True
+        return self._llm
+
+    @llm.setter
+    def llm(self, value: Optional[BaseChatModel]):
+        self._llm = value
+        self._llm_initialized = True
+
+    @property
+    def is_initialized(self) -> bool:
+        """Indica si ya se intentó crear el cliente del LLM"""
+        return self._llm_initialized
 
     def _initialize_llm(self):
-        """Inicializa el modelo de lenguaje Gemini"""
+        """Inicializa el modelo de lenguaje Gemini (o el modelo de prueba sin conexión)"""
         try:
-            if settings.gemini_api_key:
-                self.llm = ChatGoogleGenerativeAI(
+            if settings.llm_provider == "stub":
+                from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+                from langchain_core.messages import AIMessage
+                
+                # Responde siempre el mismo texto y lo transmite palabra por palabra
+                self._llm = GenericFakeChatModel(
+                    messages=itertools.cycle([AIMessage(content=settings.llm_stub_response)])
+                )
+                print("LLM de prueba (stub) inicializado")
+            elif settings.gemini_api_key:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                
+                self._llm = ChatGoogleGenerativeAI(
                     model=settings.llm_model,
                     temperature=settings.llm_temperature,
                     max_tokens=settings.llm_max_tokens,
                     top_p=settings.llm_top_p,
                     top_k=settings.llm_top_k,
                     google_api_key=settings.gemini_api_key,
+                    # Los reintentos y el circuit breaker son de este servicio: el SDK hace un solo
+                    # intento (en el SDK de Google, 0 significa "usar su política por defecto")
+                    max_retries=1,
+                    # Permite apuntar a un servidor local compatible (p. ej. un Gemini falso en pruebas)
+                    **({"base_url": settings.llm_api_endpoint} if settings.llm_api_endpoint else {})
                 )
                 print(f"LLM {settings.llm_model} inicializado correctamente")
             else:
@@ -34,7 +99,7 @@ class LLMService:
                 
         except Exception as e:
             print(f"Error: No se pudo inicializar Gemini LLM: {e}")
-            self.llm = None
+            self._llm = None
 
     def generate_response(self, query: str, context: str = "") -> str:
         """
@@ -63,6 +128,152 @@ class LLMService:
             print(f"Error generando respuesta: {e}")
             return f"Error al generar respuesta: {str(e)}"
 
+    async def agenerate_response(self, query: str, context: str = "") -> str:
+        """
+        Genera una respuesta de forma asíncrona con límite de tiempo, reintentos y control de concurrencia
+        
+        Cada intento tiene como máximo `llm_timeout_seconds`; los fallos pasajeros (timeouts,
+        errores de conexión, 429 y 5xx) se reintentan con espera exponencial con jitter.
+        Como mucho `llm_max_concurrency` llamadas se ejecutan a la vez y, tras varios fallos
+        seguidos, el circuito se abre y las llamadas se rechazan sin contactar al proveedor.
+        
+        Args:
+            query: Pregunta del usuario
+            context: Contexto relevante para responder la pregunta
+            
+        Returns:
+            Respuesta generada por el LLM
+            
+        Raises:
+            ValueError: Si el LLM no está disponible
+            ServiceBusyError: Si el circuito está abierto
+            LLMServiceError: Si el LLM falla tras agotar los reintentos
+        """
+        if not self.llm:
+            raise ValueError("El servicio de LLM no está disponible")
+        
+        if context:
+            prompt = self._create_context_prompt(query, context)
+        else:
+            prompt = query
+        
+        attempt = 0
+        while True:
+            self._check_circuit()
+            settled = False
+            try:
+                async with self._get_semaphore():
+                    self._in_flight += 1
+                    try:
+                        response = await asyncio.wait_for(self.llm.ainvoke(prompt), settings.llm_timeout_seconds)
+                    finally:
+                        self._in_flight -= 1
+                self.circuit_breaker.record_success()
+                settled = True
+                return response.content
+                
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._timeouts += 1
+                transient = self._is_transient(e)
+                if transient:
+                    self.circuit_breaker.record_failure()
+                    settled = True
+                
+                if not transient or attempt >= settings.llm_max_retries:
+                    print(f"Error generando respuesta: {e}")
+                    raise LLMServiceError(
+                        f"Error al generar respuesta: {str(e) or type(e).__name__}",
+                        {"attempts": attempt + 1}
+                    ) from e
+                
+                attempt += 1
+                self._retries += 1
+                await asyncio.sleep(self._backoff_delay(attempt))
+            finally:
+                # Un error no pasajero o una cancelación no deja abierto el circuito si era la llamada de prueba
+                if not settled:
+                    self.circuit_breaker.record_abandoned()
+
+    async def astream_response(self, query: str, context: str = "") -> AsyncIterator[str]:
+        """
+        Genera una respuesta en streaming, entregando los fragmentos a medida que llegan
+        
+        Args:
+            query: Pregunta del usuario
+            context: Contexto relevante para responder la pregunta
+            
+        Returns:
+            Iterador asíncrono de fragmentos de texto
+            
+        Raises:
+            ValueError: Si el LLM no está disponible
+        """
+        if not self.llm:
+            raise ValueError("El servicio de LLM no está disponible")
+        
+        if context:
+            prompt = self._create_context_prompt(query, context)
+        else:
+            prompt = query
+        
+        self._check_circuit()
+        settled = False
+        try:
+            async with self._get_semaphore():
+                self._in_flight += 1
+                try:
+                    async for chunk in self.llm.astream(prompt):
+                        if chunk.content:
+                            yield chunk.content
+                except Exception as e:
+                    if self._is_transient(e):
+                        self.circuit_breaker.record_failure()
+                        settled = True
+                    raise
+                finally:
+                    self._in_flight -= 1
+            self.circuit_breaker.record_success()
+            settled = True
+        finally:
+            # Incluye el cierre del stream por el cliente (GeneratorExit)
+            if not settled:
+                self.circuit_breaker.record_abandoned()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Semáforo que limita las llamadas concurrentes dentro del event loop actual"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _check_circuit(self):
+        """Rechaza la llamada si el circuito está abierto"""
+        if not self.circuit_breaker.allow_request():
+            raise ServiceBusyError(
+                "El servicio de LLM no responde, intente nuevamente en unos segundos",
+                {"circuit": self.circuit_breaker.state}
+            )
+
+    def _is_transient(self, error: Exception) -> bool:
+        """Indica si un error del proveedor merece reintentarse"""
+        # Los clientes HTTP del SDK (httpx, aiohttp) no derivan sus errores de red de los de Python
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError, httpx.TimeoutException)):
+            return True
+        if isinstance(error, AiohttpClientError) and not hasattr(error, "status"):
+            return True
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        try:
+            return int(code) in TRANSIENT_STATUS_CODES
+        except (TypeError, ValueError):
+            return False
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Espera antes del reintento `attempt` (exponencial con jitter completo)"""
+        ceiling = min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
     def _create_context_prompt(self, query: str, context: str) -> str:
         """
         Crea un prompt estructurado con contexto
@@ -84,13 +295,19 @@ Respuesta:"""
         
         return prompt_template.format(context=context, query=query)
 
-    def is_available(self) -> bool:
+    def is_available(self, initialize: bool = True) -> bool:
         """
         Verifica si el LLM está disponible
         
+        Args:
+            initialize: Crear el cliente si todavía no existe; con False no bloquea y,
+                antes del primer uso, solo indica si el proveedor está configurado
+        
         Returns:
             True si el LLM está disponible, False en caso contrario
         """
+        if not initialize and not self._llm_initialized:
+            return settings.llm_provider == "stub" or bool(settings.gemini_api_key)
         return self.llm is not None
 
     def get_model_info(self) -> dict:
@@ -101,6 +318,7 @@ Respuesta:"""
             Diccionario con información del modelo
         """
         return {
+            "provider": settings.llm_provider,
             "model": settings.llm_model,
             "temperature": settings.llm_temperature,
             "max_tokens": settings.llm_max_tokens,
@@ -108,3 +326,19 @@ Respuesta:"""
             "top_k": settings.llm_top_k,
             "available": self.is_available()
         }
+
+    def get_client_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado del cliente asíncrono del LLM
+        
+        Returns:
+            Diccionario con llamadas en curso, reintentos, timeouts y estado del circuito
+        """
+        return {
+            "max_concurrency": settings.llm_max_concurrency,
+            "in_flight": self._in_flight,
+            "timeout_seconds": settings.llm_timeout_seconds,
+            "retries": self._retries,
+            "timeouts": self._timeouts,
+            "circuit_breaker": self.circuit_breaker.get_stats()
+        }
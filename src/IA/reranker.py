@@ -0,0 +1,169 @@
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+import os
+import threading
+import time
+
+# Agregar el directorio padre al path para importar config y models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import SearchResult
+from config import settings
+
+# Peso de cada medición nueva en la estimación de segundos por par
+_ESTIMATE_WEIGHT = 0.3
+
+
+class CrossEncoderReranker:
+    """
+    Reordena candidatos de la búsqueda vectorial con un cross-encoder local
+
+    El modelo puntúa cada par (consulta, pasaje) por lotes cuyo tamaño sale del
+    tiempo por par medido en los lotes anteriores. Si el presupuesto de tiempo no
+    alcanza para puntuar todos los candidatos, se conserva el orden vectorial. El
+    modelo se carga al primer uso, fuera del presupuesto.
+    """
+
+    # Etapas cuyo tiempo se acumula en las estadísticas
+    STAGES = ("retrieve", "rerank", "pack")
+
+    def __init__(self, model: Any = None, model_name: Optional[str] = None):
+        self._model = model
+        self.model_name = model_name or settings.rerank_model
+        self._model_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._fallbacks = 0
+        self._stage_seconds = {stage: 0.0 for stage in self.STAGES}
+        self._last_timings: Dict[str, float] = {}
+        # Segundos por par medidos en los lotes anteriores (None hasta el primer lote)
+        self._seconds_per_pair: Optional[float] = None
+
+    @property
+    def model(self):
+        """Cross-encoder de sentence-transformers (se carga al primer uso)"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    @property
+    def is_model_loaded(self) -> bool:
+        """Indica si el cross-encoder ya está en memoria"""
+        return self._model is not None
+
+    def rerank(
+        self,
+        query: str,
+        candidates: List[SearchResult],
+        k: int,
+        budget_seconds: Optional[float] = None
+    ) -> Tuple[List[SearchResult], bool]:
+        """
+        Reordena los candidatos por la puntuación del cross-encoder y corta a top-k
+
+        Args:
+            query: Consulta
+            candidates: Resultados en orden vectorial
+            k: Número de resultados a devolver
+            budget_seconds: Tiempo máximo para puntuar (None = settings.rerank_budget_ms)
+
+        Returns:
+            Tupla (resultados, reordenados); si no se reordenaron son los primeros k
+            en orden vectorial
+        """
+        if budget_seconds is None:
+            budget_seconds = settings.rerank_budget_ms / 1000
+        if len(candidates) <= 1:
+            return candidates[:k], True
+        if budget_seconds <= 0:
+            return candidates[:k], False
+
+        model = self.model
+        batch_size = max(1, settings.rerank_batch_size)
+        pairs = [(query, candidate.text) for candidate in candidates]
+        scores: List[float] = []
+
+        started = time.perf_counter()
+        while len(scores) < len(pairs):
+            remaining = budget_seconds - (time.perf_counter() - started)
+            size = min(batch_size, len(pairs) - len(scores))
+            seconds_per_pair = self._seconds_per_pair
+            if seconds_per_pair is None:
+                # Sin medición previa, el primer lote es de un par para no arriesgar el presupuesto
+                size = 1
+            else:
+                # Lote más grande que, al ritmo medido, termina dentro del presupuesto
+                size = min(size, int(remaining / seconds_per_pair))
+                if size < 1:
+                    return candidates[:k], False
+
+            batch_started = time.perf_counter()
+            batch_scores = model.predict(pairs[len(scores):len(scores) + size], batch_size=size)
+            self._measure(time.perf_counter() - batch_started, size)
+            # Un lote que terminó fuera del presupuesto no se acepta
+            if time.perf_counter() - started > budget_seconds:
+                return candidates[:k], False
+            scores.extend(float(score) for score in batch_scores)
+
+        order = sorted(range(len(candidates)), key=lambda position: scores[position], reverse=True)
+        return [candidates[position] for position in order[:k]], True
+
+    def warm_up(self):
+        """Carga el modelo y mide el ritmo de puntuación con un lote de prueba"""
+        batch_size = max(1, settings.rerank_batch_size)
+        started = time.perf_counter()
+        self.model.predict([("warm-up", "warm-up")] * batch_size, batch_size=batch_size)
+        self._measure(time.perf_counter() - started, batch_size)
+
+    def _measure(self, seconds: float, pairs: int):
+        """Actualiza la estimación de segundos por par (media móvil exponencial)"""
+        with self._stats_lock:
+            measured = seconds / pairs
+            if self._seconds_per_pair is None:
+                self._seconds_per_pair = measured
+            else:
+                self._seconds_per_pair += _ESTIMATE_WEIGHT * (measured - self._seconds_per_pair)
+
+    def record(self, timings: Dict[str, float], fallback: bool = False):
+        """
+        Acumula los tiempos por etapa de una recuperación del contexto
+
+        Args:
+            timings: Segundos por etapa ("retrieve", "pack" y, con reranking, "rerank")
+            fallback: True si se agotó el presupuesto y se usó el orden vectorial
+        """
+        with self._stats_lock:
+            self._calls += 1
+            if fallback:
+                self._fallbacks += 1
+            for stage, seconds in timings.items():
+                self._stage_seconds[stage] = self._stage_seconds.get(stage, 0.0) + seconds
+            self._last_timings = dict(timings)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado del reranking
+
+        Returns:
+            Diccionario con recuperaciones, vueltas al orden vectorial y tiempos por etapa (ms)
+        """
+        with self._stats_lock:
+            calls = self._calls
+            return {
+                "enabled": settings.rerank_enabled,
+                "model": self.model_name,
+                "model_loaded": self.is_model_loaded,
+                "budget_ms": settings.rerank_budget_ms,
+                "ms_per_pair": round(self._seconds_per_pair * 1000, 3) if self._seconds_per_pair is not None else None,
+                "calls": calls,
+                "fallbacks": self._fallbacks,
+                "avg_ms": {
+                    stage: round(seconds * 1000 / calls, 2) if calls else 0.0
+                    for stage, seconds in self._stage_seconds.items()
+                },
+                "last_ms": {stage: round(seconds * 1000, 2) for stage, seconds in self._last_timings.items()}
+            }
@@ -0,0 +1,76 @@
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+
+class SourceIndex:
+    """
+    IDs de vector FAISS agrupados por documento fuente, en arreglos numpy
+
+    Cada documento guarda sus IDs en un arreglo int64 (8 bytes por chunk) en lugar de
+    una lista de enteros de Python (~40 bytes por chunk). Los IDs de cada ingesta se
+    agregan como un segmento y los segmentos se unen al consultar el documento.
+    """
+
+    def __init__(self):
+        self._segments: Dict[str, List[np.ndarray]] = {}
+
+    def add(self, document_name: str, vector_ids: Iterable[int]):
+        """
+        Registra vectores de un documento
+
+        Args:
+            document_name: Documento fuente
+            vector_ids: IDs de los vectores
+        """
+        ids = np.asarray(vector_ids, dtype=np.int64)
+        if len(ids):
+            self._segments.setdefault(document_name, []).append(ids)
+
+    def ids(self, document_name: str) -> np.ndarray:
+        """
+        IDs de vector de un documento
+
+        Args:
+            document_name: Documento fuente
+
+        Returns:
+            Arreglo int64 (vacío si el documento no está indexado)
+        """
+        segments = self._segments.get(document_name)
+        if not segments:
+            return np.empty(0, dtype=np.int64)
+        if len(segments) > 1:
+            segments[:] = [np.concatenate(segments)]
+        return segments[0]
+
+    def pop(self, document_name: str) -> np.ndarray:
+        """
+        Quita un documento del índice
+
+        Args:
+            document_name: Documento fuente
+
+        Returns:
+            IDs de vector que tenía el documento
+        """
+        ids = self.ids(document_name)
+        self._segments.pop(document_name, None)
+        return ids
+
+    def clear(self):
+        """Vacía el índice"""
+        self._segments.clear()
+
+    def memory_bytes(self) -> int:
+        """Bytes ocupados por los arreglos de IDs"""
+        return sum(ids.nbytes for segments in self._segments.values() for ids in segments)
+
+    def __contains__(self, document_name: str) -> bool:
+        return document_name in self._segments
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._segments)
+
+    def __len__(self) -> int:
+        return len(self._segments)
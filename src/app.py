@@ -3,20 +3,32 @@ Aplicación principal - Mini Asistente de Q&A
 Main de FastAPI con routers modulares
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import uvicorn
 
 from src.config import settings
-from src.models import HealthCheck
+from src.models import HealthCheck, ReadinessCheck
+from src.documents import router as documents
 from src.documents.router import router as documents_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranca sin esperar a los modelos; si está activado, los precarga en segundo plano"""
+    if settings.warm_up_on_startup:
+        asyncio.get_running_loop().run_in_executor(None, documents.warm_up_services)
+    yield
+
+
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     debug=settings.debug,
-    description="Sistema de preguntas y respuestas basado en documentos usando embeddings y LLM"
+    description="Sistema de preguntas y respuestas basado en documentos usando embeddings y LLM",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -40,6 +52,19 @@ async def health_check():
     )
 
 
+@app.get("/ready", response_model=ReadinessCheck, tags=["health"])
+async def readiness_check(response: Response):
+    """
+    Endpoint de readiness: 503 hasta que el índice y el modelo de embeddings estén cargados
+    
+    /health solo indica que el proceso responde (liveness)
+    """
+    readiness = documents.readiness()
+    if not readiness.ready:
+        response.status_code = 503
+    return readiness
+
+
 @app.get("/", tags=["root"])
 async def root():
     """Endpoint raíz con información de la API"""
@@ -48,6 +73,7 @@ async def root():
         "version": settings.app_version,
         "docs": "/docs",
         "health": "/health",
+        "ready": "/ready",
         "endpoints": {
             "ingest": "POST /api/v1/ingest - Subir archivos",
             "ask": "POST /api/v1/ask - Hacer preguntas",
@@ -63,7 +89,8 @@ def main():
     
     La aplicación funciona como una API REST con los siguientes endpoints:
     
-    - GET /health: Verificación de salud
+    - GET /health: Verificación de salud (liveness)
+    - GET /ready: Índice y modelo cargados (readiness)
     - GET /: Información de la API
     - POST /api/v1/ingest: Subir archivos (3-10 archivos .txt/.pdf)
     - POST /api/v1/ask: Hacer preguntas sobre documentos indexados
@@ -80,6 +107,7 @@ def main():
     print(f"Iniciando servidor en http://{settings.host}:{settings.port}")
     print("\nEndpoints disponibles:")
     print("- GET /health - Verificación de salud")
+    print("- GET /ready - Servicios cargados y listos")
     print("- GET /docs - Documentación interactiva")
     print("- POST /api/v1/ingest - Subir archivos")
     print("- POST /api/v1/ask - Hacer preguntas")
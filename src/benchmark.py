@@ -0,0 +1,691 @@
+"""
+Benchmarks de rendimiento del sistema
+
+Uso:
+    cd src
+    python benchmark.py delete
+    python benchmark.py memory
+    python benchmark.py batch
+    python benchmark.py pdf
+    python benchmark.py chunking
+    python benchmark.py backends
+    python benchmark.py context
+    BENCHMARK_URL=http://localhost:8000 python benchmark.py load
+
+Los benchmarks locales usan embeddings deterministas (sin descargar modelos) para
+aislar el costo de FAISS y de la persistencia del costo de inferencia. El benchmark
+"load" se ejecuta contra un servidor en marcha con el modelo real y "chunking" mide
+la recuperación con el modelo de embeddings configurado; "backends" compara el throughput
+de los backends de embeddings con el modelo real y "batch" usa el modelo configurado si
+está disponible.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# Agregar el directorio actual y la raíz del proyecto al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from models import DocumentChunk
+
+EMBEDDING_DIMENSION = 384  # Igual que all-MiniLM-L6-v2
+
+
+def _configure_temp_storage(directory: str):
+    """Redirige la persistencia del índice a un directorio temporal"""
+    settings.vector_db_path = str(Path(directory) / "vector_db")
+    settings.metadata_path = str(Path(directory) / "metadata.json")
+    settings.embedding_cache_path = str(Path(directory) / "embedding_cache.sqlite")
+    settings.chunk_store_path = str(Path(directory) / "chunks.sqlite")
+
+
+def _make_chunks(document_name: str, count: int) -> list:
+    """Genera chunks sintéticos para un documento"""
+    return [
+        DocumentChunk(
+            text=f"Fragmento {i} del documento {document_name} con contenido de prueba",
+            document_name=document_name,
+            chunk_index=i
+        )
+        for i in range(count)
+    ]
+
+
+def benchmark_delete(corpus_sizes=(1_000, 10_000, 50_000), deleted_chunks: int = 3):
+    """
+    Mide la latencia de eliminar un documento pequeño a medida que crece el corpus
+
+    La columna "índice" mide solo la actualización en memoria (FAISS + mapeos);
+    "total" incluye además la persistencia en disco.
+    """
+    from IA.embeddings import EmbeddingsService
+
+    print("=== Benchmark: eliminación por documento ===")
+    print(f"{'chunks':>10} | {'índice (ms)':>12} | {'total (ms)':>12}")
+
+    for corpus_size in corpus_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            _configure_temp_storage(directory)
+            service = EmbeddingsService(embeddings=DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION))
+
+            per_document = 1_000
+            chunks = []
+            for doc_number in range(corpus_size // per_document):
+                chunks.extend(_make_chunks(f"corpus_{doc_number}.txt", per_document))
+            service.create_vector_database(chunks)
+
+            service.create_vector_database(_make_chunks("pequeno_a.txt", deleted_chunks))
+            service.create_vector_database(_make_chunks("pequeno_b.txt", deleted_chunks))
+
+            start = time.perf_counter()
+            service._remove_source("pequeno_a.txt")
+            index_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            service.delete_documents_by_source("pequeno_b.txt")
+            total_ms = (time.perf_counter() - start) * 1000
+
+            print(f"{corpus_size:>10} | {index_ms:>12.2f} | {total_ms:>12.2f}")
+
+
+def benchmark_ingest(corpus_sizes=(10_000, 50_000), batch_sizes=(32, 256)):
+    """
+    Mide throughput y memoria transitoria de create_vector_database por tamaño de lote
+
+    "transitoria" es el pico de memoria durante la ingesta menos lo que queda retenido
+    al terminar (índice + metadatos), incluida la escritura del índice FAISS al persistir.
+    """
+    import tracemalloc
+    from IA.embeddings import EmbeddingsService
+
+    print("=== Benchmark: ingesta por lotes ===")
+    print(f"{'chunks':>10} | {'lote':>6} | {'chunks/s':>10} | {'transitoria (MB)':>17}")
+
+    for corpus_size in corpus_sizes:
+        for batch_size in batch_sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                _configure_temp_storage(directory)
+                settings.embedding_batch_size = batch_size
+                service = EmbeddingsService(embeddings=DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION))
+                chunks = _make_chunks("corpus.txt", corpus_size)
+
+                tracemalloc.start()
+                baseline, _ = tracemalloc.get_traced_memory()
+                start = time.perf_counter()
+                service.create_vector_database(chunks)
+                elapsed = time.perf_counter() - start
+                retained, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                transient_mb = (peak - retained) / (1024 * 1024)
+                print(f"{corpus_size:>10} | {batch_size:>6} | {corpus_size / elapsed:>10.0f} | {transient_mb:>17.1f}")
+
+
+def benchmark_embedding_cache(corpus_size: int = 20_000):
+    """
+    Compara una ingesta en frío con la re-ingesta del mismo documento
+
+    La re-ingesta solo calcula hashes y lee la caché; se muestra junto al costo de
+    hashear los textos como referencia.
+    """
+    from IA.embeddings import EmbeddingsService
+
+    print("=== Benchmark: caché de embeddings ===")
+    with tempfile.TemporaryDirectory() as directory:
+        _configure_temp_storage(directory)
+        service = EmbeddingsService(embeddings=DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION))
+        chunks = _make_chunks("repetido.txt", corpus_size)
+
+        start = time.perf_counter()
+        service._embed_texts([chunk.text for chunk in chunks])
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        service._embed_texts([chunk.text for chunk in chunks])
+        warm = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for chunk in chunks:
+            service.embedding_cache.key_for(chunk.text)
+        hashing = time.perf_counter() - start
+
+        print(f"chunks={corpus_size} | frío={cold * 1000:.0f} ms | caché={warm * 1000:.0f} ms | solo hash={hashing * 1000:.0f} ms")
+        print(f"estadísticas: {service.get_cache_stats()['embedding_cache']}")
+
+
+def benchmark_startup(corpus_sizes=(10_000, 100_000)):
+    """
+    Mide el arranque en frío: abrir el índice persistido y responder la primera búsqueda
+
+    El índice se abre mapeado en memoria, así que el tiempo de carga no debería crecer
+    con el número de vectores.
+    """
+    from IA.embeddings import EmbeddingsService
+
+    print("=== Benchmark: arranque en frío ===")
+    print(f"{'chunks':>10} | {'carga (ms)':>11} | {'1ª búsqueda (ms)':>17}")
+
+    for corpus_size in corpus_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            _configure_temp_storage(directory)
+            settings.embedding_cache_enabled = False
+            embeddings = DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION)
+            EmbeddingsService(embeddings=embeddings).create_vector_database(_make_chunks("corpus.txt", corpus_size))
+
+            start = time.perf_counter()
+            service = EmbeddingsService(embeddings=embeddings)
+            service.ensure_loaded()
+            load_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            service.similarity_search("Fragmento 42 del documento", k=5)
+            search_ms = (time.perf_counter() - start) * 1000
+
+            print(f"{corpus_size:>10} | {load_ms:>11.1f} | {search_ms:>17.1f}")
+            settings.embedding_cache_enabled = True
+
+
+def benchmark_memory(corpus_sizes=(100_000, 1_000_000), chunks_per_document: int = 100):
+    """
+    Mide la memoria de los metadatos de chunks que el servicio mantiene en el heap
+
+    Los vectores FAISS quedan mapeados en memoria y el texto en SQLite, así que lo que
+    crece con el corpus es el índice por documento fuente y el índice léxico. Se usan
+    embeddings de dimensión mínima: el costo de los vectores no entra en la medición.
+    """
+    import tracemalloc
+    from IA.embeddings import EmbeddingsService
+
+    print("=== Benchmark: memoria de metadatos ===")
+    print(f"{'chunks':>10} | {'fuentes (MB)':>13} | {'B/chunk':>8} | {'heap (MB)':>10} | {'pico carga (MB)':>16}")
+
+    for corpus_size in corpus_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            _configure_temp_storage(directory)
+            settings.embedding_cache_enabled = False
+            embeddings = DeterministicFakeEmbedding(size=8)
+            documents = corpus_size // chunks_per_document
+            EmbeddingsService(embeddings=embeddings).create_vector_database([
+                chunk
+                for document in range(documents)
+                for chunk in _make_chunks(f"doc_{document}.txt", chunks_per_document)
+            ])
+
+            tracemalloc.start()
+            service = EmbeddingsService(embeddings=embeddings)
+            service.ensure_loaded()
+            heap, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            sources = service.source_index.memory_bytes()
+            print(f"{corpus_size:>10} | {sources / 2**20:>13.1f} | {sources / corpus_size:>8.1f} | "
+                  f"{heap / 2**20:>10.1f} | {peak / 2**20:>16.1f}")
+            settings.embedding_cache_enabled = True
+
+
+def _clustered_vectors(count: int, dimension: int, clusters: int = 1_000, seed: int = 0):
+    """Vectores normalizados agrupados en clusters, parecidos a embeddings de texto reales"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dimension), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def benchmark_ann(corpus_size: int = 200_000, num_queries: int = 1_000, k: int = 10):
+    """
+    Compara recall@k y latencia por consulta de cada tipo de índice contra la búsqueda exacta
+
+    Las consultas se lanzan de a una, como en /search. Para IVF se recorren varios
+    valores de nprobe y para HNSW varios de efSearch.
+    """
+    import numpy as np
+    from IA import index_factory
+
+    print(f"=== Benchmark: índices ANN ({corpus_size} vectores, recall@{k}) ===")
+    vectors = _clustered_vectors(corpus_size + num_queries, EMBEDDING_DIMENSION)
+    corpus, queries = vectors[:corpus_size], vectors[corpus_size:]
+    ids = np.arange(corpus_size, dtype=np.int64)
+    settings.faiss_train_min_vectors = 1
+
+    def run(label: str, index):
+        params = index_factory.search_parameters(index)
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            _, found = index.search(query[None, :], k, params=params)
+            latencies.append(time.perf_counter() - start)
+            results.append(found[0])
+        return label, latencies, np.asarray(results)
+
+    def report(label: str, latencies: list, results, truth):
+        recall = np.mean([len(set(found) & set(expected)) / k for found, expected in zip(results, truth)])
+        ms = [latency * 1000 for latency in latencies]
+        print(f"{label:>26} | recall={recall:.3f} | p50={statistics.median(ms):>7.3f} ms | p99={_percentile(ms, 99):>7.3f} ms")
+
+    settings.faiss_index_type = "flat"
+    _, latencies, truth = run("flat", index_factory.build_index(corpus, ids))
+    report("flat (exacto)", latencies, truth, truth)
+
+    for index_type, knob, label, values in (
+        ("ivf_flat", "faiss_nprobe", "nprobe", (4, 16, 64)),
+        ("ivf_pq", "faiss_nprobe", "nprobe", (4, 16, 64)),
+        ("hnsw", "faiss_hnsw_ef_search", "efSearch", (16, 64, 256)),
+    ):
+        settings.faiss_index_type = index_type
+        start = time.perf_counter()
+        index = index_factory.build_index(corpus, ids)
+        print(f"{index_type}: construido en {time.perf_counter() - start:.1f} s")
+        for value in values:
+            setattr(settings, knob, value)
+            _, latencies, results = run(index_type, index)
+            report(f"{index_type} {label}={value}", latencies, results, truth)
+
+
+def _percentile(values: list, percentile: float) -> float:
+    """Percentil por rango más cercano"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percentile / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _latency_summary(label: str, latencies: list):
+    """Imprime p50/p99 de una lista de latencias en segundos"""
+    if not latencies:
+        print(f"{label:>28} | sin muestras")
+        return
+    ms = [latency * 1000 for latency in latencies]
+    print(f"{label:>28} | n={len(ms):>5} | p50={statistics.median(ms):>8.1f} ms | p99={_percentile(ms, 99):>8.1f} ms")
+
+
+def _text_files(prefix: str, count: int, paragraphs: int) -> list:
+    """Genera archivos .txt sintéticos para subir a /api/v1/ingest"""
+    files = []
+    for file_number in range(count):
+        body = "\n".join(
+            f"Párrafo {i} del archivo {prefix}{file_number}: código PX-{i:05d}, contenido de prueba para búsqueda."
+            for i in range(paragraphs)
+        )
+        files.append(("files", (f"{prefix}{file_number}.txt", body.encode("utf-8"), "text/plain")))
+    return files
+
+
+def benchmark_load(concurrency: int = 8, paragraphs_per_file: int = 20_000):
+    """
+    Prueba de carga: latencia de /search y /health mientras corre una ingesta grande
+
+    Requiere un servidor en marcha (BENCHMARK_URL, por defecto http://localhost:8000).
+    """
+    import httpx
+
+    base_url = os.environ.get("BENCHMARK_URL", "http://localhost:8000")
+
+    async def probe(client: httpx.AsyncClient, path: str, latencies: list, stop: asyncio.Event):
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = await client.get(path)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+    async def measure(client: httpx.AsyncClient, during_ingest: bool):
+        search_latencies, health_latencies = [], []
+        stop = asyncio.Event()
+        probes = [
+            asyncio.create_task(probe(client, "/api/v1/search?q=codigo%20PX-00042&k=5", search_latencies, stop))
+            for _ in range(concurrency)
+        ]
+        probes.append(asyncio.create_task(probe(client, "/health", health_latencies, stop)))
+
+        if during_ingest:
+            response = await client.post("/api/v1/ingest", files=_text_files("carga_", 3, paragraphs_per_file))
+            print(f"Ingesta concurrente finalizada con estado {response.status_code}")
+        else:
+            await asyncio.sleep(10)
+
+        stop.set()
+        await asyncio.gather(*probes)
+        return search_latencies, health_latencies
+
+    async def run():
+        async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+            await client.post("/api/v1/ingest", files=_text_files("semilla_", 3, 200))
+
+            print("=== Benchmark: /search durante una ingesta ===")
+            search_idle, health_idle = await measure(client, during_ingest=False)
+            search_busy, health_busy = await measure(client, during_ingest=True)
+
+            _latency_summary("/search sin ingesta", search_idle)
+            _latency_summary("/search con ingesta", search_busy)
+            _latency_summary("/health sin ingesta", health_idle)
+            _latency_summary("/health con ingesta", health_busy)
+
+    asyncio.run(run())
+
+
+def _write_pdf(path: Path, pages: int, lines_per_page: int = 40):
+    """Escribe un PDF sintético de texto (sin dependencias) con `pages` páginas"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Árbol de páginas, se completa al final
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page in range(pages):
+        lines = " ".join(
+            f"(Pagina {page + 1} linea {line}: codigo PX-{page:04d}-{line:02d} contenido de prueba) Tj T*"
+            for line in range(lines_per_page)
+        )
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def benchmark_pdf(pages: int = 500, worker_counts=(1, 2, 4, 8)):
+    """
+    Mide el throughput de extracción de un PDF grande según el número de procesos
+
+    El PDF se divide en rangos de `pdf_pages_per_task` páginas que se analizan en el
+    pool de procesos; la primera pasada de cada tamaño de pool (arranque de los
+    procesos) no se mide.
+    """
+    from IA.executor import ComputeExecutor
+    from documents import document_loader
+
+    print(f"=== Benchmark: extracción de PDF ({pages} páginas, {os.cpu_count()} núcleos) ===")
+    print(f"{'procesos':>9} | {'páginas/s':>10} | {'chunks':>7} | {'aceleración':>11}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = Path(directory) / "grande.pdf"
+        _write_pdf(pdf_path, pages)
+        uploads = [(str(pdf_path), "grande.pdf")]
+        baseline = None
+
+        for workers in worker_counts:
+            executor = ComputeExecutor("parse", workers, settings.executor_queue_size, use_processes=True)
+            document_loader.parse_executor = executor
+            try:
+                list(document_loader.document_loader_service.iter_parsed_files(uploads))
+
+                start = time.perf_counter()
+                (_, chunks), = document_loader.document_loader_service.iter_parsed_files(uploads)
+                elapsed = time.perf_counter() - start
+            finally:
+                executor.shutdown()
+
+            baseline = baseline or elapsed
+            print(f"{workers:>9} | {pages / elapsed:>10.0f} | {len(chunks):>7} | {baseline / elapsed:>10.2f}x")
+
+
+def _fact_corpus(products: int = 300, filler_sentences: int = 6, seed: int = 0):
+    """Texto con un dato verificable por producto entre oraciones de relleno, y sus preguntas"""
+    import random
+
+    rng = random.Random(seed)
+    cities = ["Lima", "Quito", "Bogotá", "Santiago", "Montevideo", "Asunción", "La Paz", "Caracas"]
+    fillers = [
+        "El catálogo se revisa cada trimestre junto con el equipo comercial.",
+        "Los plazos de entrega dependen de la disponibilidad en el almacén central.",
+        "Las garantías cubren defectos de fabricación durante el primer año de uso.",
+        "La documentación técnica completa está disponible para los distribuidores autorizados.",
+        "Los pedidos mayoristas requieren aprobación previa del área de finanzas.",
+        "Cada lote pasa por un control de calidad antes de salir de la planta.",
+    ]
+
+    paragraphs, questions = [], []
+    for i in range(products):
+        name = f"Modelo {chr(65 + i % 26)}{i:03d}"
+        fact = f"El {name} cuesta {rng.randint(10, 999)} euros y se fabrica en {rng.choice(cities)}."
+        sentences = rng.sample(fillers, min(filler_sentences, len(fillers)))
+        sentences.insert(rng.randint(0, len(sentences)), fact)
+        paragraphs.append(" ".join(sentences))
+        questions.append((f"¿Cuánto cuesta y dónde se fabrica el {name}?", fact))
+    return "\n\n".join(paragraphs), questions
+
+
+def benchmark_chunking(char_size: int = 500, char_overlap: int = 50, k: int = 5):
+    """
+    Compara la división por caracteres anterior con la división por oraciones y tokens
+
+    Reporta cuántos chunks genera cada una, cuántos superan la ventana del modelo (y se
+    truncan al calcular su embedding) y el recall@k de preguntas cuyo dato es una
+    oración: un acierto exige que algún chunk recuperado la contenga completa.
+    """
+    import numpy as np
+    from documents.chunker import SPECIAL_TOKENS, get_chunker
+    from documents.document_loader import document_loader_service
+
+    text, questions = _fact_corpus()
+    chunker = get_chunker(*document_loader_service.chunking_options())
+    window = settings.chunk_max_tokens - SPECIAL_TOKENS
+    tokenizer = "aproximado" if chunker.tokenizer is None else settings.chunk_tokenizer or settings.embedding_model
+
+    strategies = {
+        f"caracteres ({char_size}/{char_overlap})": document_loader_service._split_text(text, char_size, char_overlap),
+        f"oraciones ({settings.chunk_max_tokens}/{settings.chunk_overlap_tokens} tokens)": chunker.chunk(text),
+    }
+
+    print(f"=== Benchmark: división en chunks ({len(questions)} preguntas, tokenizador {tokenizer}) ===")
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(
+            model_name=settings.embedding_model, encode_kwargs={"normalize_embeddings": True}
+        )
+        query_vectors = np.asarray(embeddings.embed_documents([question for question, _ in questions]))
+    except Exception as e:
+        print(f"(sin recall: no se pudo cargar el modelo de embeddings: {e})")
+        embeddings = None
+
+    print(f"{'estrategia':>32} | {'chunks':>7} | {'tokens medios':>13} | {'truncados':>9} | {'recall@' + str(k):>9}")
+    for label, chunks in strategies.items():
+        token_counts = [chunker.count_tokens(chunk) for chunk in chunks]
+        truncated = sum(count > window for count in token_counts)
+
+        recall = "-"
+        if embeddings is not None:
+            chunk_vectors = np.asarray(embeddings.embed_documents(chunks))
+            top = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :k]
+            hits = sum(
+                any(fact in chunks[index] for index in row)
+                for row, (_, fact) in zip(top, questions)
+            )
+            recall = f"{hits / len(questions):.3f}"
+
+        print(f"{label:>32} | {len(chunks):>7} | {statistics.mean(token_counts):>13.1f} | "
+              f"{truncated:>9} | {recall:>9}")
+
+
+def benchmark_context_packing(k: int = 8, max_tokens: int = None):
+    """
+    Compara los tokens del prompt de /ask antes y después de empaquetar el contexto
+
+    Antes: los k pasajes completos, con el prompt envuelto una segunda vez por el
+    servicio de LLM. Después: contexto unido, sin duplicados y dentro del presupuesto.
+    Como indicador de calidad se mide si el dato que responde la pregunta sigue en el
+    contexto. Los pasajes se recuperan con BM25 para no depender del modelo.
+    """
+    from IA.embeddings import EmbeddingsService
+    from IA.llm_service import LLMService
+    from documents.chunker import get_chunker
+    from services.context_builder import pack_context
+    from services.qa_service import build_prompt
+
+    text, questions = _fact_corpus()
+    chunker = get_chunker(settings.chunk_max_tokens, settings.chunk_overlap_tokens,
+                          settings.chunk_tokenizer or settings.embedding_model)
+    chunks = [
+        DocumentChunk(text=chunk, document_name="catalogo.txt", chunk_index=i)
+        for i, chunk in enumerate(chunker.chunk(text))
+    ]
+    max_tokens = max_tokens or settings.context_max_tokens
+
+    print(f"=== Benchmark: empaquetado del contexto ({len(chunks)} chunks, k={k}, "
+          f"presupuesto {max_tokens} tokens) ===")
+
+    with tempfile.TemporaryDirectory() as directory:
+        _configure_temp_storage(directory)
+        settings.embedding_cache_enabled = False
+        service = EmbeddingsService(embeddings=DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION))
+        service.create_vector_database(chunks)
+        wrap = LLMService()._create_context_prompt
+
+        tokens = {"antes": [], "después": []}
+        hits = {"antes": 0, "después": 0}
+        for question, fact in questions:
+            results = service.lexical_search(question, k=k)
+            packed = pack_context(results, max_tokens)
+            tokens["antes"].append(chunker.count_tokens(wrap(question, build_prompt(question, results))))
+            tokens["después"].append(chunker.count_tokens(build_prompt(question, packed)))
+            hits["antes"] += any(fact in result.text for result in results)
+            hits["después"] += any(fact in passage.text for passage in packed)
+        settings.embedding_cache_enabled = True
+
+    print(f"{'prompt':>8} | {'tokens medios':>13} | {'p95':>6} | {'dato en contexto':>16}")
+    for label in tokens:
+        print(f"{label:>8} | {statistics.mean(tokens[label]):>13.1f} | {_percentile(tokens[label], 95):>6.0f} | "
+              f"{hits[label] / len(questions):>16.3f}")
+
+
+def benchmark_embedding_backends(num_chunks: int = 2_000, words_per_chunk: int = 120):
+    """
+    Mide chunks por segundo de cada backend de embeddings en CPU
+
+    Usa el modelo configurado (se descarga si hace falta) y reporta además la similitud
+    coseno mínima y media de cada backend contra PyTorch. La primera llamada de cada
+    backend (carga del modelo) no se mide.
+    """
+    import numpy as np
+    from IA.embedding_backends import BACKENDS, create_embeddings
+
+    words = "el plazo de entrega del pedido depende de la disponibilidad en el almacén central".split()
+    texts = [
+        " ".join(words[(i + j) % len(words)] for j in range(words_per_chunk)) + f" (chunk {i})"
+        for i in range(num_chunks)
+    ]
+
+    print(f"=== Benchmark: backends de embeddings ({num_chunks} chunks de {words_per_chunk} palabras, "
+          f"{os.cpu_count()} núcleos) ===")
+    print(f"{'backend':>8} | {'chunks/s':>9} | {'aceleración':>11} | {'coseno mín':>10} | {'coseno medio':>12}")
+
+    reference, baseline = None, None
+    for backend in BACKENDS:
+        try:
+            embeddings = create_embeddings(backend)
+            embeddings.embed_documents(texts[:settings.embedding_batch_size])
+        except Exception as e:
+            print(f"{backend:>8} | no disponible: {e}")
+            continue
+
+        start = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        throughput = num_chunks / (time.perf_counter() - start)
+
+        reference = vectors if reference is None else reference
+        baseline = baseline or throughput
+        cosine = (vectors * reference).sum(axis=1)
+        print(f"{backend:>8} | {throughput:>9.1f} | {throughput / baseline:>10.2f}x | "
+              f"{cosine.min():>10.4f} | {cosine.mean():>12.4f}")
+
+
+def benchmark_batch_search(corpus_size: int = 20_000, num_queries: int = 100, k: int = 5, mode: str = "vector"):
+    """
+    Compara N búsquedas secuenciales con una búsqueda por lotes de las mismas consultas
+
+    Usa el modelo de embeddings configurado (sin él, embeddings deterministas) y mide
+    la capa de servicio, sin el costo HTTP que la búsqueda por lotes también ahorra.
+    Las cachés de consultas y resultados se vacían antes de cada corrida.
+    """
+    from IA.embeddings import EmbeddingsService
+    from IA.embedding_backends import create_embeddings
+    from documents.schemas import BatchSearchQuery
+    from services import search_passages, search_passages_batch
+
+    try:
+        embeddings = create_embeddings()
+        embeddings.embed_query("calentamiento")
+        model = settings.embedding_model
+    except Exception as e:
+        print(f"Modelo no disponible ({e}); se usan embeddings deterministas")
+        embeddings = DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION)
+        model = "deterministas"
+
+    print(f"=== Benchmark: búsqueda por lotes ({corpus_size} chunks, {num_queries} consultas, "
+          f"k={k}, modo {mode}, {model}) ===")
+
+    with tempfile.TemporaryDirectory() as directory:
+        _configure_temp_storage(directory)
+        settings.embedding_cache_enabled = False
+        service = EmbeddingsService(embeddings=embeddings)
+        service.create_vector_database(_make_chunks("corpus.txt", corpus_size))
+        queries = [f"Fragmento {i * 37 % corpus_size} del documento corpus.txt" for i in range(num_queries)]
+
+        def clear_caches():
+            service.query_embedding_cache.clear()
+            service.search_result_cache.clear()
+
+        clear_caches()
+        start = time.perf_counter()
+        for query in queries:
+            search_passages(service, query, k, mode)
+        sequential = time.perf_counter() - start
+
+        clear_caches()
+        start = time.perf_counter()
+        search_passages_batch(service, [BatchSearchQuery(q=query, k=k) for query in queries], mode)
+        batched = time.perf_counter() - start
+
+        print(f"{'estrategia':>12} | {'total (ms)':>10} | {'ms/consulta':>11} | {'aceleración':>11}")
+        print(f"{'secuencial':>12} | {sequential * 1000:>10.1f} | {sequential * 1000 / num_queries:>11.2f} | {1:>10.2f}x")
+        print(f"{'lote':>12} | {batched * 1000:>10.1f} | {batched * 1000 / num_queries:>11.2f} | "
+              f"{sequential / batched:>10.2f}x")
+        settings.embedding_cache_enabled = True
+
+
+BENCHMARKS = {
+    "delete": benchmark_delete,
+    "ingest": benchmark_ingest,
+    "cache": benchmark_embedding_cache,
+    "startup": benchmark_startup,
+    "memory": benchmark_memory,
+    "batch": benchmark_batch_search,
+    "ann": benchmark_ann,
+    "pdf": benchmark_pdf,
+    "chunking": benchmark_chunking,
+    "backends": benchmark_embedding_backends,
+    "context": benchmark_context_packing,
+    "load": benchmark_load,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or any(name not in BENCHMARKS for name in sys.argv[1:]):
+        print(f"Uso: python benchmark.py <{'|'.join(BENCHMARKS)}> [...]")
+        sys.exit(1)
+    for name in sys.argv[1:]:
+        BENCHMARKS[name]()
@@ -30,30 +30,104 @@ class Settings(BaseSettings):
     max_files: int = 10
     
     # Configuración de procesamiento de texto
-    chunk_size: int = 500
-    chunk_overlap: int = 50
+    chunk_max_tokens: int = 256      # Ventana del modelo de embeddings, incluidos [CLS] y [SEP]
+    chunk_overlap_tokens: int = 32   # Solapamiento entre chunks (en oraciones completas)
+    chunk_tokenizer: str = os.environ.get("CHUNK_TOKENIZER", "")  # Vacío = tokenizador del modelo de embeddings
     max_search_results: int = 10
     
     # Configuración de LLM y Embeddings
     gemini_api_key: str = os.environ.get("GEMINI_API_KEY", "")
     embedding_model: str = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    embedding_batch_size: int = 64  # Chunks por lote al calcular embeddings durante la ingesta
+    embedding_backend: str = os.environ.get("EMBEDDING_BACKEND", "torch")  # 'torch' o 'onnx' (ONNX Runtime, sin PyTorch)
+    embedding_onnx_file: str = "onnx/model_quint8_avx2.onnx"  # Archivo ONNX del repositorio del modelo (int8 por defecto)
+    embedding_onnx_threads: int = 0  # Hilos de ONNX Runtime por inferencia (0 = automático)
+    llm_provider: str = os.environ.get("LLM_PROVIDER", "gemini")  # 'gemini' o 'stub' (pruebas sin conexión)
+    llm_stub_response: str = "Respuesta de prueba generada sin conexión a partir de los documentos (Fuente 1)."
     llm_model: str = "gemini-2.0-flash-exp"
     llm_temperature: float = 0.0
     llm_max_tokens: int = 1000
     llm_top_p: float = 1.0
     llm_top_k: int = 40
+    llm_api_endpoint: str = os.environ.get("LLM_API_ENDPOINT", "")  # Servidor alternativo (vacío = API de Google)
+    llm_timeout_seconds: float = 30.0       # Límite por intento de llamada al LLM
+    llm_max_retries: int = 3                # Reintentos ante errores pasajeros (timeout, 429, 5xx)
+    llm_retry_base_delay: float = 0.5       # Espera base del backoff exponencial (segundos)
+    llm_retry_max_delay: float = 8.0        # Espera máxima entre reintentos (segundos)
+    llm_max_concurrency: int = 4            # Llamadas al LLM en curso a la vez
+    llm_circuit_failure_threshold: int = 5  # Fallos seguidos que abren el circuito
+    llm_circuit_reset_seconds: float = 30.0 # Tiempo con el circuito abierto antes de probar de nuevo
     
     # Configuración de búsqueda vectorial FAISS
     similarity_search_k: int = 7
     similarity_threshold: float = 0.8
+    context_k: int = 5                  # Pasajes que recibe el prompt de /ask
+    context_max_distance: float = 1.2   # Distancia L2 máxima de un pasaje del contexto (sin reranking)
+    context_max_tokens: int = 1024      # Tokens de pasajes en el prompt (tokenizador del chunking)
+    context_duplicate_threshold: float = 0.8  # Fracción de trigramas ya incluidos que descarta un pasaje
+    
+    # Reranking del contexto de /ask con un cross-encoder local (opcional)
+    rerank_enabled: bool = False
+    rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_candidates_k: int = 20       # Candidatos de la búsqueda vectorial que se reordenan
+    rerank_batch_size: int = 16         # Pares (pregunta, pasaje) por lote del cross-encoder
+    rerank_budget_ms: int = 250         # Sin tiempo para puntuar todo, se usa el orden vectorial
     
     # Configuración de persistencia FAISS
     vector_db_path: str = "data/vector_db"
-    metadata_path: str = "data/metadata.json"
+    chunk_store_path: str = "data/chunks.sqlite"
+    metadata_path: str = "data/metadata.json"  # Formato heredado, se migra al almacén de chunks
+    warm_up_on_startup: bool = True  # Cargar índice y modelos en segundo plano al arrancar (si no, al primer uso)
+    index_reload_interval_seconds: float = 1.0  # Cada cuánto un worker comprueba si otro publicó un índice nuevo
+    
+    # Caché persistente de embeddings de chunks
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "data/embedding_cache.sqlite"
+    embedding_cache_max_entries: int = 500_000
+    
+    # Cachés en memoria de consultas
+    query_embedding_cache_size: int = 1024  # Embeddings de consultas recientes
+    search_result_cache_size: int = 512     # Resultados por (consulta, k, filtro, generación del índice)
+    answer_cache_size: int = 256            # Respuestas de /ask por embedding de la pregunta (0 = desactivada)
+    answer_cache_ttl_seconds: int = 3600    # Vigencia de una respuesta cacheada
+    answer_cache_max_distance: float = 0.05 # Distancia coseno máxima para reutilizar una respuesta
     
     # Configuración avanzada de FAISS
     faiss_normalize_embeddings: bool = True
     faiss_device: str = "cpu"  # 'cpu' o 'gpu'
+    faiss_index_type: str = "flat"          # flat | ivf_flat | ivf_pq | hnsw
+    faiss_train_min_vectors: int = 50_000   # IVF se entrena al alcanzar este tamaño; antes se usa búsqueda exacta
+    faiss_nlist: int = 0                    # Listas IVF (0 = automático, ≈ 4·√N al entrenar)
+    faiss_nprobe: int = 16                  # Listas IVF visitadas por consulta
+    faiss_pq_m: int = 48                    # Subcuantizadores PQ (se ajusta a un divisor de la dimensión)
+    faiss_pq_nbits: int = 8                 # Bits por subcuantizador PQ
+    faiss_hnsw_m: int = 32                  # Vecinos por nodo HNSW
+    faiss_hnsw_ef_construction: int = 200   # Amplitud de búsqueda al construir HNSW
+    faiss_hnsw_ef_search: int = 64          # Amplitud de búsqueda por consulta HNSW
+    faiss_hnsw_compact_ratio: float = 0.2   # Fracción de vectores borrados que dispara la reconstrucción HNSW
+    faiss_prefilter_exact_max_vectors: int = 20_000  # Filtros con hasta estos vectores se resuelven por comparación directa
+    
+    # Búsqueda léxica (BM25) e híbrida
+    search_mode: str = "vector"             # Modo por defecto de /search: vector | lexical | hybrid
+    hybrid_candidates_k: int = 50           # Candidatos de cada lista antes de fusionar
+    rrf_k: int = 60                         # Constante de reciprocal rank fusion
+    batch_search_max_queries: int = 100     # Consultas por solicitud en /search/batch
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    
+    # Configuración de ejecución concurrente (fuera del event loop)
+    index_executor_workers: int = 4   # Hilos para embeddings e índice FAISS
+    executor_queue_size: int = 32     # Tareas en espera antes de responder 503
+    
+    # Configuración de ingesta en segundo plano
+    ingest_job_workers: int = 2       # Trabajos de ingesta ejecutándose a la vez
+    ingest_job_queue_size: int = 16   # Trabajos en espera antes de responder 503
+    ingest_job_history: int = 100     # Trabajos terminados que se conservan para consulta
+    ingest_jobs_path: str = "data/jobs"  # Estado de cada trabajo, consultable desde cualquier worker
+    upload_read_chunk_size: int = 1024 * 1024  # Bytes leídos por iteración al guardar un archivo subido
+    parse_workers: int = os.cpu_count() or 2   # Procesos que analizan archivos PDF/TXT en paralelo
+    parse_process_start_method: str = "spawn"  # Método de inicio de los procesos de análisis
+    pdf_pages_per_task: int = 25               # Páginas de PDF por tarea del pool de análisis
     
     class Config:
         env_file = ".env"
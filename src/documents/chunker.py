@@ -0,0 +1,179 @@
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import re
+
+# Fin de oración: puntuación final seguida de espacio, o salto de párrafo. Las comillas o
+# paréntesis de cierre (grupo 1) pertenecen a la oración; solo el espacio la separa
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?…])([\"'»”)\]]*)\s+|\n\s*\n")
+# Aproximación de WordPiece cuando no hay tokenizador: palabras en piezas de hasta 6 caracteres y signos sueltos
+_APPROXIMATE_TOKEN = re.compile(r"\w{1,6}|[^\w\s]")
+
+# Tokens especiales que el modelo agrega a cada texto ([CLS] y [SEP])
+SPECIAL_TOKENS = 2
+
+
+@lru_cache(maxsize=4)
+def load_tokenizer(model_name: str):
+    """
+    Carga (una vez por proceso) el tokenizador rápido del modelo de embeddings
+
+    Primero se busca en la caché local, que el modelo de embeddings ya llenó al
+    descargarse; si no está, se intenta descargar.
+
+    Args:
+        model_name: Nombre del modelo (sin organización se asume sentence-transformers/)
+
+    Returns:
+        Tokenizador o None si no se pudo cargar (se usa la aproximación por regex)
+    """
+    from transformers import AutoTokenizer
+
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    for local_files_only in (True, False):
+        try:
+            return AutoTokenizer.from_pretrained(repo_id, use_fast=True, local_files_only=local_files_only)
+        except Exception as e:
+            error = e
+    print(f"No se pudo cargar el tokenizador {repo_id}, se usa una aproximación: {error}")
+    return None
+
+
+class TokenChunker:
+    """
+    Divide texto en chunks de oraciones completas que caben en la ventana del modelo
+
+    El texto se tokeniza una sola vez y se trabaja con offsets: cada oración se mide
+    contando los tokens que empiezan dentro de ella y solo se copia el texto final de
+    cada chunk. Las oraciones se agregan mientras quepan en `max_tokens` (descontando
+    los tokens especiales); el chunk siguiente repite las últimas oraciones completas
+    que sumen hasta `overlap_tokens`. Una oración más larga que la ventana se corta en
+    límites de token con el mismo solapamiento.
+    """
+
+    def __init__(self, max_tokens: int, overlap_tokens: int, tokenizer=None):
+        self.budget = max(1, max_tokens - SPECIAL_TOKENS)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.budget - 1))
+        self.tokenizer = tokenizer
+
+    def chunk(self, text: str) -> List[str]:
+        """
+        Divide un texto
+
+        Args:
+            text: Texto a dividir
+
+        Returns:
+            Lista de chunks (vacía si el texto no tiene contenido)
+        """
+        sentences = self._sentence_spans(text)
+        if not sentences:
+            return []
+
+        token_spans = self._token_spans(text)
+        token_starts = [start for start, _ in token_spans]
+        bounds = [
+            (bisect_left(token_starts, start), bisect_left(token_starts, end))
+            for start, end in sentences
+        ]
+        counts = [last - first for first, last in bounds]
+
+        chunks = []
+        i = 0
+        while i < len(sentences):
+            if counts[i] > self.budget:
+                chunks.extend(self._split_long_sentence(text, token_spans, *bounds[i]))
+                i += 1
+                continue
+
+            j, used = i, 0
+            while j < len(sentences) and counts[j] <= self.budget and used + counts[j] <= self.budget:
+                used += counts[j]
+                j += 1
+            chunks.append(text[sentences[i][0]:sentences[j - 1][1]])
+
+            if j >= len(sentences):
+                break
+
+            # Se repiten oraciones finales mientras sumen el solapamiento y dejen lugar a la oración siguiente
+            k, overlap = j, 0
+            while (
+                k - 1 > i
+                and overlap + counts[k - 1] <= self.overlap_tokens
+                and overlap + counts[k - 1] + counts[j] <= self.budget
+            ):
+                overlap += counts[k - 1]
+                k -= 1
+            i = k
+
+        return chunks
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Cuenta los tokens de un texto sin los especiales
+
+        Args:
+            text: Texto
+
+        Returns:
+            Número de tokens
+        """
+        return len(self._token_spans(text))
+
+    def _split_long_sentence(self, text: str, token_spans: List[Tuple[int, int]], first: int, last: int) -> List[str]:
+        """Corta una oración que no cabe en la ventana en límites de token"""
+        step = self.budget - self.overlap_tokens
+        pieces = []
+        for start in range(first, last, step):
+            end = min(start + self.budget, last)
+            pieces.append(text[token_spans[start][0]:token_spans[end - 1][1]])
+            if end >= last:
+                break
+        return pieces
+
+    def _sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Offsets (inicio, fin) de cada oración sin los espacios de los bordes"""
+        spans = []
+        start = 0
+        for match in _SENTENCE_BREAK.finditer(text):
+            end = match.end(1) if match.group(1) is not None else match.start()
+            self._append_trimmed(text, start, end, spans)
+            start = match.end()
+        self._append_trimmed(text, start, len(text), spans)
+        return spans
+
+    def _append_trimmed(self, text: str, start: int, end: int, spans: List[Tuple[int, int]]):
+        """Agrega un rango sin espacios iniciales ni finales, si no queda vacío"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+
+    def _token_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Offsets de cada token del texto, en una sola pasada"""
+        if self.tokenizer is None:
+            return [match.span() for match in _APPROXIMATE_TOKEN.finditer(text)]
+
+        encoding = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, truncation=False, verbose=False
+        )
+        return [(start, end) for start, end in encoding["offset_mapping"] if end > start]
+
+
+@lru_cache(maxsize=8)
+def get_chunker(max_tokens: int, overlap_tokens: int, tokenizer_name: Optional[str]) -> TokenChunker:
+    """
+    Obtiene (una vez por proceso y configuración) el chunker con su tokenizador
+
+    Args:
+        max_tokens: Tokens máximos por chunk, incluidos los especiales
+        overlap_tokens: Tokens de solapamiento entre chunks
+        tokenizer_name: Modelo cuyo tokenizador se usa (None = aproximación por regex)
+
+    Returns:
+        Chunker listo para usar
+    """
+    tokenizer = load_tokenizer(tokenizer_name) if tokenizer_name else None
+    return TokenChunker(max_tokens, overlap_tokens, tokenizer)
@@ -1,7 +1,8 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders import TextLoader
+from pypdf import PdfReader
 from fastapi import UploadFile
-from typing import List, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
 import tempfile
 import os
 import sys
@@ -10,6 +11,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models import DocumentChunk
 from config import settings
+from IA.executor import ingest_executor, parse_executor
+from documents.chunker import TokenChunker, get_chunker
+
+# Rango de páginas [inicio, fin) de una parte de un archivo; (0, None) es el archivo completo
+PartRange = Tuple[int, Optional[int]]
+# Chunk extraído por un proceso de análisis: (página, texto); la página es None fuera de PDF
+ExtractedChunk = Tuple[Optional[int], str]
+# Opciones de división enviadas a los procesos de análisis: (tokens máximos, tokens de solapamiento, tokenizador)
+ChunkingOptions = Tuple[int, int, Optional[str]]
 
 
 class DocumentLoaderService:
@@ -17,8 +27,8 @@ class DocumentLoaderService:
     
     def __init__(self):
         self.supported_extensions = {
-            '.pdf': self._load_pdf,
-            '.txt': self._load_txt
+            '.pdf': self._extract_pdf,
+            '.txt': self._extract_txt
         }
 
     async def load_uploaded_files(self, files: List[UploadFile]) -> List[DocumentChunk]:
@@ -30,125 +40,298 @@ class DocumentLoaderService:
             
         Returns:
             Lista de chunks de documentos
+            
+        Raises:
+            ServiceBusyError: Si la cola del pool de ingesta o la de análisis está llena
+        """
+        return await self.process_uploads(files, self.parse_saved_files)
+
+    async def process_uploads(self, files: List[UploadFile],
+                              process: Callable[[List[Tuple[str, str]]], Any]) -> Any:
         """
-        all_chunks = []
+        Guarda archivos subidos en disco y los procesa en un hilo del pool de ingesta
         
-        for file in files:
-            chunks = await self._process_uploaded_file(file)
-            all_chunks.extend(chunks)
+        Los archivos se guardan por bloques y `process` los recibe como tuplas (ruta
+        temporal, nombre original), normalmente para recorrerlos con `iter_parsed_files`;
+        así el event loop no abre los PDF. Los temporales se borran cuando `process`
+        termina, aunque la petición se cancele antes.
+        
+        Args:
+            files: Lista de archivos subidos (los de tipo no soportado se omiten)
+            process: Función síncrona que recibe las tuplas de los archivos guardados
             
-        return all_chunks
+        Returns:
+            Resultado de `process`
+            
+        Raises:
+            ServiceBusyError: Si la cola del pool de ingesta está llena
+        """
+        uploads: List[Tuple[str, str]] = []
+        try:
+            for file in files:
+                if not file.filename:
+                    continue
+                file_ext = os.path.splitext(file.filename.lower())[1]
+                if file_ext not in self.supported_extensions:
+                    print(f"Tipo de archivo no soportado: {file_ext}")
+                    continue
+                uploads.append((await self.save_upload_to_temp(file), file.filename))
+            
+            future = ingest_executor.submit(_process_and_remove, process, uploads)
+        except BaseException:
+            remove_temp_files(uploads)
+            raise
+        
+        # Si la petición se cancela antes de que la tarea empiece, nadie más borra los temporales
+        future.add_done_callback(lambda done: done.cancelled() and remove_temp_files(uploads))
+        return await asyncio.wrap_future(future)
 
-    async def _process_uploaded_file(self, file: UploadFile) -> List[DocumentChunk]:
+    def parse_saved_files(self, uploads: List[Tuple[str, str]]) -> List[DocumentChunk]:
         """
-        Procesa un archivo subido individual
+        Analiza archivos ya guardados en disco
         
         Args:
-            file: Archivo subido
+            uploads: Tuplas (ruta temporal, nombre original)
             
         Returns:
-            Lista de chunks del documento
+            Chunks de todos los archivos, en el orden en que terminan de analizarse
+        """
+        return [chunk for _, chunks in self.iter_parsed_files(uploads) for chunk in chunks]
+
+    def iter_parsed_files(self, uploads: List[Tuple[str, str]]) -> Iterator[Tuple[str, List[DocumentChunk]]]:
         """
-        if not file.filename:
-            return []
+        Analiza archivos en el pool de procesos y los entrega a medida que terminan
+        
+        Los PDF se dividen en rangos de páginas que se analizan en paralelo. Como mucho
+        hay `parse_workers` partes en análisis a la vez, así los chunks de un archivo
+        pasan al cálculo de embeddings mientras se analizan los siguientes sin acumular
+        todos los documentos en memoria. Las páginas de cada PDF se cuentan en el hilo
+        que consume el iterador, nunca en el event loop.
+        
+        Si el iterador termina antes de tiempo (error o cierre), cancela las partes en
+        cola y espera las que están en análisis, así el llamador puede borrar los
+        archivos temporales sin que ningún proceso siga leyéndolos.
+        
+        Args:
+            uploads: Tuplas (ruta temporal, nombre original)
             
-        file_ext = os.path.splitext(file.filename.lower())[1]
+        Returns:
+            Iterador de (nombre original, chunks); un archivo que no se pudo analizar
+            produce una lista vacía
+            
+        Raises:
+            ServiceBusyError: Si la cola del pool de análisis está llena
+        """
+        # Partes analizadas de cada archivo (None = pendiente) y si alguna falló
+        parts: Dict[int, List[Optional[List[ExtractedChunk]]]] = {}
+        failed: Dict[int, bool] = {}
+        pending: Dict[Future, Tuple[int, int]] = {}
         
-        if file_ext not in self.supported_extensions:
-            print(f"Tipo de archivo no soportado: {file_ext}")
-            return []
+        def iter_tasks():
+            for file_number, (temp_path, filename) in enumerate(uploads):
+                ranges = self.plan_parts(temp_path, filename)
+                parts[file_number] = [None] * len(ranges)
+                failed[file_number] = False
+                for part_number, (start, end) in enumerate(ranges):
+                    yield file_number, part_number, temp_path, filename, start, end
+        
+        tasks = iter_tasks()
+        
+        def submit_next():
+            for file_number, part_number, temp_path, filename, start, end in tasks:
+                future = parse_executor.submit(
+                    parse_file_part, temp_path, filename, start, end, self.chunking_options()
+                )
+                pending[future] = (file_number, part_number)
+                return
         
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-                content = await file.read()
-                temp_file.write(content)
-                temp_file.flush()
-                
-                chunks = self.supported_extensions[file_ext](temp_file.name, file.filename)
-                
-                os.unlink(temp_file.name)
-                
-                return chunks
-                
-        except Exception as e:
-            print(f"Error procesando archivo {file.filename}: {e}")
-            return []
+            for _ in range(parse_executor.max_workers):
+                submit_next()
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_number, part_number = pending.pop(future)
+                    filename = uploads[file_number][1]
+                    try:
+                        parts[file_number][part_number] = future.result()
+                    except Exception as e:
+                        print(f"Error procesando archivo {filename}: {e}")
+                        parts[file_number][part_number] = []
+                        failed[file_number] = True
+                    submit_next()
+                    
+                    if all(part is not None for part in parts[file_number]):
+                        file_parts = parts.pop(file_number)
+                        yield filename, [] if failed.pop(file_number) else self.build_chunks(filename, file_parts)
+        finally:
+            for future in pending:
+                future.cancel()
+            wait(pending)
 
-    def _load_pdf(self, file_path: str, original_filename: str) -> List[DocumentChunk]:
+    async def save_upload_to_temp(self, file: UploadFile) -> str:
         """
-        Carga un archivo PDF
+        Guarda un archivo subido en un archivo temporal leyéndolo por bloques
         
         Args:
-            file_path: Ruta del archivo temporal
+            file: Archivo subido
+            
+        Returns:
+            Ruta del archivo temporal (el llamador debe eliminarlo)
+        """
+        file_ext = os.path.splitext(file.filename.lower())[1]
+        
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
+            while True:
+                block = await file.read(settings.upload_read_chunk_size)
+                if not block:
+                    break
+                temp_file.write(block)
+            
+            return temp_file.name
+
+    def plan_parts(self, file_path: str, original_filename: str) -> List[PartRange]:
+        """
+        Divide un archivo en partes que pueden analizarse en procesos distintos
+        
+        Los PDF se parten en rangos de `pdf_pages_per_task` páginas; el resto de los
+        formatos se analiza completo.
+        
+        Args:
+            file_path: Ruta del archivo
             original_filename: Nombre original del archivo
             
         Returns:
-            Lista de chunks del documento
+            Lista de rangos [inicio, fin) de páginas
         """
+        if os.path.splitext(original_filename.lower())[1] != '.pdf':
+            return [(0, None)]
+        
         try:
-            loader = PyPDFLoader(file_path)
-            pages = loader.load_and_split()
-            
-            chunks = []
-            for i, page in enumerate(pages):
-                chunk = DocumentChunk(
-                    text=page.page_content,
-                    document_name=original_filename,
-                    chunk_index=i
-                )
-                chunks.append(chunk)
-                
-            return chunks
+            # Solo lee la tabla de referencias y el árbol de páginas, no su contenido
+            page_count = len(PdfReader(file_path).pages)
+        except Exception:
+            # El error real se reporta al analizar el archivo completo
+            return [(0, None)]
+        
+        pages_per_task = max(1, settings.pdf_pages_per_task)
+        return [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ] or [(0, None)]
+
+    def extract_part(self, file_path: str, original_filename: str, start: int = 0,
+                     end: Optional[int] = None,
+                     chunking: Optional[ChunkingOptions] = None) -> List[ExtractedChunk]:
+        """
+        Extrae y divide en chunks una parte de un archivo
+        
+        Args:
+            file_path: Ruta del archivo
+            original_filename: Nombre original del archivo
+            start: Primera página (índice desde 0)
+            end: Página siguiente a la última (None = hasta el final)
+            chunking: Opciones de división (None = las configuradas en este proceso)
             
-        except Exception as e:
-            print(f"Error cargando PDF {original_filename}: {e}")
-            return []
+        Returns:
+            Lista de (página, texto) en orden
+            
+        Raises:
+            ValueError: Si el tipo de archivo no está soportado
+        """
+        file_ext = os.path.splitext(original_filename.lower())[1]
+        if file_ext not in self.supported_extensions:
+            raise ValueError(f"Tipo de archivo no soportado: {file_ext}")
+        
+        chunker = get_chunker(*(chunking or self.chunking_options()))
+        return self.supported_extensions[file_ext](file_path, start, end, chunker)
 
-    def _load_txt(self, file_path: str, original_filename: str) -> List[DocumentChunk]:
+    def chunking_options(self) -> ChunkingOptions:
         """
-        Carga un archivo de texto
+        Opciones de división vigentes en este proceso
+        
+        Se envían a los procesos de análisis junto con cada tarea, que no ven los
+        cambios hechos a `settings` después de iniciarse.
+        
+        Returns:
+            Tupla (tokens máximos por chunk, tokens de solapamiento, modelo del tokenizador)
+        """
+        return (
+            settings.chunk_max_tokens,
+            settings.chunk_overlap_tokens,
+            settings.chunk_tokenizer or settings.embedding_model
+        )
+
+    def build_chunks(self, original_filename: str, parts: List[List[ExtractedChunk]]) -> List[DocumentChunk]:
+        """
+        Une las partes de un archivo numerando sus chunks en orden
         
         Args:
-            file_path: Ruta del archivo temporal
             original_filename: Nombre original del archivo
+            parts: Partes extraídas, en orden de páginas
             
         Returns:
             Lista de chunks del documento
         """
-        try:
-            loader = TextLoader(file_path, encoding='utf-8')
-            documents = loader.load()
+        extracted = [chunk for part in parts for chunk in part]
+        return [
+            DocumentChunk(text=text, document_name=original_filename, chunk_index=i, page=page)
+            for i, (page, text) in enumerate(extracted)
+        ]
+
+    def _extract_pdf(self, file_path: str, start: int, end: Optional[int],
+                     chunker: TokenChunker) -> List[ExtractedChunk]:
+        """
+        Extrae el texto de un rango de páginas de un PDF y lo divide por página
+        
+        Args:
+            file_path: Ruta del archivo temporal
+            start: Primera página (índice desde 0)
+            end: Página siguiente a la última (None = hasta el final)
+            chunker: Chunker que divide el texto
             
-            chunks = []
-            for doc in documents:
-                text = doc.page_content
-                
-                if len(text) > settings.chunk_size:
-                    text_chunks = self._split_text(text, settings.chunk_size, settings.chunk_overlap)
-                    for i, chunk_text in enumerate(text_chunks):
-                        chunk = DocumentChunk(
-                            text=chunk_text,
-                            document_name=original_filename,
-                            chunk_index=i
-                        )
-                        chunks.append(chunk)
-                else:
-                    chunk = DocumentChunk(
-                        text=text,
-                        document_name=original_filename,
-                        chunk_index=0
-                    )
-                    chunks.append(chunk)
-                    
-            return chunks
+        Returns:
+            Lista de (número de página desde 1, texto); las páginas sin texto se omiten
+        """
+        reader = PdfReader(file_path)
+        end = len(reader.pages) if end is None else min(end, len(reader.pages))
+        
+        chunks = []
+        for page_number in range(start, end):
+            text = reader.pages[page_number].extract_text() or ""
+            if not text.strip():
+                continue
+            for chunk_text in chunker.chunk(text):
+                chunks.append((page_number + 1, chunk_text))
+        return chunks
+
+    def _extract_txt(self, file_path: str, start: int, end: Optional[int],
+                     chunker: TokenChunker) -> List[ExtractedChunk]:
+        """
+        Extrae y divide el texto de un archivo de texto (sin páginas)
+        
+        Args:
+            file_path: Ruta del archivo temporal
+            start: Sin uso, los archivos de texto se analizan completos
+            end: Sin uso
+            chunker: Chunker que divide el texto
             
-        except Exception as e:
-            print(f"Error cargando texto {original_filename}: {e}")
-            return []
+        Returns:
+            Lista de (None, texto)
+        """
+        from langchain_community.document_loaders import TextLoader
+        
+        loader = TextLoader(file_path, encoding='utf-8')
+        return [
+            (None, chunk_text)
+            for doc in loader.load()
+            for chunk_text in chunker.chunk(doc.page_content)
+        ]
 
     def _split_text(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
         """
-        Divide un texto en chunks con overlap
+        Divide un texto en chunks de caracteres con overlap (división anterior, usada como referencia en el benchmark)
         
         Args:
             text: Texto a dividir
@@ -184,3 +367,38 @@ class DocumentLoaderService:
 
 
 document_loader_service = DocumentLoaderService()
+
+
+def parse_file_part(file_path: str, original_filename: str, start: int = 0, end: Optional[int] = None,
+                    chunking: Optional[ChunkingOptions] = None) -> List[ExtractedChunk]:
+    """
+    Extrae una parte de un archivo (punto de entrada en los procesos de análisis)
+    
+    Args:
+        file_path: Ruta del archivo
+        original_filename: Nombre original del archivo
+        start: Primera página (índice desde 0)
+        end: Página siguiente a la última (None = hasta el final)
+        chunking: Opciones de división de `chunking_options`
+        
+    Returns:
+        Lista de (página, texto)
+    """
+    return document_loader_service.extract_part(file_path, original_filename, start, end, chunking)
+
+
+def _process_and_remove(process: Callable[[List[Tuple[str, str]]], Any], uploads: List[Tuple[str, str]]) -> Any:
+    """Ejecuta `process` sobre archivos guardados y luego los elimina"""
+    try:
+        return process(uploads)
+    finally:
+        remove_temp_files(uploads)
+
+
+def remove_temp_files(uploads: List[Tuple[str, str]]):
+    """Elimina los archivos temporales de una lista de tuplas (ruta temporal, nombre original)"""
+    for temp_path, _ in uploads:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
@@ -0,0 +1,193 @@
+"""
+Trabajos de ingesta en segundo plano
+"""
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+import os
+import threading
+import uuid
+
+from fastapi import UploadFile
+
+from .schemas import IngestJobStatus, FileProgress
+from .document_loader import document_loader_service, remove_temp_files
+from models import DocumentChunk
+from IA.executor import ingest_executor
+from config import settings
+
+
+class IngestJobManager:
+    """
+    Encola ingestas en el pool de ingesta y registra su progreso por archivo
+
+    El estado de cada trabajo se guarda además en `ingest_jobs_path`, así con varios
+    workers se puede consultar desde uno distinto al que lo ejecuta.
+    """
+
+    def __init__(self, embeddings_service):
+        self.embeddings_service = embeddings_service
+        self.jobs: "OrderedDict[str, IngestJobStatus]" = OrderedDict()
+        self.jobs_path = Path(settings.ingest_jobs_path)
+        self._lock = threading.Lock()
+
+    async def submit(self, files: List[UploadFile]) -> IngestJobStatus:
+        """
+        Guarda los archivos en disco y encola su ingesta
+
+        Los archivos se copian antes de responder porque FastAPI cierra los
+        UploadFile al terminar la petición.
+
+        Args:
+            files: Archivos ya validados
+
+        Returns:
+            Estado inicial del trabajo
+
+        Raises:
+            ServiceBusyError: Si la cola de ingesta está llena
+        """
+        uploads: List[Tuple[str, str]] = []
+        try:
+            for file in files:
+                uploads.append((await document_loader_service.save_upload_to_temp(file), file.filename))
+        except Exception:
+            remove_temp_files(uploads)
+            raise
+
+        job = IngestJobStatus(
+            job_id=uuid.uuid4().hex,
+            files=[
+                FileProgress(filename=file.filename, file_size=getattr(file, 'size', 0) or 0)
+                for file in files
+            ]
+        )
+
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._persist(job)
+            self._trim_history()
+
+        try:
+            ingest_executor.submit(self._run_job, job.job_id, uploads)
+        except Exception:
+            with self._lock:
+                self.jobs.pop(job.job_id, None)
+                self._job_file(job.job_id).unlink(missing_ok=True)
+            remove_temp_files(uploads)
+            raise
+
+        return self.get_job(job.job_id)
+
+    def get_job(self, job_id: str) -> Optional[IngestJobStatus]:
+        """
+        Obtiene una copia del estado de un trabajo
+
+        Args:
+            job_id: Identificador del trabajo
+
+        Returns:
+            Estado del trabajo o None si no existe
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job:
+                return job.model_copy(deep=True)
+
+        # Trabajo de otro worker
+        try:
+            return IngestJobStatus.model_validate_json(self._job_file(job_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _run_job(self, job_id: str, uploads: List[Tuple[str, str]]):
+        """
+        Analiza, indexa y persiste los archivos de un trabajo (en un hilo del pool)
+
+        Los archivos se analizan en paralelo en el pool de procesos y los chunks de cada
+        uno pasan al cálculo de embeddings en cuanto está listo.
+        """
+        self._update_job(job_id, status="running")
+        indexed_files: List[str] = []
+        total_chunks = 0
+
+        def parsed_groups() -> Iterator[List[DocumentChunk]]:
+            nonlocal total_chunks
+            for filename, chunks in document_loader_service.iter_parsed_files(uploads):
+                if not chunks:
+                    self._update_file(job_id, [filename], stage="failed", error="No se pudo procesar el archivo")
+                    continue
+
+                self._update_file(job_id, [filename], stage="loaded")
+                self._update_file(job_id, [filename], stage="chunked", chunks_count=len(chunks))
+                indexed_files.append(filename)
+                total_chunks += len(chunks)
+                yield chunks
+
+        try:
+            created = self.embeddings_service.create_vector_database_from_stream(
+                parsed_groups(),
+                progress_callback=lambda stage: self._update_file(job_id, indexed_files, stage=stage)
+            )
+        finally:
+            remove_temp_files(uploads)
+
+        if not total_chunks:
+            self._finish_job(job_id, error="No se pudieron procesar los archivos")
+        elif created:
+            self._finish_job(job_id, total_chunks=total_chunks)
+        else:
+            self._finish_job(job_id, error="Error creando la base de datos vectorial")
+
+    def _update_job(self, job_id: str, **changes):
+        """Actualiza campos de un trabajo"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job:
+                for field, value in changes.items():
+                    setattr(job, field, value)
+                self._persist(job)
+
+    def _update_file(self, job_id: str, filenames: List[str], **changes):
+        """Actualiza el progreso de uno o más archivos de un trabajo"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job:
+                for file_progress in job.files:
+                    if file_progress.filename in filenames:
+                        for field, value in changes.items():
+                            setattr(file_progress, field, value)
+                self._persist(job)
+
+    def _finish_job(self, job_id: str, total_chunks: int = 0, error: Optional[str] = None):
+        """Marca un trabajo como terminado"""
+        self._update_job(
+            job_id,
+            status="failed" if error else "completed",
+            total_chunks=total_chunks,
+            error=error,
+            finished_at=datetime.now()
+        )
+
+    def _trim_history(self):
+        """Descarta los trabajos terminados más antiguos por encima del límite configurado"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self.jobs) - settings.ingest_job_history)]:
+            del self.jobs[job_id]
+            self._job_file(job_id).unlink(missing_ok=True)
+
+    def _job_file(self, job_id: str) -> Path:
+        """Archivo con el estado de un trabajo (el ID se valida para no salir del directorio)"""
+        return self.jobs_path / f"{uuid.UUID(hex=job_id).hex}.json"
+
+    def _persist(self, job: IngestJobStatus):
+        """Guarda el estado de un trabajo de forma atómica (requiere el lock)"""
+        try:
+            self.jobs_path.mkdir(parents=True, exist_ok=True)
+            job_file = self._job_file(job.job_id)
+            temp_file = job_file.with_name(job_file.name + ".tmp")
+            temp_file.write_text(job.model_dump_json(), encoding="utf-8")
+            os.replace(temp_file, job_file)
+        except OSError as e:
+            print(f"No se pudo guardar el estado del trabajo {job.job_id}: {e}")
@@ -1,25 +1,69 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
+import json
 import sys
 import os
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from .schemas import IngestResponse, QuestionRequest, AskResponse, StatusResponse, SearchResultsResponse
-from src.models import ProcessedFile
+from .schemas import (IngestResponse, QuestionRequest, AskResponse, StatusResponse, SearchResultsResponse, IngestJobStatus,
+                      BatchSearchRequest, BatchSearchResponse)
+from src.models import DocumentChunk, ProcessedFile, ReadinessCheck
 from .validator import validate_uploaded_files
+from .jobs import IngestJobManager
 from IA.embeddings import EmbeddingsService
 from IA.llm_service import LLMService
-from services import search_passages, answer_question
+from IA.executor import index_executor, ingest_executor
+from services import search_passages, search_passages_batch, aanswer_question, stream_answer, validate_question
+from exceptions import LLMServiceError, ServiceBusyError
 
 router = APIRouter(prefix="/api/v1", tags=["documents"])
+# Construirlos es barato: el modelo, el índice y el cliente del LLM se cargan en warm_up_services o al primer uso
 embeddings_service = EmbeddingsService()
 llm_service = LLMService()
+ingest_jobs = IngestJobManager(embeddings_service)
 
 
-@router.post("/ingest", response_model=IngestResponse)
+def warm_up_services():
+    """
+    Carga el índice, el modelo de embeddings y el cliente del LLM (se ejecuta en un hilo al arrancar)
+    
+    Después deja un hilo que recarga el índice cuando otro worker publica una versión nueva.
+    """
+    start = time.perf_counter()
+    try:
+        embeddings_service.warm_up()
+        embeddings_service.start_index_watcher()
+        llm_service.is_available()
+        print(f"Servicios listos en {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"Error precargando servicios: {e}")
+
+
+def readiness() -> ReadinessCheck:
+    """
+    Estado de carga de los servicios
+    
+    Returns:
+        Listo cuando el índice y el modelo de embeddings están en memoria
+    """
+    index_loaded = embeddings_service.is_index_loaded
+    model_loaded = embeddings_service.is_model_loaded
+    return ReadinessCheck(
+        ready=index_loaded and model_loaded,
+        index_loaded=index_loaded,
+        embedding_model_loaded=model_loaded,
+        llm_initialized=llm_service.is_initialized
+    )
+
+
+@router.post("/ingest", response_model=Union[IngestResponse, IngestJobStatus])
 async def ingest_documents(
-    files: List[UploadFile] = File(..., description="Archivos a procesar (.txt o .pdf)")
+    response: Response,
+    files: List[UploadFile] = File(..., description="Archivos a procesar (.txt o .pdf)"),
+    background: bool = Query(False, description="Procesar en segundo plano y devolver un job_id")
 ):
     """
     Ingesta múltiples archivos, los procesa y los indexa
@@ -27,56 +71,74 @@ async def ingest_documents(
     - Acepta entre 3 y 10 archivos
     - Formatos soportados: .txt, .pdf
     - Procesa los archivos y crea embeddings
-    - Almacena automáticamente en FAISS + metadata.json
+    - Almacena automáticamente en FAISS + almacén de chunks (SQLite)
+    - Con background=true responde 202 con un job_id consultable en GET /ingest/{job_id}
     """
     try:
         validated_files = validate_uploaded_files(files)
+        
+        if background:
+            response.status_code = 202
+            return await ingest_jobs.submit(validated_files)
+        
         from .document_loader import document_loader_service
-        all_chunks = await document_loader_service.load_uploaded_files(validated_files)
         
-        if not all_chunks:
+        # Chunks por archivo, a medida que cada uno termina de analizarse
+        file_chunks_count: Dict[str, int] = {}
+        busy_errors: List[ServiceBusyError] = []
+        
+        def parsed_groups(uploads) -> Iterator[List[DocumentChunk]]:
+            try:
+                for filename, chunks in document_loader_service.iter_parsed_files(uploads):
+                    if chunks:
+                        file_chunks_count[filename] = len(chunks)
+                        yield chunks
+            except ServiceBusyError as e:
+                # La ingesta lo convierte en un fallo genérico; se conserva para responder 503
+                busy_errors.append(e)
+                raise
+        
+        # Cada archivo se embebe en cuanto se analiza, sin juntar todos los chunks en memoria
+        created = await document_loader_service.process_uploads(
+            validated_files,
+            lambda uploads: embeddings_service.create_vector_database_from_stream(parsed_groups(uploads))
+        )
+        
+        if busy_errors:
+            raise busy_errors[0]
+        
+        if not file_chunks_count:
             raise HTTPException(
                 status_code=400,
                 detail="No se pudieron procesar los archivos"
             )
         
-        if not embeddings_service.create_vector_database(all_chunks):
+        if not created:
             raise HTTPException(
                 status_code=500,
                 detail="Error creando la base de datos vectorial"
             )
         
-        processed_files = []
-        file_chunks_count = {}
-        
-        for chunk in all_chunks:
-            if chunk.document_name not in file_chunks_count:
-                file_chunks_count[chunk.document_name] = 0
-            file_chunks_count[chunk.document_name] += 1
-        
-        for filename, chunks_count in file_chunks_count.items():
-            file_size = 0
-            for file in validated_files:
-                if file.filename == filename:
-                    file_size = getattr(file, 'size', 0)
-                    break
-            
-            processed_files.append(ProcessedFile(
-                filename=filename,
-                chunks_count=chunks_count,
-                file_size=file_size
-            ))
-        
-        total_chunks = len(all_chunks)
+        processed_files = [
+            ProcessedFile(
+                filename=file.filename,
+                chunks_count=file_chunks_count[file.filename],
+                file_size=getattr(file, 'size', 0)
+            )
+            for file in validated_files
+            if file.filename in file_chunks_count
+        ]
         
         return IngestResponse(
             message=f"Se procesaron exitosamente {len(processed_files)} archivos",
             files_processed=processed_files,
-            total_chunks=total_chunks
+            total_chunks=sum(file_chunks_count.values())
         )
         
     except HTTPException:
         raise
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=503, detail=e.message)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -84,6 +146,20 @@ async def ingest_documents(
         )
 
 
+@router.get("/ingest/{job_id}", response_model=IngestJobStatus)
+async def get_ingest_job(job_id: str):
+    """
+    Consulta el progreso de una ingesta en segundo plano
+    
+    - Estado del trabajo: queued, running, completed o failed
+    - Etapa por archivo: loaded, chunked, embedded, persisted (o failed)
+    """
+    job = ingest_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No existe el trabajo de ingesta {job_id}")
+    return job
+
+
 @router.post("/ask", response_model=AskResponse)
 async def ask_endpoint(request: QuestionRequest):
     """
@@ -93,9 +169,14 @@ async def ask_endpoint(request: QuestionRequest):
     - Responde en 3-4 líneas con 1-3 citas de respaldo
     - Dice "No encuentro esa información" si no hay contexto suficiente
     - Incluye referencias a los documentos fuente
+    - Responde 503 si el circuito del LLM está abierto y 502 si el LLM falla tras los reintentos
     """
     try:
-        return answer_question(llm_service, embeddings_service, request.question)
+        return await aanswer_question(llm_service, embeddings_service, request.question)
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=503, detail=e.message)
+    except LLMServiceError as e:
+        raise HTTPException(status_code=502, detail=e.message)
     except ValueError as e:
         if "llm no está disponible" in str(e).lower():
             raise HTTPException(status_code=503, detail=str(e))
@@ -105,6 +186,39 @@ async def ask_endpoint(request: QuestionRequest):
         raise HTTPException(status_code=500, detail=f"Error procesando la pregunta: {str(e)}")
 
 
+@router.post("/ask/stream")
+async def ask_stream_endpoint(request: QuestionRequest):
+    """
+    Realiza una pregunta y transmite la respuesta con Server-Sent Events
+    
+    - event: citations -> citas de respaldo, enviadas apenas termina la búsqueda
+    - event: token -> fragmento de la respuesta a medida que el LLM lo genera
+    - event: done -> respuesta completa y has_sufficient_context
+    - event: error -> error del LLM durante la generación
+    """
+    try:
+        validate_question(llm_service, request.question)
+    except ValueError as e:
+        if "llm no está disponible" in str(e).lower():
+            raise HTTPException(status_code=503, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        _sse_events(stream_answer(llm_service, embeddings_service, request.question)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _sse_events(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Serializa eventos {"event", "data"} al formato de Server-Sent Events"""
+    try:
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+    except ServiceBusyError as e:
+        yield f"event: error\ndata: {json.dumps({'detail': e.message}, ensure_ascii=False)}\n\n"
+
+
 @router.get("/status", response_model=StatusResponse)
 async def get_status():
     """
@@ -114,10 +228,11 @@ async def get_status():
     - Total de chunks procesados
     - Lista de documentos disponibles
     - Vectores indexados en FAISS
-    - Disponibilidad del LLM
+    - Disponibilidad del LLM y estado de su circuit breaker
     """
     try:
-        db_stats = embeddings_service.get_database_stats()
+        # Contadores en memoria: no espera la carga del índice ni ocupa el executor del índice
+        db_stats = embeddings_service.get_database_stats(load=False)
         total_docs = db_stats.get("unique_sources", 0)
         total_chunks = db_stats.get("total_documents", 0)
         available_docs = db_stats.get("source_list", [])
@@ -129,7 +244,8 @@ async def get_status():
             available_documents=available_docs,
             indexed_vectors=total_vectors,
             total_documents=total_chunks,
-            llm_available=llm_service.is_available()
+            llm_available=llm_service.is_available(initialize=False),
+            llm_circuit_state=llm_service.circuit_breaker.state
         )
         
     except Exception as e:
@@ -150,7 +266,7 @@ async def clear_documents():
     - Limpia la persistencia en disco
     """
     try:
-        embeddings_service.reset_database()
+        await index_executor.run(embeddings_service.reset_database)
         return {"message": "Todos los documentos han sido eliminados"}
         
     except Exception as e:
@@ -160,22 +276,50 @@ async def clear_documents():
         )
 
 @router.get("/search", response_model=SearchResultsResponse)
-async def search_endpoint(q: str, k: int = 5):
+async def search_endpoint(
+    q: str,
+    k: int = 5,
+    mode: Optional[str] = Query(None, description="vector, lexical o hybrid (por defecto el configurado)")
+):
     """
     Búsqueda de pasajes relevantes en los documentos
     
     - q: Consulta de búsqueda (requerido)
     - k: Número máximo de pasajes a devolver (por defecto 5)
+    - mode: vector (embeddings), lexical (BM25) o hybrid (fusión RRF de ambos)
     - Devuelve: texto del fragmento, nombre del documento, puntaje de relevancia
     """
     try:
-        return search_passages(embeddings_service, q, k)
+        return await index_executor.run(search_passages, embeddings_service, q, k, mode)
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=503, detail=e.message)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en la búsqueda: {str(e)}")
 
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch_endpoint(request: BatchSearchRequest):
+    """
+    Búsqueda de pasajes para varias consultas en una sola solicitud
+    
+    - queries: lista de consultas, cada una con su k y filtros opcionales (source, file_type)
+    - mode: vector, lexical o hybrid (por defecto el configurado)
+    - Los embeddings de todas las consultas se calculan en un solo lote y, en modo
+      vector, las consultas sin filtro se resuelven con una única búsqueda FAISS
+    - Devuelve los resultados de cada consulta en el mismo orden
+    """
+    try:
+        return await index_executor.run(search_passages_batch, embeddings_service, request.queries, request.mode)
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=503, detail=e.message)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la búsqueda por lotes: {str(e)}")
+
+
 @router.get("/stats")
 async def get_stats():
     """
@@ -185,14 +329,21 @@ async def get_stats():
     - Estado de persistencia (memoria vs disco)
     - Información del modelo de embeddings
     - Estado del servicio de LLM
-    - Métricas de rendimiento
+    - Métricas de rendimiento (incluidos los tiempos de recuperación y reranking de /ask)
     """
     try:
-        faiss_stats = embeddings_service.get_database_stats()
+        faiss_stats = embeddings_service.get_database_stats(load=False)
         
         return {
             "faiss_stats": faiss_stats,
-            "llm_available": llm_service.is_available(),
+            "llm_available": llm_service.is_available(initialize=False),
+            "llm_client": llm_service.get_client_stats(),
+            "executors": {
+                "index": index_executor.get_stats(),
+                "ingest": ingest_executor.get_stats()
+            },
+            "caches": embeddings_service.get_cache_stats(),
+            "retrieval": embeddings_service.reranker.get_stats(),
             "system_status": {
                 "has_data": faiss_stats.get("total_vectors", 0) > 0,
                 "storage": "persistent",
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from src.models import SearchResult, Citation, ProcessedFile
 
 class QuestionRequest(BaseModel):
@@ -47,6 +48,10 @@ class SearchPassage(BaseModel):
     relevance_score: float = Field(
         description="Puntaje de relevancia"
     )
+    page: Optional[int] = Field(
+        default=None,
+        description="Página del documento (solo PDF)"
+    )
 
 
 class SearchResultsResponse(BaseModel):
@@ -62,6 +67,48 @@ class SearchResultsResponse(BaseModel):
     )
 
 
+class BatchSearchQuery(BaseModel):
+    """Consulta de una búsqueda por lotes"""
+    q: str = Field(
+        min_length=1,
+        max_length=250,
+        description="Consulta de búsqueda"
+    )
+    k: int = Field(
+        default=5,
+        ge=1,
+        le=100,
+        description="Número máximo de pasajes a devolver"
+    )
+    source: Optional[str] = Field(
+        default=None,
+        description="Restringir a un documento"
+    )
+    file_type: Optional[str] = Field(
+        default=None,
+        description="Restringir a un tipo de archivo (por ejemplo .pdf)"
+    )
+
+
+class BatchSearchRequest(BaseModel):
+    """Solicitud de búsqueda por lotes"""
+    queries: List[BatchSearchQuery] = Field(
+        min_length=1,
+        description="Consultas a resolver en una sola solicitud"
+    )
+    mode: Optional[str] = Field(
+        default=None,
+        description="vector, lexical o hybrid (por defecto el configurado)"
+    )
+
+
+class BatchSearchResponse(BaseModel):
+    """Respuesta del endpoint de búsqueda por lotes"""
+    results: List[SearchResultsResponse] = Field(
+        description="Resultados de cada consulta, en el orden de la solicitud"
+    )
+
+
 class AskResponse(BaseModel):
     """Respuesta del endpoint de preguntas"""
     question: str = Field(
@@ -93,6 +140,59 @@ class IngestResponse(BaseModel):
     )
 
 
+class FileProgress(BaseModel):
+    """Progreso de un archivo dentro de un trabajo de ingesta"""
+    filename: str = Field(
+        description="Nombre del archivo"
+    )
+    stage: str = Field(
+        default="pending",
+        description="Etapa alcanzada: pending, loaded, chunked, embedded, persisted o failed"
+    )
+    chunks_count: int = Field(
+        default=0,
+        description="Fragmentos generados para el archivo"
+    )
+    file_size: int = Field(
+        default=0,
+        description="Tamaño del archivo en bytes"
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Error del archivo, si lo hubo"
+    )
+
+
+class IngestJobStatus(BaseModel):
+    """Estado de un trabajo de ingesta en segundo plano"""
+    job_id: str = Field(
+        description="Identificador del trabajo"
+    )
+    status: str = Field(
+        default="queued",
+        description="Estado del trabajo: queued, running, completed o failed"
+    )
+    files: List[FileProgress] = Field(
+        description="Progreso por archivo"
+    )
+    total_chunks: int = Field(
+        default=0,
+        description="Total de fragmentos indexados"
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Error del trabajo, si lo hubo"
+    )
+    created_at: datetime = Field(
+        default_factory=datetime.now,
+        description="Fecha de creación del trabajo"
+    )
+    finished_at: Optional[datetime] = Field(
+        default=None,
+        description="Fecha de finalización del trabajo"
+    )
+
+
 class StatusResponse(BaseModel):
     """Respuesta del endpoint de estado"""
     indexed_documents: int = Field(
@@ -112,4 +212,8 @@ class StatusResponse(BaseModel):
     )
     llm_available: bool = Field(
         description="Disponibilidad del LLM"
+    )
+    llm_circuit_state: str = Field(
+        default="closed",
+        description="Estado del circuit breaker del LLM: closed, open o half_open"
     )
\ No newline at end of file
@@ -34,6 +34,16 @@ class FileSizeError(QAException):
     pass
 
 
+class ServiceBusyError(QAException):
+    """Error cuando el servicio no acepta más trabajo pendiente"""
+    pass
+
+
+class LLMServiceError(QAException):
+    """Error del proveedor del LLM tras agotar los reintentos"""
+    pass
+
+
 # HTTP Exceptions
 def create_http_exception(status_code: int, message: str, details: Optional[Dict[str, Any]] = None) -> HTTPException:
     """Crear una HTTPException con formato estándar"""
@@ -11,6 +11,7 @@ class DocumentChunk(BaseModel):
     text: str
     document_name: str
     chunk_index: int
+    page: Optional[int] = None  # Página de origen (PDF, desde 1)
     created_at: datetime = datetime.now()
 
 
@@ -20,6 +21,7 @@ class SearchResult(BaseModel):
     document_name: str
     score: float
     chunk_index: int
+    page: Optional[int] = None
 
 
 class Citation(BaseModel):
@@ -27,6 +29,7 @@ class Citation(BaseModel):
     text: str
     document_name: str
     score: float
+    page: Optional[int] = None
 
 
 class ProcessedFile(BaseModel):
@@ -42,3 +45,11 @@ class HealthCheck(BaseModel):
     app_name: str
     version: str
     timestamp: datetime = datetime.now()
+
+
+class ReadinessCheck(BaseModel):
+    """Modelo para readiness check"""
+    ready: bool
+    index_loaded: bool
+    embedding_model_loaded: bool
+    llm_initialized: bool
@@ -2,7 +2,7 @@
 Servicios simples
 """
 
-from .search_service import search_passages
-from .qa_service import answer_question
+from .search_service import search_passages, search_passages_batch
+from .qa_service import answer_question, aanswer_question, stream_answer, validate_question
 
-__all__ = ['search_passages', 'answer_question']
+__all__ = ['search_passages', 'search_passages_batch', 'answer_question', 'aanswer_question', 'stream_answer', 'validate_question']
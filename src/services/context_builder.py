@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional, Set, Tuple
+import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from documents.chunker import SPECIAL_TOKENS, TokenChunker, get_chunker
+from models import SearchResult
+
+_WORD = re.compile(r"\w+")
+# Caracteres del inicio de un chunk que se buscan en el anterior para detectar el solapamiento
+_OVERLAP_PROBE_CHARS = 20
+# Con menos tokens libres no vale la pena agregar un pasaje recortado
+_MIN_PASSAGE_TOKENS = 16
+
+
+def pack_context(
+    search_results: List[SearchResult],
+    max_tokens: Optional[int] = None,
+    duplicate_threshold: Optional[float] = None
+) -> List[SearchResult]:
+    """
+    Arma el contexto del prompt a partir de los pasajes recuperados
+
+    1. Une los chunks contiguos de un mismo documento (y página), sin repetir el texto
+       que comparten por el solapamiento del chunking.
+    2. Descarta los pasajes cuyo contenido ya está casi completo en los elegidos.
+    3. Agrega pasajes por relevancia hasta `max_tokens`; el primero que no cabe se
+       recorta en oraciones completas y ahí se corta.
+
+    Los tokens se cuentan con el tokenizador del chunking: el del LLM es otro, así que
+    el presupuesto es aproximado.
+
+    Args:
+        search_results: Pasajes en orden de relevancia
+        max_tokens: Tokens de texto de pasajes (None = settings.context_max_tokens)
+        duplicate_threshold: Fracción de trigramas de palabras ya presentes a partir de
+            la cual un pasaje se descarta (None = settings.context_duplicate_threshold)
+
+    Returns:
+        Pasajes del contexto en orden de relevancia
+    """
+    if max_tokens is None:
+        max_tokens = settings.context_max_tokens
+    if duplicate_threshold is None:
+        duplicate_threshold = settings.context_duplicate_threshold
+
+    chunker = get_chunker(
+        settings.chunk_max_tokens, settings.chunk_overlap_tokens, settings.chunk_tokenizer or settings.embedding_model
+    )
+    packed: List[SearchResult] = []
+    seen_shingles: Set[Tuple[str, ...]] = set()
+    remaining = max_tokens
+
+    for passage in merge_adjacent(search_results):
+        shingles = _shingles(passage.text)
+        if shingles and len(shingles & seen_shingles) >= duplicate_threshold * len(shingles):
+            continue
+
+        tokens = chunker.count_tokens(passage.text)
+        if tokens > remaining:
+            if remaining < _MIN_PASSAGE_TOKENS and packed:
+                break
+            truncated = TokenChunker(remaining + SPECIAL_TOKENS, 0, chunker.tokenizer).chunk(passage.text)
+            if truncated:
+                packed.append(passage.model_copy(update={"text": truncated[0]}))
+            break
+
+        packed.append(passage)
+        seen_shingles |= shingles
+        remaining -= tokens
+
+    return packed
+
+
+def merge_adjacent(search_results: List[SearchResult]) -> List[SearchResult]:
+    """
+    Une los chunks consecutivos de un mismo documento y página
+
+    Args:
+        search_results: Pasajes en orden de relevancia
+
+    Returns:
+        Pasajes unidos, ordenados por el mejor puesto de sus chunks; cada uno conserva
+        el chunk_index inicial y la menor distancia de los que lo forman
+    """
+    best_rank: Dict[Tuple[str, int], int] = {}
+    by_document: Dict[str, List[SearchResult]] = {}
+    for rank, result in enumerate(search_results):
+        key = (result.document_name, result.chunk_index)
+        if key in best_rank:
+            continue
+        best_rank[key] = rank
+        by_document.setdefault(result.document_name, []).append(result)
+
+    groups: List[Tuple[int, SearchResult]] = []
+    for results in by_document.values():
+        results.sort(key=lambda result: result.chunk_index)
+        current = results[0]
+        rank = best_rank[(current.document_name, current.chunk_index)]
+        last_index = current.chunk_index
+        for result in results[1:]:
+            if result.chunk_index == last_index + 1 and result.page == current.page:
+                current = current.model_copy(update={
+                    "text": _join_overlapping(current.text, result.text),
+                    "score": min(current.score, result.score)
+                })
+                rank = min(rank, best_rank[(result.document_name, result.chunk_index)])
+            else:
+                groups.append((rank, current))
+                current, rank = result, best_rank[(result.document_name, result.chunk_index)]
+            last_index = result.chunk_index
+        groups.append((rank, current))
+
+    groups.sort(key=lambda group: group[0])
+    return [passage for _, passage in groups]
+
+
+def _join_overlapping(first: str, second: str) -> str:
+    """Concatena dos chunks consecutivos quitando el texto del final del primero que repite el segundo"""
+    probe = second[:_OVERLAP_PROBE_CHARS]
+    position = first.find(probe)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return first[:position] + second
+        position = first.find(probe, position + 1)
+    return f"{first} {second}"
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    """Trigramas de palabras en minúsculas (palabras sueltas en textos muy cortos)"""
+    words = _WORD.findall(text.lower())
+    size = 3 if len(words) >= 3 else 1
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
@@ -1,42 +1,250 @@
 import sys
 import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from documents.schemas import AskResponse
+from IA.executor import index_executor
+from config import settings
+from .context_builder import pack_context
+
+NO_INFO_ANSWER = "No encuentro esa información en los documentos cargados."
 
 
 def answer_question(llm_service, embeddings_service, question: str) -> AskResponse:
     """Responde una pregunta de forma simple"""
-    
+
+    validate_question(llm_service, question)
+
+    cached, cache_key, search_results = prepare_answer(embeddings_service, question)
+    if cached is not None:
+        return cached
+
+    if not search_results:
+        return no_info_response(question)
+
+    prompt = build_prompt(question, search_results)
+    started = time.perf_counter()
+    # El prompt ya incluye pregunta e instrucciones: no se pasa como contexto para no envolverlo de nuevo
+    answer = clean_answer(llm_service.generate_response(prompt))
+
+    # generate_response devuelve los fallos como texto: esos no se guardan
+    return finish_answer(
+        embeddings_service, cache_key, question, answer, search_results,
+        llm_seconds=time.perf_counter() - started, cacheable=not answer.startswith("Error")
+    )
+
+
+async def aanswer_question(llm_service, embeddings_service, question: str) -> AskResponse:
+    """
+    Responde una pregunta sin bloquear el event loop
+
+    La búsqueda corre en el executor del índice y el LLM se llama con su cliente
+    asíncrono (límite de tiempo, reintentos, concurrencia acotada y circuit breaker).
+
+    Args:
+        llm_service: Servicio de LLM
+        embeddings_service: Servicio de embeddings
+        question: Pregunta del usuario
+
+    Returns:
+        Respuesta con citas
+
+    Raises:
+        ValueError: Si el LLM no está disponible o la pregunta está vacía
+        ServiceBusyError: Si el executor está lleno o el circuito del LLM está abierto
+        LLMServiceError: Si el LLM falla tras agotar los reintentos
+    """
+    validate_question(llm_service, question)
+
+    cached, cache_key, search_results = await index_executor.run(prepare_answer, embeddings_service, question)
+    if cached is not None:
+        return cached
+
+    if not search_results:
+        return no_info_response(question)
+
+    prompt = build_prompt(question, search_results)
+    started = time.perf_counter()
+    answer = clean_answer(await llm_service.agenerate_response(prompt))
+
+    return finish_answer(
+        embeddings_service, cache_key, question, answer, search_results,
+        llm_seconds=time.perf_counter() - started
+    )
+
+
+def prepare_answer(embeddings_service, question: str) -> Tuple[Optional[AskResponse], Tuple[List[float], int], list]:
+    """
+    Busca una respuesta cacheada y, si no la hay, recupera el contexto
+
+    Returns:
+        Tupla (respuesta cacheada o None, clave de caché (embedding, generación), pasajes)
+    """
+    # Preguntas iguales o casi iguales sobre el mismo índice reutilizan la respuesta anterior
+    embeddings_service.sync_with_disk()
+    generation = embeddings_service.index_generation
+    question_embedding = embeddings_service.embed_query(question.strip())
+    cache_key = (question_embedding, generation)
+
+    cached = embeddings_service.answer_cache.get(question_embedding, generation)
+    if cached is not None:
+        return cached.model_copy(update={"question": question}), cache_key, []
+
+    return None, cache_key, retrieve_context(embeddings_service, question)
+
+
+def finish_answer(
+    embeddings_service,
+    cache_key: Tuple[List[float], int],
+    question: str,
+    answer: str,
+    search_results: list,
+    llm_seconds: float,
+    cacheable: bool = True
+) -> AskResponse:
+    """Arma la respuesta final con sus citas y la guarda en la caché de respuestas"""
+    has_sufficient_context = has_context(answer)
+
+    response = AskResponse(
+        question=question,
+        answer=answer,
+        citations=build_citations(search_results) if has_sufficient_context else [],
+        has_sufficient_context=has_sufficient_context
+    )
+
+    if cacheable:
+        question_embedding, generation = cache_key
+        embeddings_service.answer_cache.put(question_embedding, generation, response, llm_seconds)
+
+    return response
+
+
+def no_info_response(question: str) -> AskResponse:
+    """Respuesta cuando no hay pasajes relevantes"""
+    return AskResponse(
+        question=question,
+        answer=NO_INFO_ANSWER,
+        citations=[],
+        has_sufficient_context=False
+    )
+
+
+async def stream_answer(llm_service, embeddings_service, question: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Responde una pregunta en streaming
+
+    Emite primero las citas de la recuperación, luego los fragmentos de la respuesta
+    a medida que el LLM los genera y por último un resumen con has_sufficient_context.
+
+    Args:
+        llm_service: Servicio de LLM
+        embeddings_service: Servicio de embeddings
+        question: Pregunta del usuario
+
+    Returns:
+        Iterador asíncrono de eventos {"event": ..., "data": ...}
+    """
+    search_results = await index_executor.run(retrieve_context, embeddings_service, question)
+
+    yield {"event": "citations", "data": build_citations(search_results)}
+
+    if not search_results:
+        yield {"event": "token", "data": {"text": NO_INFO_ANSWER}}
+        yield {"event": "done", "data": {"answer": NO_INFO_ANSWER, "has_sufficient_context": False}}
+        return
+
+    prompt = build_prompt(question, search_results)
+    parts: List[str] = []
+    # El prefijo "Respuesta:" que a veces agrega el modelo se descarta antes de emitir
+    pending = ""
+
+    try:
+        async for text in llm_service.astream_response(prompt):
+            parts.append(text)
+            if pending is not None:
+                pending += text
+                head = clean_answer(pending, strip_end=False)
+                if not head or "respuesta:".startswith(head.lower()):
+                    continue
+                text, pending = head, None
+            yield {"event": "token", "data": {"text": text}}
+
+        if pending and clean_answer(pending):
+            yield {"event": "token", "data": {"text": clean_answer(pending)}}
+    except Exception as e:
+        print(f"Error generando respuesta en streaming: {e}")
+        yield {"event": "error", "data": {"detail": f"Error al generar respuesta: {str(e)}"}}
+        return
+
+    answer = clean_answer("".join(parts))
+    yield {"event": "done", "data": {"answer": answer, "has_sufficient_context": has_context(answer)}}
+
+
+def validate_question(llm_service, question: str):
+    """Valida que el LLM esté disponible y la pregunta no esté vacía"""
     if not llm_service.is_available():
         raise ValueError("El servicio de LLM no está disponible")
-    
+
     if not question or question.strip() == "":
         raise ValueError("La pregunta no puede estar vacía")
-    
-    search_results = embeddings_service.similarity_search_with_threshold(
-        question.strip(), threshold=1.2, k=5
-    )
-    
-    if not search_results:
-        search_results = embeddings_service.similarity_search(question.strip(), k=3)
-    
-    if not search_results:
-        return AskResponse(
-            question=question,
-            answer="No encuentro esa información en los documentos cargados.",
-            citations=[],
-            has_sufficient_context=False
-        )
-    
+
+
+def retrieve_context(embeddings_service, question: str) -> list:
+    """
+    Recupera los pasajes usados como contexto de la respuesta
+
+    Con reranking se recupera un conjunto amplio de candidatos y el cross-encoder
+    elige los `context_k` mejores; si se agota su presupuesto de tiempo se usa el
+    orden vectorial. Los pasajes se empaquetan en `context_max_tokens` sin
+    duplicados. Los tiempos de cada etapa quedan en las estadísticas del reranker.
+    """
+    query = question.strip()
+    reranker = embeddings_service.reranker
+    timings: Dict[str, float] = {}
+    fallback = False
+
+    started = time.perf_counter()
+    if not settings.rerank_enabled:
+        search_results = vector_context(embeddings_service.similarity_search(query, k=settings.context_k))
+        timings["retrieve"] = time.perf_counter() - started
+    else:
+        candidates = embeddings_service.similarity_search(query, k=max(settings.rerank_candidates_k, settings.context_k))
+        timings["retrieve"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        search_results, reranked = reranker.rerank(query, candidates, settings.context_k)
+        timings["rerank"] = time.perf_counter() - started
+        if not reranked:
+            fallback = True
+            search_results = vector_context(candidates[:settings.context_k])
+
+    started = time.perf_counter()
+    search_results = pack_context(search_results)
+    timings["pack"] = time.perf_counter() - started
+    reranker.record(timings, fallback=fallback)
+
+    return search_results
+
+
+def vector_context(search_results: list) -> list:
+    """Pasajes en orden vectorial dentro de la distancia máxima (o los 3 más cercanos si ninguno lo está)"""
+    within_distance = [result for result in search_results if result.score <= settings.context_max_distance]
+    return within_distance or search_results[:3]
+
+
+def build_prompt(question: str, search_results: list) -> str:
+    """Construye el prompt con los pasajes numerados como fuentes"""
     context_passages = []
     for i, result in enumerate(search_results, 1):
-        context_passages.append(f"[Fuente {i}: {result.document_name}]\n{result.text}")
-    
+        source = f"{result.document_name}, página {result.page}" if result.page else result.document_name
+        context_passages.append(f"[Fuente {i}: {source}]\n{result.text}")
+
     context = "\n\n".join(context_passages)
-    
-    prompt = f"""Basándote en la siguiente información, responde la pregunta de manera concisa en 3-4 líneas máximo.
+
+    return f"""Basándote en la siguiente información, responde la pregunta de manera concisa en 3-4 líneas máximo.
 
 INFORMACIÓN DISPONIBLE:
 {context}
@@ -51,27 +259,33 @@ INSTRUCCIONES:
 PREGUNTA: {question}
 
 RESPUESTA:"""
-    answer = llm_service.generate_response(question, prompt)
-    answer = answer.strip()
-    
-    if answer.lower().startswith("respuesta:"):
-        answer = answer[10:].strip()
-    
+
+
+def build_citations(search_results: list) -> List[Dict[str, Any]]:
+    """Construye hasta 3 citas a partir de los pasajes recuperados"""
     citations = []
     for result in search_results[:3]:
         citation_text = result.text[:150] + "..." if len(result.text) > 150 else result.text
         citations.append({
             "text": citation_text,
             "document_name": result.document_name,
+            "page": result.page,
             "score": round(1.0 / (1.0 + result.score), 4)
         })
-    
+    return citations
+
+
+def clean_answer(answer: str, strip_end: bool = True) -> str:
+    """Quita espacios y el prefijo "Respuesta:" que a veces agrega el modelo"""
+    answer = answer.strip() if strip_end else answer.lstrip()
+
+    if answer.lower().startswith("respuesta:"):
+        answer = answer[10:].lstrip()
+
+    return answer
+
+
+def has_context(answer: str) -> bool:
+    """Indica si la respuesta no es la frase de falta de información"""
     no_info_phrases = ["no encuentro esa información en los documentos cargados"]
-    has_sufficient_context = not any(phrase in answer.lower() for phrase in no_info_phrases)
-    
-    return AskResponse(
-        question=question,
-        answer=answer,
-        citations=citations if has_sufficient_context else [],
-        has_sufficient_context=has_sufficient_context
-    )
+    return not any(phrase in answer.lower() for phrase in no_info_phrases)
@@ -1,31 +1,69 @@
+from typing import List
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from documents.schemas import SearchPassage, SearchResultsResponse
+from documents.schemas import SearchPassage, SearchResultsResponse, BatchSearchQuery, BatchSearchResponse
+from config import settings
 
 
-def search_passages(embeddings_service, query: str, k: int = 5) -> SearchResultsResponse:
-    """Busca pasajes relevantes"""
+def search_passages(embeddings_service, query: str, k: int = 5, mode: str = None) -> SearchResultsResponse:
+    """Busca pasajes relevantes (mode: vector, lexical o hybrid)"""
     
+    mode = mode or settings.search_mode
+    
+    embeddings_service.sync_with_disk()
     if not embeddings_service.vector_db:
         raise ValueError("No hay documentos indexados. Primero sube archivos usando /ingest")
     
     if not query or query.strip() == "":
         raise ValueError("El parámetro 'q' es requerido y no puede estar vacío")
     
-    search_results = embeddings_service.similarity_search(query.strip(), k)
+    search_results = embeddings_service.search(query.strip(), k, mode=mode)
+    return _to_response(query, search_results, mode)
+
+
+def search_passages_batch(embeddings_service, queries: List[BatchSearchQuery], mode: str = None) -> BatchSearchResponse:
+    """Busca pasajes para varias consultas en una sola pasada por el modelo y el índice"""
+    
+    mode = mode or settings.search_mode
     
-    if not search_results:
-        return SearchResultsResponse(query=query, passages=[], total_found=0)
+    embeddings_service.sync_with_disk()
+    if not embeddings_service.vector_db:
+        raise ValueError("No hay documentos indexados. Primero sube archivos usando /ingest")
     
+    if len(queries) > settings.batch_search_max_queries:
+        raise ValueError(f"Se permiten hasta {settings.batch_search_max_queries} consultas por solicitud")
+    if any(not query.q.strip() for query in queries):
+        raise ValueError("Las consultas no pueden estar vacías")
+    
+    filters = [
+        {key: value for key, value in (("source", query.source), ("file_type", query.file_type)) if value}
+        for query in queries
+    ]
+    search_results = embeddings_service.search_batch(
+        [query.q.strip() for query in queries],
+        [query.k for query in queries],
+        filters,
+        mode=mode
+    )
+    
+    return BatchSearchResponse(results=[
+        _to_response(query.q, results, mode) for query, results in zip(queries, search_results)
+    ])
+
+
+def _to_response(query: str, search_results: list, mode: str) -> SearchResultsResponse:
+    """Convierte resultados del índice en pasajes con puntaje de relevancia"""
     passages = []
     for result in search_results:
         passage = SearchPassage(
             text=result.text,
             document_name=result.document_name,
-            relevance_score=round(1.0 / (1.0 + result.score), 4)
+            page=result.page,
+            # En modo vectorial el score es una distancia; en léxico e híbrido ya es un puntaje
+            relevance_score=round(1.0 / (1.0 + result.score), 4) if mode == "vector" else round(result.score, 4)
         )
         passages.append(passage)
     
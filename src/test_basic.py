@@ -16,6 +16,33 @@ from config import settings
 
 client = TestClient(app)
 
+# Tiempo máximo para `import src.app`: no debe cargar modelos ni leer el índice
+IMPORT_TIME_BUDGET_SECONDS = 5.0
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Servicio de embeddings deterministas con índice, almacén y cachés en un directorio temporal"""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from IA.embeddings import EmbeddingsService
+    
+    monkeypatch.setattr(settings, "vector_db_path", str(tmp_path / "vector_db"))
+    monkeypatch.setattr(settings, "metadata_path", str(tmp_path / "metadata.json"))
+    monkeypatch.setattr(settings, "embedding_cache_path", str(tmp_path / "embedding_cache.sqlite"))
+    monkeypatch.setattr(settings, "chunk_store_path", str(tmp_path / "chunks.sqlite"))
+    return EmbeddingsService(embeddings=DeterministicFakeEmbedding(size=32))
+
+
+@pytest.fixture
+def contract_service(service):
+    """Servicio con un único chunk indexado (contrato.txt) para las pruebas de respuestas"""
+    from models import DocumentChunk
+    
+    service.create_vector_database([
+        DocumentChunk(text="El plazo de entrega es de 30 días.", document_name="contrato.txt", chunk_index=0)
+    ])
+    return service
+
 
 class TestBasicFunctionality:
     """Pruebas básicas de funcionalidad"""
@@ -28,6 +55,30 @@ class TestBasicFunctionality:
         assert data["status"] == "healthy"
         assert data["app_name"] == settings.app_name
     
+    def test_readiness_after_warm_up(self):
+        """Prueba que /ready responde 200 una vez cargados índice y modelo"""
+        sys.modules["src.documents.router"].warm_up_services()
+        
+        response = client.get("/ready")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["index_loaded"] and data["embedding_model_loaded"]
+    
+    def test_import_stays_under_budget(self):
+        """Prueba que importar la aplicación es rápido y no carga torch ni sentence-transformers"""
+        import subprocess
+        
+        code = (
+            "import sys, time; start = time.perf_counter(); import src.app; "
+            "print(time.perf_counter() - start, 'torch' in sys.modules, 'sentence_transformers' in sys.modules)"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        elapsed, torch_loaded, sentence_transformers_loaded = result.stdout.strip().splitlines()[-1].split()
+        
+        assert float(elapsed) < IMPORT_TIME_BUDGET_SECONDS
+        assert torch_loaded == "False" and sentence_transformers_loaded == "False"
+    
     def test_status_endpoint_empty(self):
         """Prueba el endpoint de status sin documentos"""
         response = client.get("/api/v1/status")
@@ -36,7 +87,48 @@ class TestBasicFunctionality:
         assert data["indexed_documents"] == 0
         assert data["total_chunks"] == 0
         assert data["available_documents"] == []
-    
+
+    def test_status_answers_while_index_loads_and_executor_is_full(self, contract_service, monkeypatch):
+        """Prueba que /status y /stats leen los contadores sin cargar el índice, sin el executor y sin crear el LLM"""
+        from IA.embeddings import EmbeddingsService
+        from IA.llm_service import LLMService
+        from exceptions import ServiceBusyError
+
+        router = sys.modules["src.documents.router"]
+        reader = EmbeddingsService(embeddings=contract_service.embeddings)
+
+        def no_load():
+            raise AssertionError("el índice no debe cargarse en el event loop")
+        monkeypatch.setattr(reader, "ensure_loaded", no_load)
+
+        async def saturated(*args, **kwargs):
+            raise ServiceBusyError("Cola del índice llena")
+        monkeypatch.setattr(router.index_executor, "run", saturated)
+
+        llm = LLMService()
+
+        def no_client():
+            raise AssertionError("el cliente del LLM no debe crearse en el event loop")
+        monkeypatch.setattr(llm, "_initialize_llm", no_client)
+        monkeypatch.setattr(settings, "llm_provider", "stub")
+        monkeypatch.setattr(router, "embeddings_service", reader)
+        monkeypatch.setattr(router, "llm_service", llm)
+
+        # Índice todavía sin cargar: responde de inmediato con el estado vacío
+        status = client.get("/api/v1/status")
+        assert status.status_code == 200
+        assert status.json()["indexed_vectors"] == 0 and status.json()["llm_available"]
+        stats = client.get("/api/v1/stats")
+        assert stats.status_code == 200 and not stats.json()["faiss_stats"]["index_loaded"]
+        assert not reader.is_index_loaded and not llm.is_initialized
+
+        # Ya cargado, los contadores reflejan el índice aunque el executor siga lleno
+        EmbeddingsService.ensure_loaded(reader)
+        status = client.get("/api/v1/status")
+        assert status.status_code == 200
+        assert status.json()["available_documents"] == ["contrato.txt"]
+        assert status.json()["indexed_vectors"] == 1
+
     def test_ask_without_documents(self):
         """Prueba hacer pregunta sin documentos indexados"""
         response = client.post("/api/v1/ask", json={"question": "¿Qué es esto?"})
@@ -70,6 +162,35 @@ class TestBasicFunctionality:
         assert response.status_code == 400
         assert "no es válido" in response.json()["detail"]
 
+    def test_ingest_streams_each_file_into_the_index(self, monkeypatch):
+        """Prueba que la ingesta síncrona indexa archivo por archivo y cuenta los chunks de cada uno"""
+        router = sys.modules["src.documents.router"]
+        service = router.embeddings_service
+        stream = service.create_vector_database_from_stream
+        groups = []
+
+        def tracking_stream(document_groups, progress_callback=None):
+            def tracked():
+                for documents in document_groups:
+                    groups.append({doc.document_name for doc in documents})
+                    yield documents
+            return stream(tracked(), progress_callback)
+        monkeypatch.setattr(service, "create_vector_database_from_stream", tracking_stream)
+
+        files = [
+            ("files", (f"sinc{i}.txt", BytesIO(f"Contenido sincrónico del archivo {i}".encode()), "text/plain"))
+            for i in range(3)
+        ]
+        response = client.post("/api/v1/ingest", files=files)
+        client.delete("/api/v1/documents")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [file["filename"] for file in data["files_processed"]] == ["sinc0.txt", "sinc1.txt", "sinc2.txt"]
+        assert all(file["chunks_count"] == 1 for file in data["files_processed"])
+        assert data["total_chunks"] == 3
+        assert sorted(groups, key=sorted) == [{"sinc0.txt"}, {"sinc1.txt"}, {"sinc2.txt"}]
+
 
 class TestFileValidation:
     """Pruebas de validación de archivos"""
@@ -116,6 +237,861 @@ class TestDocumentLoader:
         assert len(chunks) > 1
         assert len(chunks[0]) <= 20
 
+    def test_token_chunker_packs_whole_sentences(self):
+        """Prueba que el chunker agrupa oraciones completas dentro de la ventana y solapa la última"""
+        from documents.chunker import TokenChunker
+
+        chunker = TokenChunker(max_tokens=12, overlap_tokens=4)
+        sentences = ["Uno dos tres.", "Cuatro cinco seis.", "Siete ocho.", "Nueve diez once doce."]
+        chunks = chunker.chunk("  " + " ".join(sentences) + "\n\n")
+
+        assert chunks == ["Uno dos tres. Cuatro cinco seis.", "Cuatro cinco seis. Siete ocho.",
+                          "Siete ocho. Nueve diez once doce."]
+        assert all(chunker.count_tokens(chunk) <= 10 for chunk in chunks)
+
+        long_sentence = " ".join(f"p{i}" for i in range(25))
+        pieces = chunker.chunk(long_sentence)
+        assert len(pieces) > 1
+        assert all(chunker.count_tokens(piece) <= 10 for piece in pieces)
+        assert pieces[0].split()[-4:] == pieces[1].split()[:4]
+        assert chunker.chunk("   ") == []
+
+    def test_closing_punctuation_stays_in_its_sentence(self):
+        """Prueba que comillas y paréntesis de cierre quedan en la oración y cuentan en la ventana"""
+        import re
+        from documents.chunker import TokenChunker
+
+        chunker = TokenChunker(max_tokens=12, overlap_tokens=0)
+        text = " ".join(["(uno dos tres.)", "«cuatro cinco!»", "Seis siete?\")", "ocho nueve…”"] * 3)
+
+        sentences = [text[start:end] for start, end in chunker._sentence_spans(text)]
+        assert re.sub(r"\s", "", "".join(sentences)) == re.sub(r"\s", "", text)
+        assert sentences[:4] == ["(uno dos tres.)", "«cuatro cinco!»", "Seis siete?\")", "ocho nueve…”"]
+
+        chunks = chunker.chunk(text)
+        assert all(chunker.count_tokens(chunk) <= 10 for chunk in chunks)
+        assert chunks[0] == "(uno dos tres.)"
+
+    def test_iter_parsed_files_yields_every_file(self, tmp_path):
+        """Prueba que el análisis en el pool de procesos entrega cada archivo, incluso los fallidos"""
+        from documents.document_loader import document_loader_service
+
+        uploads = []
+        for i in range(3):
+            path = tmp_path / f"doc{i}.txt"
+            path.write_text(f"Contenido del documento {i}", encoding="utf-8")
+            uploads.append((str(path), f"doc{i}.txt"))
+        uploads.append((str(tmp_path / "no-existe.txt"), "no-existe.txt"))
+
+        parsed = dict(document_loader_service.iter_parsed_files(uploads))
+
+        assert set(parsed) == {"doc0.txt", "doc1.txt", "doc2.txt", "no-existe.txt"}
+        assert parsed["doc1.txt"][0].text == "Contenido del documento 1"
+        assert parsed["no-existe.txt"] == []
+
+    def test_pdf_is_parsed_by_page_ranges_and_keeps_pages(self, tmp_path, monkeypatch):
+        """Prueba que un PDF dividido en rangos conserva el orden, la página y el tamaño de chunk"""
+        from benchmark import _write_pdf
+        from documents.chunker import SPECIAL_TOKENS, get_chunker
+        from documents.document_loader import document_loader_service
+
+        monkeypatch.setattr(settings, "pdf_pages_per_task", 2)
+        monkeypatch.setattr(settings, "chunk_max_tokens", 40)
+        path = tmp_path / "manual.pdf"
+        _write_pdf(path, pages=5, lines_per_page=8)
+
+        assert len(document_loader_service.plan_parts(str(path), "manual.pdf")) == 3
+        (_, chunks), = document_loader_service.iter_parsed_files([(str(path), "manual.pdf")])
+
+        assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+        assert [chunk.page for chunk in chunks] == sorted(chunk.page for chunk in chunks)
+        assert {chunk.page for chunk in chunks} == {1, 2, 3, 4, 5}
+        chunker = get_chunker(*document_loader_service.chunking_options())
+        assert all(chunker.count_tokens(chunk.text) <= 40 - SPECIAL_TOKENS for chunk in chunks)
+        assert "Pagina 4" in next(chunk.text for chunk in chunks if chunk.page == 4)
+
+    def test_uploaded_files_with_more_parts_than_the_parse_queue(self, tmp_path, monkeypatch):
+        """Prueba que la carga síncrona limita las partes en análisis en lugar de responder 503"""
+        import asyncio
+        from fastapi import UploadFile
+        from benchmark import _write_pdf
+        from documents.document_loader import document_loader_service
+        from IA.executor import parse_executor
+
+        monkeypatch.setattr(settings, "pdf_pages_per_task", 1)
+        monkeypatch.setattr(parse_executor, "max_pending", parse_executor.max_workers)
+        path = tmp_path / "manual.pdf"
+        pages = parse_executor.max_workers * 2 + 1
+        _write_pdf(path, pages=pages, lines_per_page=2)
+
+        upload = UploadFile(file=BytesIO(path.read_bytes()), filename="manual.pdf")
+        rejected = parse_executor.get_stats()["rejected"]
+        chunks = asyncio.run(document_loader_service.load_uploaded_files([upload]))
+
+        assert {chunk.page for chunk in chunks} == set(range(1, pages + 1))
+        assert parse_executor.get_stats()["rejected"] == rejected
+
+
+class TestEmbeddingsService:
+    """Pruebas del servicio de embeddings con embeddings deterministas"""
+    
+    def _chunks(self, document_name, count):
+        from models import DocumentChunk
+        return [
+            DocumentChunk(text=f"{document_name} fragmento {i}", document_name=document_name, chunk_index=i)
+            for i in range(count)
+        ]
+    
+    def test_delete_by_source_does_not_reembed(self, service, monkeypatch):
+        """Prueba que eliminar un documento solo quita sus vectores"""
+        service.create_vector_database(self._chunks("a.txt", 4) + self._chunks("b.txt", 3))
+        
+        def fail_embed(self, texts):
+            raise AssertionError("No se debe recalcular embeddings al eliminar")
+        monkeypatch.setattr(type(service.embeddings), "embed_documents", fail_embed)
+        
+        assert service.delete_documents_by_source("a.txt") is True
+        assert service.vector_db.ntotal == 3
+        assert set(service.source_index) == {"b.txt"}
+        assert all(r.document_name == "b.txt" for r in service.similarity_search("fragmento", k=5))
+    
+    def test_source_index_survives_reload_as_arrays(self, service):
+        """Prueba que los IDs por documento se guardan como arreglos y se recuperan al recargar"""
+        import numpy as np
+        from IA.embeddings import EmbeddingsService
+        
+        service.create_vector_database(self._chunks("a.txt", 4) + self._chunks("b.pdf", 3))
+        service.create_vector_database(self._chunks("a.txt", 2) + self._chunks("c.txt", 1))
+        expected = {name: service.source_index.ids(name).tolist() for name in service.source_index}
+        
+        reloaded = EmbeddingsService(embeddings=service.embeddings)
+        reloaded.ensure_loaded()
+        
+        assert {name: reloaded.source_index.ids(name).tolist() for name in reloaded.source_index} == expected
+        assert reloaded.source_index.ids("a.txt").dtype == np.int64
+        assert reloaded.source_index.memory_bytes() == 8 * 6
+        assert reloaded.file_type_index == {".txt": {"a.txt", "c.txt"}, ".pdf": {"b.pdf"}}
+    
+    def test_database_stats_are_kept_incrementally(self, service, monkeypatch):
+        """Prueba que las estadísticas se actualizan al ingestar y borrar sin recorrer los chunks"""
+        from IA.embeddings import EmbeddingsService
+        
+        service.create_vector_database(self._chunks("a.txt", 4) + self._chunks("b.pdf", 3) + self._chunks("c.txt", 2))
+        service.delete_documents_by_source("c.txt")
+        
+        def fail_scan(*args, **kwargs):
+            raise AssertionError("Las estadísticas no deben consultar el almacén de chunks")
+        monkeypatch.setattr(service.chunk_store, "count", fail_scan)
+        monkeypatch.setattr(service.chunk_store, "source_sizes", fail_scan)
+        
+        stats = service.get_database_stats()
+        assert stats["total_documents"] == 7
+        assert stats["sources"]["a.txt"] == {"file_type": ".txt", "chunks": 4, "bytes": len("a.txt fragmento 0") * 4}
+        assert stats["file_types"] == {
+            ".txt": {"documents": 1, "chunks": 4, "bytes": stats["sources"]["a.txt"]["bytes"]},
+            ".pdf": {"documents": 1, "chunks": 3, "bytes": stats["sources"]["b.pdf"]["bytes"]}
+        }
+        assert stats["total_bytes"] == stats["sources"]["a.txt"]["bytes"] + stats["sources"]["b.pdf"]["bytes"]
+        
+        assert service.stats_file.exists()
+        reloaded = EmbeddingsService(embeddings=service.embeddings)
+        reloaded.ensure_loaded()
+        assert reloaded.get_database_stats()["sources"] == stats["sources"]
+    
+    def test_ingest_embeds_in_batches_and_rolls_back_on_failure(self, service, monkeypatch):
+        """Prueba que la ingesta respeta el tamaño de lote y no deja documentos a medias"""
+        monkeypatch.setattr(settings, "embedding_batch_size", 2)
+        embed_documents = type(service.embeddings).embed_documents
+        batch_sizes = []
+        
+        def tracking_embed(self, texts):
+            batch_sizes.append(len(texts))
+            if len(batch_sizes) == 3:
+                raise RuntimeError("fallo simulado del modelo")
+            return embed_documents(self, texts)
+        monkeypatch.setattr(type(service.embeddings), "embed_documents", tracking_embed)
+        
+        assert service.create_vector_database(self._chunks("a.txt", 5)) is False
+        assert max(batch_sizes) == 2
+        assert "a.txt" not in service.source_index
+        assert service.vector_db.ntotal == 0
+
+    def test_failed_reingest_keeps_previous_version(self, service, monkeypatch):
+        """Prueba que una re-ingesta fallida conserva los chunks anteriores del documento"""
+        from models import DocumentChunk
+        from IA.embeddings import EmbeddingsService
+
+        service.create_vector_database(self._chunks("a.txt", 3) + self._chunks("b.txt", 2))
+        previous_ids = service.source_index.ids("a.txt").tolist()
+        previous_stats = service.get_database_stats()
+
+        def fail_embed(self, texts):
+            raise RuntimeError("fallo simulado del modelo")
+        monkeypatch.setattr(type(service.embeddings), "embed_documents", fail_embed)
+
+        new_version = [
+            DocumentChunk(text=f"versión nueva {i}", document_name="a.txt", chunk_index=i) for i in range(4)
+        ]
+        assert service.create_vector_database(new_version) is False
+
+        assert service.source_index.ids("a.txt").tolist() == previous_ids
+        assert service.get_database_stats()["sources"] == previous_stats["sources"]
+        assert service.file_type_index[".txt"] == {"a.txt", "b.txt"}
+        assert service.similarity_search("a.txt fragmento 2", k=1, filter={"source": "a.txt"})[0].text == "a.txt fragmento 2"
+
+        reloaded = EmbeddingsService(embeddings=service.embeddings)
+        reloaded.ensure_loaded()
+        assert reloaded.source_index.ids("a.txt").tolist() == previous_ids
+        assert reloaded.chunk_store.count() == 5
+
+    def test_reingest_unchanged_document_uses_embedding_cache(self, service, monkeypatch):
+        """Prueba que re-ingestar el mismo contenido no vuelve a llamar al modelo"""
+        service.create_vector_database(self._chunks("a.txt", 4))
+        
+        def fail_embed(self, texts):
+            raise AssertionError("Los chunks sin cambios deben salir de la caché")
+        monkeypatch.setattr(type(service.embeddings), "embed_documents", fail_embed)
+        
+        assert service.create_vector_database(self._chunks("a.txt", 4)) is True
+        assert service.vector_db.ntotal == 4
+        assert service.get_cache_stats()["embedding_cache"]["hits"] == 4
+    
+    def test_legacy_metadata_json_is_migrated(self, service):
+        """Prueba la migración única de metadata.json al almacén de chunks"""
+        import json
+        from pathlib import Path
+        from langchain_core.documents import Document
+        from langchain_community.vectorstores import FAISS
+        
+        embeddings = service.embeddings
+        
+        legacy_docs = [
+            Document(page_content=f"texto {i}", metadata={"source": "a.txt", "doc_id": f"a.txt_{i}", "chunk_index": i})
+            for i in range(3)
+        ]
+        FAISS.from_documents(legacy_docs, embeddings).save_local(settings.vector_db_path)
+        with open(settings.metadata_path, "w", encoding="utf-8") as f:
+            json.dump({
+                f"a.txt_{i}": {"text": f"texto {i}", "document_name": "a.txt", "chunk_index": i,
+                               "created_at": "2024-01-01T00:00:00"}
+                for i in range(3)
+            }, f)
+        
+        service.ensure_loaded()
+        
+        assert service.chunk_store.count() == 3
+        assert not Path(settings.metadata_path).exists()
+        assert not (Path(settings.vector_db_path) / "index.pkl").exists()
+        assert service.similarity_search("texto 1", k=1)[0].text == "texto 1"
+    
+    def test_persisted_index_is_memory_mapped_and_writable(self, service):
+        """Prueba que el índice se reabre mapeado en memoria y admite cambios posteriores"""
+        from pathlib import Path
+        from IA.embeddings import EmbeddingsService
+        
+        service.create_vector_database(self._chunks("a.txt", 3) + self._chunks("b.txt", 2))
+        reloaded = EmbeddingsService(embeddings=service.embeddings)
+        assert reloaded.vector_db is None and not reloaded.is_index_loaded
+        
+        reloaded.ensure_loaded()
+        assert reloaded._index_is_mapped
+        assert reloaded.vector_db.ntotal == 5
+        maps = Path("/proc/self/maps")
+        if maps.exists():
+            # El índice plano queda realmente mapeado, no copiado al heap
+            assert str(reloaded.index_file.resolve()) in maps.read_text()
+        assert reloaded.similarity_search("b.txt fragmento 1", k=1)[0].document_name == "b.txt"
+        
+        assert reloaded.delete_documents_by_source("a.txt") is True
+        assert not reloaded._index_is_mapped
+        assert EmbeddingsService(embeddings=service.embeddings).get_database_stats()["total_vectors"] == 2
+    
+    def test_ivf_index_is_trained_once_enough_vectors_exist(self, service, monkeypatch):
+        """Prueba el paso de búsqueda exacta a IVF y que IVF admite borrar y recargar"""
+        from IA.embeddings import EmbeddingsService
+        
+        monkeypatch.setattr(settings, "faiss_index_type", "ivf_flat")
+        monkeypatch.setattr(settings, "faiss_train_min_vectors", 300)
+        monkeypatch.setattr(settings, "faiss_nlist", 4)
+        monkeypatch.setattr(settings, "faiss_nprobe", 4)
+        
+        service.create_vector_database(self._chunks("a.txt", 100))
+        assert service.get_database_stats()["index_type"] == "flat"
+        
+        service.create_vector_database(self._chunks("b.txt", 250))
+        assert service.get_database_stats()["index_type"] == "ivf_flat"
+        assert service.similarity_search("b.txt fragmento 7", k=1)[0].text == "b.txt fragmento 7"
+        
+        assert service.delete_documents_by_source("a.txt") is True
+        reloaded = EmbeddingsService(embeddings=service.embeddings)
+        assert reloaded.get_database_stats()["total_vectors"] == 250
+        assert reloaded.similarity_search("b.txt fragmento 9", k=1)[0].text == "b.txt fragmento 9"
+    
+    def test_hnsw_deletes_use_tombstones_until_compaction(self, service, monkeypatch):
+        """Prueba que HNSW excluye los vectores borrados y se compacta al superar el umbral"""
+        monkeypatch.setattr(settings, "faiss_index_type", "hnsw")
+        monkeypatch.setattr(settings, "faiss_hnsw_compact_ratio", 0.5)
+        
+        service.create_vector_database(self._chunks("a.txt", 10) + self._chunks("b.txt", 20) + self._chunks("c.txt", 10))
+        assert service.get_database_stats()["index_type"] == "hnsw"
+        
+        service.delete_documents_by_source("a.txt")
+        assert service.vector_db.ntotal == 40
+        assert service.get_database_stats()["total_vectors"] == 30
+        assert all(r.document_name != "a.txt" for r in service.similarity_search("a.txt fragmento 1", k=10))
+        
+        service.delete_documents_by_source("c.txt")
+        assert service.vector_db.ntotal == 20
+    
+    def test_filtered_search_returns_exact_top_k_from_subset(self, service, monkeypatch):
+        """Prueba que los filtros se aplican antes de buscar y devuelven k resultados"""
+        from models import DocumentChunk
+        
+        service.create_vector_database(
+            self._chunks("grande.txt", 300) + self._chunks("chico.txt", 5)
+            + [DocumentChunk(text=f"informe {i}", document_name="informe.pdf", chunk_index=i) for i in range(4)]
+        )
+        
+        for exact_max in (0, 1000):  # Con selector de IDs y por comparación directa
+            monkeypatch.setattr(settings, "faiss_prefilter_exact_max_vectors", exact_max)
+            service._invalidate_search_cache()
+            
+            by_document = service.similarity_search_by_document("grande.txt fragmento 1", "chico.txt", k=5)
+            assert len(by_document) == 5
+            assert {r.document_name for r in by_document} == {"chico.txt"}
+            
+            by_type = service.similarity_search_by_file_type("informe 2", ".pdf", k=10)
+            assert len(by_type) == 4
+            assert by_type[0].text == "informe 2"
+        
+        assert service.similarity_search_by_document("fragmento", "no-existe.txt") == []
+    
+    def test_search_result_cache_is_invalidated_by_ingest(self, service):
+        """Prueba que los resultados cacheados no sobreviven a un cambio del índice"""
+        service.create_vector_database(self._chunks("a.txt", 3))
+        
+        first = service.similarity_search("fragmento", k=5)
+        assert service.similarity_search("fragmento", k=5) == first
+        assert service.get_cache_stats()["search_results"]["hits"] == 1
+        
+        service.create_vector_database(self._chunks("b.txt", 3))
+        assert len(service.similarity_search("fragmento", k=5)) == 5
+        assert service.get_cache_stats()["query_embeddings"]["hits"] >= 1
+
+    
+    def test_batch_search_matches_individual_searches(self, service, monkeypatch):
+        """Prueba que la búsqueda por lotes usa un lote del modelo y una búsqueda FAISS, en orden"""
+        from documents.schemas import BatchSearchQuery
+        from services import search_passages_batch
+        
+        service.create_vector_database(self._chunks("a.txt", 30) + self._chunks("b.pdf", 10))
+        queries = ["a.txt fragmento 3", "b.pdf fragmento 7", "a.txt fragmento 12"]
+        ks = [5, 2, 8]
+        filters = [None, {"file_type": ".pdf"}, None]
+        expected = [service.similarity_search(query, k, f) for query, k, f in zip(queries, ks, filters)]
+        service.query_embedding_cache.clear()
+        service.search_result_cache.clear()
+        
+        embed_calls, faiss_calls = [], []
+        embed_documents = type(service.embeddings).embed_documents
+        monkeypatch.setattr(type(service.embeddings), "embed_documents",
+                            lambda self, texts: embed_calls.append(len(texts)) or embed_documents(self, texts))
+        index_search = service.vector_db.search
+        monkeypatch.setattr(service.vector_db, "search",
+                            lambda x, k, **kwargs: faiss_calls.append(len(x)) or index_search(x, k, **kwargs))
+        
+        assert service.similarity_search_batch(queries, ks, filters) == expected
+        assert embed_calls == [3]
+        assert faiss_calls == [2]  # Las dos consultas sin filtro en una sola llamada
+        
+        response = search_passages_batch(service, [
+            BatchSearchQuery(q=query, k=k, file_type=(f or {}).get("file_type"))
+            for query, k, f in zip(queries, ks, filters)
+        ], mode="vector")
+        assert [len(r.passages) for r in response.results] == ks
+        assert [r.query for r in response.results] == queries
+        assert {p.document_name for p in response.results[1].passages} == {"b.pdf"}
+        assert embed_calls == [3]  # Resultados servidos desde la caché
+    
+    def test_rerank_reorders_context_within_budget(self, service, monkeypatch):
+        """Prueba que el cross-encoder elige el contexto y que sin presupuesto se usa el orden vectorial"""
+        import time
+        from IA.reranker import CrossEncoderReranker
+        from services.qa_service import retrieve_context, vector_context
+        from services.context_builder import pack_context
+        
+        class KeywordCrossEncoder:
+            delay = 0.0
+            
+            def predict(self, pairs, batch_size=32):
+                time.sleep(self.delay)
+                return [float("fragmento 17" in passage) for _, passage in pairs]
+        
+        service.create_vector_database(self._chunks("a.txt", 30))
+        model = KeywordCrossEncoder()
+        service.reranker = CrossEncoderReranker(model=model)
+        monkeypatch.setattr(settings, "rerank_enabled", True)
+        monkeypatch.setattr(settings, "rerank_candidates_k", 30)
+        monkeypatch.setattr(settings, "rerank_batch_size", 8)
+        monkeypatch.setattr(settings, "context_k", 3)
+        vector_order = service.similarity_search("a.txt fragmento 2", k=30)
+        
+        reranked = retrieve_context(service, "a.txt fragmento 2")
+        assert len(reranked) == 3
+        assert reranked[0].text == "a.txt fragmento 17"
+        
+        model.delay = 0.05
+        monkeypatch.setattr(settings, "rerank_budget_ms", 60)
+        fallback = retrieve_context(service, "a.txt fragmento 2")
+        assert fallback == pack_context(vector_context(vector_order[:3]))
+        
+        stats = service.reranker.get_stats()
+        assert stats["calls"] == 2 and stats["fallbacks"] == 1
+        assert set(stats["last_ms"]) == {"retrieve", "rerank", "pack"}
+        
+        # Un único lote que termina fuera del presupuesto no cuenta como reordenado
+        slow = KeywordCrossEncoder()
+        slow.delay = 0.08
+        candidates = vector_order[:3]
+        assert CrossEncoderReranker(model=slow).rerank("q", candidates, k=3, budget_seconds=0.05) == (candidates, False)
+    
+    def test_pack_context_merges_dedups_and_fits_budget(self, monkeypatch):
+        """Prueba que el contexto une chunks contiguos, descarta duplicados y respeta el presupuesto"""
+        from documents.chunker import TokenChunker
+        from models import SearchResult
+        from services.context_builder import pack_context
+        
+        monkeypatch.setattr(settings, "chunk_tokenizer", "")
+        monkeypatch.setattr(settings, "embedding_model", "")  # Aproximación por regex, sin descargar tokenizador
+        
+        def result(text, index, document="a.txt", score=0.5):
+            return SearchResult(text=text, document_name=document, chunk_index=index, score=score)
+        
+        results = [
+            result("La garantía cubre dos años. El envío es gratuito.", 4, score=0.2),
+            result("El envío es gratuito. Las devoluciones se aceptan por treinta días.", 5, score=0.3),
+            result("La garantía cubre dos años. El envío es gratuito siempre.", 0, document="copia.txt"),
+            result("El soporte atiende de lunes a viernes.", 9, score=0.4),
+        ]
+        packed = pack_context(results, max_tokens=1000)
+        
+        assert [(p.document_name, p.chunk_index) for p in packed] == [("a.txt", 4), ("a.txt", 9)]
+        assert packed[0].text == "La garantía cubre dos años. El envío es gratuito. Las devoluciones se aceptan por treinta días."
+        assert packed[0].score == 0.2
+        
+        budget = TokenChunker(1000, 0).count_tokens(packed[0].text) + 5
+        trimmed = pack_context(results, max_tokens=budget)
+        assert len(trimmed) == 1
+        assert sum(TokenChunker(1000, 0).count_tokens(p.text) for p in pack_context(results, max_tokens=8)) <= 8
+    
+    def test_lexical_and_hybrid_search_find_exact_terms(self, service):
+        """Prueba que BM25 encuentra códigos exactos, sigue las eliminaciones y se persiste"""
+        from IA.embeddings import EmbeddingsService
+        from models import DocumentChunk
+        
+        service.create_vector_database(self._chunks("a.txt", 5) + [
+            DocumentChunk(text="El repuesto XK-4471 está agotado", document_name="b.txt", chunk_index=0)
+        ])
+        
+        assert [r.document_name for r in service.lexical_search("xk-4471", k=3)] == ["b.txt"]
+        assert service.hybrid_search("repuesto XK-4471", k=3)[0].document_name == "b.txt"
+        with pytest.raises(ValueError):
+            service.search("xk-4471", mode="fuzzy")
+        # Sin modo explícito se usa la búsqueda vectorial; léxica e híbrida son opcionales
+        assert service.search("repuesto", k=3) == service.similarity_search("repuesto", k=3)
+
+        reloaded = EmbeddingsService(embeddings=service.embeddings)
+        assert reloaded.lexical_search("XK-4471", k=3)[0].document_name == "b.txt"
+        
+        service.delete_documents_by_source("b.txt")
+        assert service.lexical_search("xk-4471", k=3) == []
+        assert len(service.lexical_index) == 5
+
+    def test_other_workers_reload_published_index(self, service, monkeypatch):
+        """Prueba que un worker ve las escrituras de otro sin reiniciar y que solo uno escribe a la vez"""
+        from IA.embeddings import EmbeddingsService
+
+        monkeypatch.setattr(settings, "index_reload_interval_seconds", 0)
+        service.index_version.check_interval = 0
+        reader = EmbeddingsService(embeddings=service.embeddings)
+        assert reader.similarity_search("fragmento") == []
+
+        service.create_vector_database(self._chunks("a.txt", 3))
+        assert {r.document_name for r in reader.similarity_search("fragmento", k=5)} == {"a.txt"}
+        assert reader.get_database_stats()["total_vectors"] == 3
+
+        # Un documento ingerido por el segundo worker se suma al del primero en lugar de reemplazarlo
+        reader.create_vector_database(self._chunks("b.txt", 2))
+        assert set(service.source_index) == {"a.txt"}
+        # Las estadísticas describen el índice cargado; la búsqueda es la que recarga
+        assert service.get_database_stats()["source_list"] == ["a.txt"]
+        assert len(service.lexical_search("b.txt", k=10)) == 2
+        assert service.get_database_stats()["source_list"] == ["a.txt", "b.txt"]
+
+        with service.writer_lock:
+            assert reader.writer_lock.acquire(blocking=False) is False
+
+        reader.reset_database()
+        assert service.similarity_search("fragmento") == []
+
+    def test_index_watcher_reloads_without_requests(self, service, monkeypatch):
+        """Prueba que el hilo de recarga trae el índice de otro worker sin esperar a una búsqueda"""
+        import time
+        from IA.embeddings import EmbeddingsService
+
+        monkeypatch.setattr(settings, "index_reload_interval_seconds", 0.05)
+        reader = EmbeddingsService(embeddings=service.embeddings)
+        reader.ensure_loaded()
+        reader.start_index_watcher()
+        try:
+            service.create_vector_database(self._chunks("a.txt", 3))
+            deadline = time.monotonic() + 5
+            while reader.get_database_stats()["total_vectors"] != 3 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            reader.stop_index_watcher()
+
+        assert reader.get_database_stats()["source_list"] == ["a.txt"]
+
+class TestEmbeddingBackends:
+    """Pruebas de los backends de embeddings"""
+    
+    def test_onnx_backend_matches_torch(self):
+        """Prueba que el modelo ONNX cuantizado da embeddings casi iguales a los de PyTorch"""
+        import numpy as np
+        from IA.embedding_backends import OnnxEmbeddings, create_embeddings
+        
+        with pytest.raises(ValueError):
+            create_embeddings("tensorflow")
+        
+        pytest.importorskip("onnxruntime")
+        from sentence_transformers import SentenceTransformer
+        try:
+            reference = SentenceTransformer(settings.embedding_model, device="cpu")
+            onnx = OnnxEmbeddings(settings.embedding_model, onnx_file=settings.embedding_onnx_file, batch_size=2)
+        except Exception as e:
+            pytest.skip(f"Modelo {settings.embedding_model} no disponible: {e}")
+        
+        texts = [
+            "El plazo de entrega es de diez días hábiles.",
+            "La garantía cubre defectos de fabricación durante el primer año.",
+            "XK-4471",
+            "¿Cuánto cuesta el envío a Montevideo?",
+        ]
+        expected = reference.encode(texts, normalize_embeddings=True)
+        actual = np.asarray(onnx.embed_documents(texts))
+        
+        assert actual.shape == expected.shape
+        assert (actual * expected).sum(axis=1).min() > 0.99
+        assert np.dot(onnx.embed_query(texts[0]), expected[0]) > 0.99
+
+
+class TestBackgroundIngest:
+    """Pruebas de la ingesta en segundo plano"""
+    
+    def test_background_ingest_reports_progress(self):
+        """Prueba que la ingesta en segundo plano devuelve un job_id y termina persistida"""
+        import time
+        
+        files = [
+            ("files", (f"fondo{i}.txt", BytesIO(f"Contenido del archivo {i} para ingesta".encode()), "text/plain"))
+            for i in range(3)
+        ]
+        response = client.post("/api/v1/ingest?background=true", files=files)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        
+        for _ in range(120):
+            job = client.get(f"/api/v1/ingest/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.5)
+        
+        assert job["status"] == "completed"
+        assert all(file["stage"] == "persisted" for file in job["files"])
+        assert job["total_chunks"] == 3
+        
+        # Otro worker (otro gestor de trabajos) también puede consultarlo
+        from documents.jobs import IngestJobManager
+        assert IngestJobManager(None).get_job(job_id).status == "completed"
+        
+        client.delete("/api/v1/documents")
+    
+    def test_unknown_job_returns_404(self):
+        """Prueba consultar un trabajo inexistente"""
+        response = client.get("/api/v1/ingest/no-existe")
+        assert response.status_code == 404
+
+
+class TestStreamingAnswer:
+    """Pruebas de la respuesta en streaming con el LLM de prueba"""
+    
+    def test_stream_sends_citations_then_tokens_then_summary(self, contract_service, monkeypatch):
+        """Prueba el orden de eventos y que los fragmentos reconstruyen la respuesta"""
+        import asyncio
+        from IA.llm_service import LLMService
+        from services import stream_answer
+        
+        monkeypatch.setattr(settings, "llm_provider", "stub")
+        monkeypatch.setattr(settings, "llm_stub_response", "Respuesta: El plazo es de 30 días (Fuente 1).")
+        
+        async def collect():
+            return [event async for event in stream_answer(LLMService(), contract_service, "¿Cuál es el plazo?")]
+        
+        events = asyncio.run(collect())
+        
+        assert events[0]["event"] == "citations"
+        assert events[0]["data"][0]["document_name"] == "contrato.txt"
+        tokens = [event["data"]["text"] for event in events if event["event"] == "token"]
+        assert len(tokens) > 1
+        assert "".join(tokens) == "El plazo es de 30 días (Fuente 1)."
+        assert events[-1] == {
+            "event": "done",
+            "data": {"answer": "El plazo es de 30 días (Fuente 1).", "has_sufficient_context": True}
+        }
+
+
+class TestAnswerCache:
+    """Pruebas de la caché semántica de respuestas"""
+
+    def test_repeated_question_skips_llm_until_index_changes(self, contract_service, monkeypatch):
+        """Prueba que una pregunta repetida no llama al LLM y que la ingesta invalida la caché"""
+        from IA.llm_service import LLMService
+        from models import DocumentChunk
+        from services import answer_question
+
+        monkeypatch.setattr(settings, "llm_provider", "stub")
+
+        llm_service = LLMService()
+        calls = []
+        original = llm_service.generate_response
+        monkeypatch.setattr(llm_service, "generate_response", lambda *args: calls.append(args) or original(*args))
+
+        first = answer_question(llm_service, contract_service, "¿Cuál es el plazo?")
+        second = answer_question(llm_service, contract_service, "¿Cuál es el plazo?")
+
+        assert len(calls) == 1
+        assert len(calls[0]) == 1 and calls[0][0].startswith("Basándote")  # El prompt no se envuelve dos veces
+        assert second == first
+        stats = contract_service.get_cache_stats()["answers"]
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["saved_llm_seconds"] >= 0
+
+        contract_service.create_vector_database([
+            DocumentChunk(text="La garantía dura un año.", document_name="garantia.txt", chunk_index=0)
+        ])
+        answer_question(llm_service, contract_service, "¿Cuál es el plazo?")
+        assert len(calls) == 2
+
+
+class TestAsyncLLMClient:
+    """Pruebas del cliente asíncrono del LLM contra un modelo falso local"""
+
+    class FakeLLM:
+        """Modelo que falla las primeras llamadas y registra la concurrencia máxima"""
+
+        def __init__(self, failures=0, delay=0.0):
+            self.failures = failures
+            self.delay = delay
+            self.calls = 0
+            self.active = 0
+            self.max_active = 0
+
+        async def ainvoke(self, prompt):
+            import asyncio
+            from langchain_core.messages import AIMessage
+
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                await asyncio.sleep(self.delay)
+                if self.calls <= self.failures:
+                    raise ConnectionError("conexión rechazada")
+                return AIMessage(content="respuesta")
+            finally:
+                self.active -= 1
+
+    @pytest.fixture
+    def llm_service(self, monkeypatch):
+        from IA.llm_service import LLMService
+
+        monkeypatch.setattr(settings, "llm_provider", "stub")
+        monkeypatch.setattr(settings, "llm_retry_base_delay", 0.0)
+        monkeypatch.setattr(settings, "llm_circuit_failure_threshold", 3)
+        return LLMService()
+
+    def test_retries_transient_errors_and_limits_concurrency(self, llm_service, monkeypatch):
+        """Prueba que los errores pasajeros se reintentan y que la concurrencia queda acotada"""
+        import asyncio
+
+        llm_service.llm = self.FakeLLM(failures=2)
+        assert asyncio.run(llm_service.agenerate_response("¿plazo?")) == "respuesta"
+        assert llm_service.get_client_stats()["retries"] == 2
+        assert llm_service.circuit_breaker.state == "closed"
+
+        monkeypatch.setattr(settings, "llm_max_concurrency", 2)
+        llm_service.llm = self.FakeLLM(delay=0.01)
+
+        async def burst():
+            return await asyncio.gather(*(llm_service.agenerate_response(f"p{i}") for i in range(6)))
+
+        assert asyncio.run(burst()) == ["respuesta"] * 6
+        assert llm_service.llm.max_active == 2
+
+    def test_circuit_opens_after_repeated_failures(self, llm_service, monkeypatch):
+        """Prueba que el circuito se abre, rechaza llamadas y /status lo reporta"""
+        import asyncio
+        from exceptions import LLMServiceError, ServiceBusyError
+
+        monkeypatch.setattr(settings, "llm_max_retries", 0)
+        monkeypatch.setattr(settings, "llm_timeout_seconds", 0.01)
+        llm_service.llm = self.FakeLLM(delay=1.0)
+
+        for _ in range(3):
+            with pytest.raises(LLMServiceError):
+                asyncio.run(llm_service.agenerate_response("¿plazo?"))
+
+        assert llm_service.get_client_stats()["timeouts"] == 3
+        assert llm_service.circuit_breaker.state == "open"
+        with pytest.raises(ServiceBusyError):
+            asyncio.run(llm_service.agenerate_response("¿plazo?"))
+        assert llm_service.llm.calls == 3
+
+        # La app importa el router como src.documents.router
+        monkeypatch.setattr(sys.modules["src.documents.router"], "llm_service", llm_service)
+        assert client.get("/api/v1/status").json()["llm_circuit_state"] == "open"
+
+    def test_probe_without_verdict_leaves_circuit_half_open(self, llm_service, monkeypatch):
+        """Prueba que una llamada de prueba cancelada o con error no pasajero no deja el circuito abierto"""
+        import asyncio
+        from langchain_core.messages import AIMessageChunk
+        from exceptions import LLMServiceError
+
+        class StreamingLLM:
+            async def astream(self, prompt):
+                for token in ("uno", "dos"):
+                    yield AIMessageChunk(content=token)
+
+            async def ainvoke(self, prompt):
+                raise ValueError("solicitud inválida")
+
+        import time
+
+        circuit = llm_service.circuit_breaker
+        for _ in range(3):
+            circuit.record_failure()
+        circuit._opened_at = time.monotonic() - circuit.reset_seconds
+        assert circuit.state == "half_open"
+        llm_service.llm = StreamingLLM()
+
+        async def read_first_token():
+            stream = llm_service.astream_response("¿plazo?")
+            assert await stream.__anext__() == "uno"
+            await stream.aclose()
+
+        asyncio.run(read_first_token())
+        assert circuit.state == "half_open"
+
+        with pytest.raises(LLMServiceError):
+            asyncio.run(llm_service.agenerate_response("¿plazo?"))
+        assert circuit.state == "half_open"
+
+    def test_gemini_client_against_local_http_server(self, monkeypatch):
+        """Prueba el cliente real de Gemini contra un servidor HTTP falso: sin reintentos del SDK"""
+        import asyncio
+        import json
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from IA.llm_service import LLMService
+        from exceptions import LLMServiceError
+
+        hits = []
+        failures = {"remaining": 0}
+
+        class FakeGemini(BaseHTTPRequestHandler):
+            def do_POST(self):
+                hits.append(self.path)
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if failures["remaining"] > 0:
+                    failures["remaining"] -= 1
+                    status = 503
+                    body = {"error": {"code": 503, "message": "no disponible", "status": "UNAVAILABLE"}}
+                else:
+                    status = 200
+                    body = {"candidates": [{
+                        "content": {"parts": [{"text": "respuesta"}], "role": "model"},
+                        "finishReason": "STOP",
+                        "index": 0
+                    }]}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGemini)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            monkeypatch.setattr(settings, "llm_provider", "gemini")
+            monkeypatch.setattr(settings, "gemini_api_key", "clave-de-prueba")
+            monkeypatch.setattr(settings, "llm_api_endpoint", f"http://127.0.0.1:{server.server_port}")
+            monkeypatch.setattr(settings, "llm_max_retries", 1)
+            monkeypatch.setattr(settings, "llm_retry_base_delay", 0.0)
+            monkeypatch.setattr(settings, "llm_timeout_seconds", 5.0)
+            monkeypatch.setattr(settings, "llm_circuit_failure_threshold", 10)
+
+            # Un 503 pasajero lo reintenta el servicio, no el SDK
+            service = LLMService()
+            failures["remaining"] = 1
+            assert asyncio.run(service.agenerate_response("¿plazo?")) == "respuesta"
+            assert len(hits) == 2
+            assert service.get_client_stats()["retries"] == 1
+
+            # Con el proveedor caído, cada intento del servicio es una sola petición HTTP
+            hits.clear()
+            failures["remaining"] = 100
+            started = time.monotonic()
+            with pytest.raises(LLMServiceError):
+                asyncio.run(service.agenerate_response("¿plazo?"))
+            assert len(hits) == settings.llm_max_retries + 1
+            assert time.monotonic() - started < 3.0
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestComputeExecutor:
+    """Pruebas del executor de trabajo pesado"""
+    
+    def test_rejects_when_queue_is_full(self):
+        """Prueba que la cola acotada rechaza trabajo en lugar de acumularlo"""
+        import asyncio
+        import threading
+        from IA.executor import ComputeExecutor
+        from exceptions import ServiceBusyError
+        
+        executor = ComputeExecutor("test", max_workers=1, max_queue_size=0)
+        release = threading.Event()
+        
+        async def scenario():
+            blocked = asyncio.create_task(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            with pytest.raises(ServiceBusyError):
+                await executor.run(lambda: None)
+            release.set()
+            assert await blocked is True
+            assert await executor.run(lambda: 42) == 42
+        
+        asyncio.run(scenario())
+        assert executor.get_stats()["rejected"] == 1
+        executor.shutdown()
+
 
 def run_basic_tests():
     """Ejecuta las pruebas básicas manualmente"""